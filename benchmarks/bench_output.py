@@ -0,0 +1,74 @@
+"""
+Benchmark writing search results to a file.
+
+Run from the repository root:
+
+    python benchmarks/bench_output.py [--matches N] [--context N]
+
+Each line of the searched text holds one IP address. The writer is
+compared with print_matches, and with writing its output as one
+ready-made bytes object, which is the I/O floor.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from pattern_seek.core import search_file  # noqa: E402
+from pattern_seek.output import MatchWriter, print_matches  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--matches", type=int, default=1_000_000)
+    parser.add_argument("--context", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_path = os.path.join(temp_dir, "data.log")
+        with open(data_path, "w") as f:
+            for idx in range(args.matches):
+                f.write(f"host 10.{idx % 256}.{idx // 256 % 256}.{idx % 7} is up\n")
+        result = {
+            "file": data_path,
+            "matches": search_file(data_path, "ip", args.context),
+        }
+        output_path = os.path.join(temp_dir, "output.txt")
+
+        def write() -> None:
+            with open(output_path, "wb") as f:
+                writer = MatchWriter(f)
+                writer.write_result(result)
+                writer.flush()
+
+        def print_text() -> None:
+            with open(output_path, "w", encoding="utf-8") as f:
+                print_matches([result], include_file_info=True, output=f)
+
+        write()
+        with open(output_path, "rb") as f:
+            written = f.read()
+
+        def copy() -> None:
+            with open(output_path, "wb") as f:
+                f.write(written)
+
+        print(
+            f"{args.matches} matches, {args.context} context lines, "
+            f"{len(written) / 1e6:.1f} MB of output"
+        )
+        for name, func in (
+            ("print_matches", print_text),
+            ("MatchWriter", write),
+            ("raw write", copy),
+        ):
+            seconds = min(timeit.repeat(func, number=1, repeat=args.repeat))
+            print(f"{name:>14}  {seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
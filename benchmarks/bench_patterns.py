@@ -0,0 +1,101 @@
+"""
+Benchmark line-by-line vs whole-buffer matching in find_pattern_matches.
+
+Run from the repository root:
+
+    python benchmarks/bench_patterns.py [--lines N] [--match-every N]
+
+The generated text is log-like and sparse (one match every --match-every
+lines), which is where skipping the per-line split pays off the most.
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from pattern_seek.patterns import find_pattern_matches  # noqa: E402
+
+WORDS = "request handler started finished queue worker retry value ok".split()
+
+LEVELS = ["INFO", "INFO", "INFO", "DEBUG", "WARN", "ERROR"]
+MESSAGES = [
+    "request handled in {n}ms",
+    "cache miss for key item_{n}",
+    "retrying job {n} after timeout",
+    "queue depth {n}",
+    "worker started",
+    "connection closed by peer",
+    "flushed {n} records",
+]
+
+
+def build_text(num_lines: int, match_every: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    lines = []
+    for idx in range(num_lines):
+        line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 6)))
+        if match_every and idx % match_every == 0:
+            line += f" user{idx}@example.com https://example.com/{idx}"
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def build_log(num_lines: int, match_every: int, seed: int = 0) -> str:
+    """Application-log lines with numbers and punctuation on every line and
+    an email, URL, IP, GUID or date every match_every lines."""
+    rng = random.Random(seed)
+    lines = []
+    for idx in range(num_lines):
+        message = rng.choice(MESSAGES).format(n=rng.randint(1, 9999))
+        line = f"{rng.choice(LEVELS)} [worker {rng.randint(1, 8)}] {message}"
+        if match_every and idx % match_every == 0:
+            line += rng.choice([
+                f" for user{idx}@example.com",
+                f" at https://example.com/items/{idx}",
+                f" from 10.0.{idx % 256}.{idx % 200}",
+                " id 550e8400-e29b-41d4-a716-446655440000",
+                " due 2024-03-01",
+            ])
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, default=200_000)
+    parser.add_argument("--match-every", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    text = build_text(args.lines, args.match_every)
+    size_mb = len(text) / 1e6
+    print(
+        f"{args.lines} lines, {size_mb:.1f} MB, one match every {args.match_every} "
+        "lines"
+    )
+
+    for pattern_types in (["email"], ["url"], ["email", "guid", "url"]):
+        timings = {}
+        for whole_buffer in (False, True):
+            timings[whole_buffer] = min(
+                timeit.repeat(
+                    lambda: find_pattern_matches(
+                        text, pattern_types, whole_buffer=whole_buffer
+                    ),
+                    number=1,
+                    repeat=args.repeat,
+                )
+            )
+        print(
+            f"{'+'.join(pattern_types):<18}"
+            f" per-line {timings[False]:.3f}s"
+            f"  whole-buffer {timings[True]:.3f}s"
+            f"  speedup {timings[False] / timings[True]:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark find_pattern_matches with and without literal prefilters.
+
+Run from the repository root:
+
+    python benchmarks/bench_prefilter.py [--lines N] [--match-every N]
+
+The text is a sparse application log (see build_log): every line has
+numbers and punctuation, and one in --match-every lines holds something
+a pattern type is looking for.
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_patterns import build_log  # noqa: E402
+from pattern_seek.patterns import find_pattern_matches  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, default=200_000)
+    parser.add_argument("--match-every", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    text = build_log(args.lines, args.match_every)
+    size_mb = len(text) / 1e6
+    print(
+        f"{args.lines} log lines, {size_mb:.1f} MB, "
+        f"one match every {args.match_every} lines"
+    )
+
+    all_types = ["email", "guid", "date", "url", "ip"]
+    for pattern_types in [[pt] for pt in all_types] + [all_types]:
+        timings = {}
+        for prefilter in (False, True):
+            timings[prefilter] = min(timeit.repeat(
+                lambda: find_pattern_matches(text, pattern_types, prefilter=prefilter),
+                number=1,
+                repeat=args.repeat,
+            ))
+        print(
+            f"{'+'.join(pattern_types):<26}"
+            f" no prefilter {timings[False]:.3f}s"
+            f"  prefilter {timings[True]:.3f}s"
+            f"  speedup {timings[False] / timings[True]:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark search_files across 1..N worker processes.
+
+Run from the repository root:
+
+    python benchmarks/bench_search_files.py [--files N] [--lines N] [--max-workers N]
+
+Writes a temporary directory of log-like files and times searching it with
+an increasing number of workers.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from bench_patterns import build_text  # noqa: E402
+from pattern_seek.core import search_files  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=200)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for idx in range(args.files):
+            with open(os.path.join(temp_dir, f"log_{idx:06d}.txt"), "w") as f:
+                f.write(build_text(args.lines, match_every=50, seed=idx))
+        print(f"{args.files} files x {args.lines} lines")
+
+        baseline = None
+        for workers in range(1, args.max_workers + 1):
+            elapsed = min(timeit.repeat(
+                lambda: search_files(temp_dir, ["email", "url", "ip"], workers=workers),
+                number=1,
+                repeat=args.repeat,
+            ))
+            baseline = baseline or elapsed
+            print(
+                f"workers={workers:<3} {elapsed:.3f}s  speedup "
+                f"{baseline / elapsed:.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
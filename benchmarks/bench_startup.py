@@ -0,0 +1,119 @@
+"""
+Benchmark the CLI's cold start and guard it against regressions.
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py [--repeat N] [--budget MS]
+
+Imports pattern_seek.cli in fresh interpreters under python -X importtime
+and prints the slowest imports of the median run. The exit status is 1 if
+the median import takes longer than --budget milliseconds, or if it loads
+a module the CLI only needs for some searches (asyncio for asearch_files,
+multiprocessing for --workers, concurrent.futures for --jobs and --threads,
+regex for --pattern-timeout, colorama for colored output, tomllib for
+--patterns-file, orjson and csv for --format, sqlite3 for the result
+cache), so an eager import slipping back in is caught.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import List, Set, Tuple
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# Modules importing the CLI must not load
+DEFERRED = (
+    "asyncio",
+    "multiprocessing",
+    "concurrent.futures",
+    "regex",
+    "colorama",
+    "tomllib",
+    "orjson",
+    "csv",
+    "sqlite3",
+)
+
+# "import time: self [us] | cumulative | imported package" lines
+_IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_cli() -> Tuple[int, List[Tuple[int, str]], Set[str]]:
+    """
+    Import the CLI in a fresh interpreter.
+
+    Returns:
+        The total import time in microseconds, the (cumulative time, name)
+        of each top-level import, and the modules loaded
+    """
+    env = dict(os.environ, PYTHONPATH=SRC)
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "import sys, pattern_seek.cli; print(*sys.modules)",
+        ],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    total = 0
+    imports = []
+    for line in completed.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if not match:
+            continue
+        cumulative, depth, name = (
+            int(match.group(2)),
+            len(match.group(3)),
+            match.group(4),
+        )
+        # modules imported by pattern_seek.cli itself are one level down
+        if depth == 3:
+            imports.append((cumulative, name))
+        elif name == "pattern_seek.cli":
+            total = cumulative
+    return total, imports, set(completed.stdout.split())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=9)
+    parser.add_argument(
+        "--budget", type=float, default=100.0, help="milliseconds (default: 100)"
+    )
+    parser.add_argument("--top", type=int, default=8, help="number of imports to list")
+    args = parser.parse_args()
+
+    runs = sorted((import_cli() for _ in range(args.repeat)), key=lambda run: run[0])
+    total, imports, modules = runs[len(runs) // 2]
+    median = total / 1000
+
+    print(
+        f"import pattern_seek.cli: median {median:.1f} ms, best "
+        f"{runs[0][0] / 1000:.1f} ms"
+        f" over {args.repeat} runs"
+    )
+    for cumulative, name in sorted(imports, reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:7.1f} ms  {name}")
+
+    failed = False
+    loaded = [name for name in DEFERRED if name in modules]
+    if loaded:
+        print(f"FAIL: importing the CLI loads {', '.join(loaded)}")
+        failed = True
+    if median > args.budget:
+        print(
+            f"FAIL: median {median:.1f} ms is over the budget of {args.budget:.0f} ms"
+        )
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark text search for a growing number of terms.
+
+Run from the repository root:
+
+    python benchmarks/bench_text_terms.py [--lines N] [--max-regex-terms N]
+
+Each search looks for one term that occurs in the log (see build_log)
+plus random identifiers that don't. The regex alternation of the same
+terms is timed for comparison while it stays reasonably fast.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_patterns import build_log  # noqa: E402
+from pattern_seek.aho_corasick import ACCELERATED, terms_pattern  # noqa: E402
+from pattern_seek.patterns import find_pattern_matches  # noqa: E402
+
+ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789-_."
+
+
+def build_terms(count: int, seed: int = 0) -> list:
+    """Build count terms, only the first of which occurs in the log."""
+    rng = random.Random(seed)
+    terms = ["cache miss"]
+    while len(terms) < count:
+        terms.append("".join(rng.choice(ALPHABET) for _ in range(rng.randint(8, 20))))
+    return terms
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, default=100_000)
+    parser.add_argument("--max-regex-terms", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    text = build_log(args.lines, 0)
+    size_mb = len(text) / 1e6
+    engine = "pyahocorasick" if ACCELERATED else "pure Python"
+    print(f"{args.lines} log lines, {size_mb:.1f} MB, automaton in {engine}")
+
+    for count in (1, 10, 100, 1000, 10_000):
+        terms = build_terms(count)
+        search = min(timeit.repeat(
+            lambda: find_pattern_matches(text, "text", text_pattern=terms),
+            number=1,
+            repeat=args.repeat,
+        ))
+        line = f"{count:>6} terms  search {search:.3f}s"
+
+        if count <= args.max_regex_terms:
+            alternation = re.compile(terms_pattern(terms), re.IGNORECASE)
+            regex = min(timeit.repeat(
+                lambda: alternation.findall(text), number=1, repeat=args.repeat
+            ))
+            line += f"  regex alternation {regex:.3f}s"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark search_files in threads against the serial path on a cold page cache.
+
+Run from the repository root:
+
+    python benchmarks/bench_threads.py [--files N] [--lines N] [--max-threads N]
+                                       [--dir PATH]
+
+Writes log-like files (to --dir if given, e.g. a network mount) and times
+searching them serially and with an increasing number of threads. Before
+each run the files are dropped from the page cache with posix_fadvise, so
+every run reads them from storage again. Where that isn't available the
+runs are warm and only show the overlap with matching.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import corpus  # noqa: E402
+from pattern_seek.core import search_files  # noqa: E402
+
+ALL_TYPES = ["email", "guid", "date", "url", "ip"]
+
+CAN_DROP_CACHE = hasattr(os, "posix_fadvise")
+
+
+def drop_page_cache(paths: List[str]) -> None:
+    """Ask the kernel to forget the cached pages of the files."""
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            # written pages can only be dropped once they're on disk
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def time_search(directory: str, paths: List[str], threads: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        if CAN_DROP_CACHE:
+            drop_page_cache(paths)
+        start = time.perf_counter()
+        search_files(directory, ALL_TYPES, threads=threads)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=2000)
+    parser.add_argument("--max-threads", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--dir", help="write the files in a temporary directory under this one"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as temp_dir:
+        paths = corpus.write_corpus(temp_dir, args.files, args.lines, "log", "sparse")
+        size = sum(os.path.getsize(path) for path in paths)
+        cache_state = "cold" if CAN_DROP_CACHE else "warm (posix_fadvise unavailable)"
+        print(f"{args.files} files, {size / 1e6:.1f} MB, {cache_state} page cache")
+
+        serial = time_search(temp_dir, paths, 1, args.repeat)
+        print(f"serial      {serial:.3f}s  {size / 1e6 / serial:8.1f} MB/s")
+        threads = 2
+        while threads <= args.max_threads:
+            elapsed = time_search(temp_dir, paths, threads, args.repeat)
+            print(
+                f"threads={threads:<3} {elapsed:.3f}s  {size / 1e6 / elapsed:8.1f} MB/s"
+                f"  speedup {serial / elapsed:.2f}x"
+            )
+            threads *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Generate deterministic synthetic corpora for the benchmarks.
+
+Run from the repository root to write a corpus to disk:
+
+    python benchmarks/corpus.py OUTPUT_DIR [--files N] [--lines N] [--kind KIND]
+
+Every corpus is built from a seeded random generator, so the same
+arguments always give the same bytes. Kinds:
+
+- log: application-log lines, with each pattern type appearing on a
+  tunable fraction of the lines (see DENSITIES)
+- long-lines: a few lines of hundreds of kilobytes with sparse matches
+- adversarial: near misses built to make the patterns backtrack, e.g. long
+  runs of address characters before an @ that leads nowhere
+"""
+import argparse
+import os
+import random
+from typing import Dict, List, Optional
+
+# Fraction of log lines holding a match of each pattern type
+DENSITIES = {
+    "sparse": {
+        "email": 0.002,
+        "guid": 0.001,
+        "date": 0.002,
+        "url": 0.002,
+        "ipv4": 0.002,
+        "ipv6": 0.0005,
+    },
+    "dense": {
+        "email": 0.3,
+        "guid": 0.1,
+        "date": 0.2,
+        "url": 0.2,
+        "ipv4": 0.3,
+        "ipv6": 0.05,
+    },
+}
+
+KINDS = ["log", "long-lines", "adversarial"]
+
+LEVELS = ["INFO", "INFO", "INFO", "DEBUG", "WARN", "ERROR"]
+MESSAGES = [
+    "request handled in {n}ms",
+    "cache miss for key item_{n}",
+    "retrying job {n} after timeout",
+    "queue depth {n}",
+    "worker started",
+    "connection closed by peer",
+    "flushed {n} records",
+]
+WORDS = "request handler started finished queue worker retry value ok".split()
+MONTHS = [
+    "Jan",
+    "Feb",
+    "Mar",
+    "Apr",
+    "May",
+    "Jun",
+    "Jul",
+    "Aug",
+    "Sep",
+    "Oct",
+    "Nov",
+    "Dec",
+]
+
+
+def make_value(rng: random.Random, kind: str) -> str:
+    """Build a random value of one of the kinds in DENSITIES."""
+    if kind == "email":
+        domain = rng.choice(["example.com", "mail.example.org", "corp.io"])
+        return f"user{rng.randint(1, 99999)}@{domain}"
+    if kind == "guid":
+        return "-".join(
+            "".join(rng.choice("0123456789abcdef") for _ in range(size))
+            for size in (8, 4, 4, 4, 12)
+        )
+    if kind == "date":
+        year, month, day = (
+            rng.randint(1990, 2030),
+            rng.randint(1, 12),
+            rng.randint(1, 28),
+        )
+        return rng.choice([
+            f"{year}-{month:02d}-{day:02d}",
+            f"{month:02d}/{day:02d}/{year}",
+            f"{MONTHS[month - 1]} {day}, {year}",
+        ])
+    if kind == "url":
+        host = rng.choice(["example.com", "www.example.org"])
+        return f"https://{host}/items/{rng.randint(1, 99999)}?page={rng.randint(1, 9)}"
+    if kind == "ipv4":
+        return ".".join(str(rng.randint(0, 255)) for _ in range(4))
+    if kind == "ipv6":
+        return rng.choice([
+            f"2001:db8::{rng.randint(1, 0xffff):x}",
+            ":".join(f"{rng.randint(0, 0xffff):04x}" for _ in range(8)),
+        ])
+    raise ValueError(f"Unknown value kind: {kind}")
+
+
+def log_lines(num_lines: int, densities: Dict[str, float], seed: int = 0) -> List[str]:
+    """Application-log lines, each value kind appended to a line with its density."""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(num_lines):
+        message = rng.choice(MESSAGES).format(n=rng.randint(1, 9999))
+        line = f"{rng.choice(LEVELS)} [worker {rng.randint(1, 8)}] {message}"
+        for kind, density in densities.items():
+            if rng.random() < density:
+                line += f" {kind} {make_value(rng, kind)}"
+        lines.append(line)
+    return lines
+
+
+def long_lines(
+    num_lines: int, line_length: int = 256 * 1024, seed: int = 0
+) -> List[str]:
+    """Lines of about line_length characters of words, with a value every 4 KB or so."""
+    rng = random.Random(seed)
+    kinds = list(DENSITIES["sparse"])
+    lines = []
+    for _ in range(num_lines):
+        parts = []
+        length = 0
+        while length < line_length:
+            part = " ".join(rng.choice(WORDS) for _ in range(500))
+            part += f" {make_value(rng, rng.choice(kinds))}"
+            parts.append(part)
+            length += len(part) + 1
+        lines.append(" ".join(parts))
+    return lines
+
+
+def adversarial_lines(
+    num_lines: int, run_length: int = 2000, seed: int = 0
+) -> List[str]:
+    """Near misses for every pattern type, as runs of about run_length characters."""
+    rng = random.Random(seed)
+    builders = [
+        # address characters before an @ with no domain after it
+        lambda: "a.b-c" * (run_length // 5) + "@",
+        # many @ signs, with an underscore at the end for the email lookahead
+        lambda: "x@y " * (run_length // 4) + "_",
+        # digits and dots that never make four octets
+        lambda: "1." * (run_length // 2),
+        # hex and colons for the IPv6 alternatives
+        lambda: "a:" * (run_length // 2),
+        # a hex run too long to be a GUID
+        lambda: "0" * run_length,
+        # dates that stop one digit short
+        lambda: "12-" * (run_length // 3),
+        # URL starts without a domain
+        lambda: "www." * (run_length // 4),
+    ]
+    return [rng.choice(builders)() for _ in range(num_lines)]
+
+
+def generate(kind: str, num_lines: int, density: str = "sparse", seed: int = 0) -> str:
+    """
+    Generate a corpus as text.
+
+    Args:
+        kind: One of KINDS
+        num_lines: Number of lines
+        density: Key of DENSITIES, for the "log" kind
+        seed: Seed of the random generator
+
+    Returns:
+        The lines, each ending in a newline
+    """
+    if kind == "log":
+        lines = log_lines(num_lines, DENSITIES[density], seed)
+    elif kind == "long-lines":
+        lines = long_lines(num_lines, seed=seed)
+    elif kind == "adversarial":
+        lines = adversarial_lines(num_lines, seed=seed)
+    else:
+        raise ValueError(f"Unknown corpus kind: {kind}")
+    return "\n".join(lines) + "\n"
+
+
+def write_corpus(
+    directory: str,
+    files: int,
+    num_lines: int,
+    kind: str = "log",
+    density: str = "sparse",
+    seed: int = 0
+) -> List[str]:
+    """
+    Write a corpus of files, each with its own seed.
+
+    Args:
+        directory: Directory to write the files to (created if needed)
+        files: Number of files
+        num_lines: Number of lines per file
+        kind: One of KINDS
+        density: Key of DENSITIES, for the "log" kind
+        seed: Seed of the first file
+
+    Returns:
+        The paths of the files
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for idx in range(files):
+        path = os.path.join(directory, f"{kind}_{idx:06d}.txt")
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(generate(kind, num_lines, density, seed + idx))
+        paths.append(path)
+    return paths
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("output_dir")
+    parser.add_argument("--files", type=int, default=1)
+    parser.add_argument("--lines", type=int, default=100_000)
+    parser.add_argument("--kind", choices=KINDS, default="log")
+    parser.add_argument("--density", choices=sorted(DENSITIES), default="sparse")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    paths = write_corpus(
+        args.output_dir, args.files, args.lines, args.kind, args.density, args.seed
+    )
+    size_mb = sum(os.path.getsize(path) for path in paths) / 1e6
+    print(
+        f"Wrote {len(paths)} {args.kind} files, {size_mb:.1f} MB, to {args.output_dir}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Run the benchmark suite and compare it with a saved baseline.
+
+Run from the repository root:
+
+    python benchmarks/suite.py [--output results.json] [--compare baseline.json]
+                               [--scale X]
+
+Times find_pattern_matches (also with a line length limit and a pattern
+timeout), search_file (with each reader), search_files (serially and in
+threads) and format_matches on corpora from corpus.py: sparse and dense
+logs, long lines and adversarial near misses. Each case runs in a fresh process, so
+its peak RSS is its own, and reports the best of --repeat runs as MB/s of
+input and matches/s.
+
+With --compare, every case is checked against the baseline and the exit
+status is 1 if one got slower by more than --threshold, e.g. to catch a
+regression in regex_patterns.py:
+
+    python benchmarks/suite.py --output baseline.json
+    ... change the patterns ...
+    python benchmarks/suite.py --compare baseline.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import corpus  # noqa: E402
+from pattern_seek.core import search_file, search_files  # noqa: E402
+from pattern_seek.output import format_matches  # noqa: E402
+from pattern_seek.patterns import find_pattern_matches  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Bumped when cases change in a way that makes old baselines incomparable
+SUITE_VERSION = 1
+
+ALL_TYPES = ["email", "guid", "date", "url", "ip"]
+
+# Corpora written before the cases run: name -> (kind, density, files, lines)
+CORPORA = {
+    "log-sparse": ("log", "sparse", 1, 100_000),
+    "log-dense": ("log", "dense", 1, 20_000),
+    "long-lines": ("long-lines", "sparse", 1, 8),
+    "adversarial": ("adversarial", "sparse", 1, 200),
+    "many-files": ("log", "sparse", 500, 200),
+}
+
+# Case name -> (benchmarked function, corpus, options)
+CASES = {
+    "find_pattern_matches/log-sparse": ("find", "log-sparse", {}),
+    "find_pattern_matches/log-dense": ("find", "log-dense", {}),
+    "find_pattern_matches/long-lines": ("find", "long-lines", {}),
+    "find_pattern_matches/adversarial": ("find", "adversarial", {}),
+    "find_pattern_matches/guarded": (
+        "find", "adversarial", {"max_line_length": 100_000, "pattern_timeout": 0.05}
+    ),
+    "search_file/full": ("search_file", "log-sparse", {"reader": "full"}),
+    "search_file/stream": ("search_file", "log-sparse", {"reader": "stream"}),
+    "search_file/mmap": ("search_file", "log-sparse", {"reader": "mmap"}),
+    "search_files/many-files": ("search_files", "many-files", {}),
+    "search_files/threads": ("search_files", "many-files", {"threads": 4}),
+    "format_matches/log-dense": ("format", "log-dense", {}),
+}
+
+
+def corpus_directory(corpus_dir: str, name: str, scale: float) -> str:
+    # the scale is part of the name, so kept corpora of other sizes aren't reused
+    return os.path.join(corpus_dir, f"{name}-x{scale:g}")
+
+
+def corpus_paths(corpus_dir: str, name: str, scale: float) -> List[str]:
+    directory = corpus_directory(corpus_dir, name, scale)
+    return sorted(
+        os.path.join(directory, file_name) for file_name in os.listdir(directory)
+    )
+
+
+def write_corpora(corpus_dir: str, names: List[str], scale: float) -> None:
+    """Write the corpora of the named cases that aren't in corpus_dir yet."""
+    for name in sorted({CASES[case][1] for case in names}):
+        kind, density, files, lines = CORPORA[name]
+        directory = corpus_directory(corpus_dir, name, scale)
+        if not os.path.isdir(directory):
+            corpus.write_corpus(
+                directory, files, max(1, int(lines * scale)), kind, density
+            )
+
+
+def prepare_case(
+    name: str, corpus_dir: str, scale: float
+) -> Tuple[Callable[[], int], int]:
+    """
+    Set up a case.
+
+    Returns:
+        A function running the case once and returning the number of
+        matches, and the number of bytes it processes (the input, or the
+        output for format_matches)
+    """
+    function, corpus_name, options = CASES[name]
+    paths = corpus_paths(corpus_dir, corpus_name, scale)
+    size = sum(os.path.getsize(path) for path in paths)
+
+    if function == "find":
+        with open(paths[0], encoding="utf-8") as f:
+            text = f.read()
+        return lambda: len(find_pattern_matches(text, ALL_TYPES, **options)), size
+    if function == "search_file":
+        return lambda: len(search_file(paths[0], ALL_TYPES, **options)), size
+    if function == "search_files":
+        directory = os.path.dirname(paths[0])
+        return (
+            lambda: sum(
+                len(result.get("matches", ()))
+                for result in search_files(directory, ALL_TYPES, **options)
+            ),
+            size,
+        )
+    if function == "format":
+        matches = search_file(paths[0], ALL_TYPES)
+
+        def format_all() -> int:
+            format_matches(matches, colored=False)
+            return len(matches)
+
+        return format_all, len(format_matches(matches, colored=False).encode("utf-8"))
+    raise ValueError(f"Unknown benchmark function: {function}")
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB, where it can be measured."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_case(name: str, corpus_dir: str, scale: float, repeat: int) -> Dict:
+    """Run one case, in a process of its own."""
+    run, size = prepare_case(name, corpus_dir, scale)
+    matches = run()
+    seconds = min(timeit.repeat(run, number=1, repeat=repeat))
+    return {
+        "seconds": round(seconds, 6),
+        "bytes": size,
+        "mb_per_s": round(size / 1e6 / seconds, 3),
+        "matches": matches,
+        "matches_per_s": round(matches / seconds, 1),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """
+    Print each case next to its baseline.
+
+    Returns:
+        The names of the cases that got slower by more than threshold
+    """
+    if baseline.get("version") != SUITE_VERSION:
+        print(
+            f"Baseline is from suite version {baseline.get('version')}, not "
+            f"{SUITE_VERSION}"
+        )
+    regressions = []
+    print(f"\n{'case':<36} {'baseline':>10} {'now':>10} {'change':>8}")
+    for name, result in results["cases"].items():
+        old = baseline.get("cases", {}).get(name)
+        if old is None:
+            print(f"{name:<36} {'-':>10} {result['seconds']:>9.3f}s")
+            continue
+        change = result["seconds"] / old["seconds"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  SLOWER"
+        elif result["matches"] != old["matches"]:
+            flag = f"  matches {old['matches']} -> {result['matches']}"
+        print(
+            f"{name:<36} {old['seconds']:>9.3f}s {result['seconds']:>9.3f}s "
+            f"{change:>+7.1%}{flag}"
+        )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file from an earlier --output")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="slowdown that counts as a regression (0.1 = 10%%)",
+    )
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="multiply the corpus sizes"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--corpus-dir",
+        help="keep the corpora here between runs instead of a temporary directory",
+    )
+    parser.add_argument(
+        "--case", action="append", choices=sorted(CASES), help="run only these cases"
+    )
+    args = parser.parse_args()
+
+    names = args.case or list(CASES)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        corpus_dir = args.corpus_dir or temp_dir
+        write_corpora(corpus_dir, names, args.scale)
+
+        results = {
+            "version": SUITE_VERSION,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "cases": {},
+        }
+        print(
+            f"{'case':<36} {'seconds':>9} {'MB/s':>9} {'matches/s':>12} "
+            f"{'peak RSS':>10}"
+        )
+        context = multiprocessing.get_context("spawn")
+        for name in names:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(
+                    run_case, name, corpus_dir, args.scale, args.repeat
+                ).result()
+            results["cases"][name] = result
+            rss = (
+                f"{result['peak_rss_mb']:.0f} MB"
+                if result["peak_rss_mb"] is not None
+                else "-"
+            )
+            print(
+                f"{name:<36} {result['seconds']:>8.3f}s {result['mb_per_s']:>9.1f}"
+                f" {result['matches_per_s']:>12,.0f} {rss:>10}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(
+                f"\n{len(regressions)} case(s) slower than the baseline by more than "
+                f"{args.threshold:.0%}"
+            )
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+try:
+    # optional C implementation of the automaton (pip install pyahocorasick)
+    import ahocorasick
+except ImportError:  # pragma: no cover - depends on the environment
+    ahocorasick = None
+
+# Whether TermMatcher runs on pyahocorasick rather than in pure Python
+ACCELERATED = ahocorasick is not None and bool(ahocorasick.unicode)
+
+# Characters case-insensitive matching treats as equal to an ASCII letter,
+# besides its other case
+_ASCII_CASE_EXTRAS = {"i": "İı", "k": "K", "s": "ſ"}
+
+# Every code point, searched to find the case variants of non-ASCII characters
+_ALL_CHARACTERS: Optional[str] = None
+
+class TermMatch:
+    """
+    A match of one of the terms, with the parts of the re.Match interface
+    the pattern scanners use.
+    """
+
+    __slots__ = ("string", "_start", "_end")
+
+    def __init__(self, string: str, start: int, end: int):
+        self.string = string
+        self._start = start
+        self._end = end
+
+    def start(self) -> int:
+        return self._start
+
+    def end(self) -> int:
+        return self._end
+
+    def span(self) -> Tuple[int, int]:
+        return self._start, self._end
+
+    def group(self, index: int = 0) -> str:
+        return self.string[self._start:self._end]
+
+class TermMatcher:
+    """
+    Finds any of a set of literal terms with an Aho-Corasick automaton, so
+    the cost of a scan grows with the text rather than the number of terms.
+
+    Matches are exactly those of the regular expression that tries the
+    escaped terms longest first, wrapped in ``\\b...\\b`` for whole words and
+    compiled with re.IGNORECASE unless case-sensitive: leftmost,
+    non-overlapping, and the longest term at each position. For a single
+    term that is the same as searching for it with ``re.escape``.
+
+    The pure-Python automaton is used unless pyahocorasick is installed.
+    """
+
+    def __init__(
+        self,
+        terms: Sequence[str],
+        case_sensitive: bool = False,
+        whole_word: bool = False,
+    ):
+        """
+        Args:
+            terms: The literal terms to search for; empty terms are ignored
+            case_sensitive: Whether matching is case-sensitive
+            whole_word: Whether matches must start and end at word boundaries
+
+        Raises:
+            ValueError: If there are no non-empty terms
+        """
+        self.terms = sorted(
+            {term for term in terms if term}, key=lambda term: (-len(term), term)
+        )
+        if not self.terms:
+            raise ValueError("At least one non-empty term is required")
+        self.case_sensitive = case_sensitive
+        self.whole_word = whole_word
+
+        # the equivalent regular expression
+        self.pattern = terms_pattern(self.terms, whole_word)
+        self.flags = 0 if case_sensitive else re.IGNORECASE
+
+        # replacements mapping the case variants of the term characters to
+        # one representative, applied after str.lower()
+        self._replacements: List[Tuple[str, str]] = []
+        if not case_sensitive:
+            for variants in _case_classes(self.terms):
+                lowered = sorted(set(_lower(variants)))
+                self._replacements.extend((char, lowered[0]) for char in lowered[1:])
+        folded_terms = {self._fold(term) for term in self.terms}
+
+        if ACCELERATED:
+            self._automaton = ahocorasick.Automaton()
+            for term in folded_terms:
+                self._automaton.add_word(term, len(term))
+            self._automaton.make_automaton()
+        else:
+            self._automaton = None
+            self._goto, self._outputs = _build_automaton(folded_terms)
+
+    def finditer(
+        self, string: str, pos: int = 0, endpos: Optional[int] = None
+    ) -> Iterator[TermMatch]:
+        """
+        Find the matches in string[pos:endpos], like re.Pattern.finditer.
+
+        As with re, word boundaries at pos look at the character before it,
+        while endpos acts as the end of the string.
+
+        Args:
+            string: The text to search
+            pos: Index to start searching at
+            endpos: Index to stop searching at (default: the end)
+
+        Yields:
+            The matches, in order
+        """
+        length = len(string)
+        endpos = length if endpos is None else min(max(endpos, 0), length)
+        pos = min(max(pos, 0), endpos)
+
+        folded = self._fold(string[pos:endpos])
+        if self._automaton is not None:
+            candidates = [
+                (pos + end + 1 - term_length, pos + end + 1)
+                for end, term_length in self._automaton.iter(folded)
+            ]
+        else:
+            candidates = self._scan(folded, pos)
+        # leftmost first, then longest
+        candidates.sort(key=lambda candidate: (candidate[0], -candidate[1]))
+
+        resume_at = pos
+        for start, end in candidates:
+            if start < resume_at:
+                continue
+            if self.whole_word and not (
+                _is_boundary(string, start, endpos)
+                and _is_boundary(string, end, endpos)
+            ):
+                continue
+            resume_at = end
+            yield TermMatch(string, start, end)
+
+    def _fold(self, string: str) -> str:
+        """
+        Map every character that matches a term character case-insensitively
+        to the same representative, keeping the length of the string.
+
+        Args:
+            string: Text or term to fold
+
+        Returns:
+            The folded string (unchanged when case-sensitive)
+        """
+        if self.case_sensitive:
+            return string
+        string = _lower(string)
+        for original, replacement in self._replacements:
+            if original in string:
+                string = string.replace(original, replacement)
+        return string
+
+    def _scan(self, folded: str, offset: int) -> List[Tuple[int, int]]:
+        """
+        Run the pure-Python automaton over folded text.
+
+        Args:
+            folded: The folded text
+            offset: Index of the folded text in the original string
+
+        Returns:
+            (start, end) of every occurrence of every term, overlapping ones
+            included, ordered by end
+        """
+        goto = self._goto
+        outputs = self._outputs
+        root = goto[0]
+        candidates = []
+        state = 0
+        for end, char in enumerate(folded, offset + 1):
+            # no state has a transition back to the root
+            state = goto[state].get(char) or root.get(char, 0)
+            if outputs[state]:
+                candidates.extend(
+                    (end - term_length, end) for term_length in outputs[state]
+                )
+        return candidates
+
+def terms_pattern(terms: Sequence[str], whole_word: bool = False) -> str:
+    """
+    Build the regular expression matching the same as a TermMatcher.
+
+    Args:
+        terms: The non-empty literal terms
+        whole_word: Whether matches must start and end at word boundaries
+
+    Returns:
+        The escaped terms as an alternation, longest first (a single term is
+        just escaped)
+    """
+    unique_terms = sorted(set(terms), key=lambda term: (-len(term), term))
+    if len(unique_terms) == 1:
+        source = re.escape(unique_terms[0])
+    else:
+        source = "(?:" + "|".join(re.escape(term) for term in unique_terms) + ")"
+    return fr'\b{source}\b' if whole_word else source
+
+def _build_automaton(
+    terms: Set[str],
+) -> Tuple[List[Dict[str, int]], List[Tuple[int, ...]]]:
+    """
+    Build the Aho-Corasick automaton for the terms.
+
+    The failure links are resolved ahead of time, except for the ones that
+    end at the root: a missing transition means "look the character up at
+    the root", which keeps the tables small.
+
+    Args:
+        terms: The (folded) terms
+
+    Returns:
+        The transitions of every state, and the lengths of the terms ending
+        in every state (longest first)
+    """
+    goto: List[Dict[str, int]] = [{}]
+    lengths: List[List[int]] = [[]]
+    for term in terms:
+        state = 0
+        for char in term:
+            child = goto[state].get(char)
+            if child is None:
+                child = len(goto)
+                goto[state][char] = child
+                goto.append({})
+                lengths.append([])
+            state = child
+        lengths[state].append(len(term))
+
+    # breadth first, so the failure state of a state is done before it
+    root = goto[0]
+    fail = [0] * len(goto)
+    queue = deque(root.values())
+    while queue:
+        state = queue.popleft()
+        lengths[state].extend(lengths[fail[state]])
+        for char, child in list(goto[state].items()):
+            queue.append(child)
+            fail[child] = goto[fail[state]].get(char) or root.get(char, 0)
+        # inherit the transitions of the failure state that don't start at the root
+        if fail[state]:
+            for char, target in goto[fail[state]].items():
+                goto[state].setdefault(char, target)
+
+    outputs = [tuple(sorted(state_lengths, reverse=True)) for state_lengths in lengths]
+    return goto, outputs
+
+def _case_classes(terms: Sequence[str]) -> List[str]:
+    """
+    Find the characters re.IGNORECASE treats as equal to each character of
+    the terms.
+
+    Args:
+        terms: The terms
+
+    Returns:
+        One string of equivalent characters per distinct character (ignoring
+        case) that has case variants
+    """
+    classes = {}
+    for char in set(_lower("".join(terms))):
+        variants = _case_variants(char)
+        if len(variants) > 1:
+            classes[variants[0]] = variants
+    return list(classes.values())
+
+@lru_cache(maxsize=None)
+def _case_variants(char: str) -> str:
+    """
+    Find the characters re.IGNORECASE treats as equal to a character.
+
+    Non-ASCII characters are looked up by searching every code point once,
+    which is slow enough that the results are kept.
+
+    Args:
+        char: A lowercase character
+
+    Returns:
+        The equivalent characters, including char itself, in code point order
+    """
+    global _ALL_CHARACTERS
+
+    if char.isascii():
+        return "".join(
+            sorted(set(char + char.upper() + _ASCII_CASE_EXTRAS.get(char, "")))
+        )
+    if _ALL_CHARACTERS is None:
+        _ALL_CHARACTERS = "".join(map(chr, range(0x110000)))
+    return "".join(re.findall(re.escape(char), _ALL_CHARACTERS, re.IGNORECASE))
+
+def _lower(string: str) -> str:
+    """
+    Lowercase a string without changing its length.
+
+    Args:
+        string: The string to lowercase
+
+    Returns:
+        str.lower() of the string, with İ (the only character whose
+        lowercase form is two characters long) lowered to i
+    """
+    if "İ" in string:
+        string = string.replace("İ", "i")
+    return string.lower()
+
+def _is_word(char: str) -> bool:
+    """
+    Check whether \\w matches a character in a str pattern.
+    """
+    return char.isalnum() or char == "_"
+
+def _is_boundary(string: str, index: int, endpos: int) -> bool:
+    """
+    Check whether \\b matches at an index when searching up to endpos.
+
+    Args:
+        string: The text searched
+        index: Position between two characters
+        endpos: Where the search stops; characters from here on don't count
+
+    Returns:
+        True if exactly one side of the position is a word character
+    """
+    before = index > 0 and _is_word(string[index - 1])
+    after = index < endpos and _is_word(string[index])
+    return before != after
@@ -0,0 +1,303 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+from pattern_seek.matches import MatchSet
+from pattern_seek.patterns import PATTERN_MAP
+
+# Bumped whenever the layout of cached results changes, so old entries miss
+CACHE_VERSION = 4
+
+# Cached results are evicted, least recently used first, once they take
+# up more than this many bytes
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+
+# Fingerprinted search options; the reader, chunk size and workers are left
+# out because they don't change the results
+QUERY_OPTIONS = [
+    "pattern_type",
+    "context_lines",
+    "text_pattern",
+    "case_sensitive",
+    "whole_word",
+    "max_count",
+    "max_line_length",
+    "long_lines",
+    "pattern_timeout",
+    "skip_binary",
+]
+
+# Errors of an unusable cache (e.g. an unwritable directory or a corrupt or
+# locked database), which make it fall back to searching without it
+_CACHE_ERRORS = (OSError, sqlite3.Error)
+
+def default_cache_path() -> str:
+    """
+    Get the path of the cache database, under $XDG_CACHE_HOME (or ~/.cache).
+
+    Returns:
+        Path to the SQLite file
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "pattern-seek", "results.sqlite")
+
+def query_fingerprint(search_options: Dict) -> str:
+    """
+    Fingerprint the query parts of search options.
+
+    The fingerprint covers the pattern types, text, case and whole-word flags,
+    context lines, match limit and binary skipping, plus the source of every regex
+    involved, so changing a built-in or pattern pack pattern invalidates the
+    entries that used it.
+
+    Args:
+        search_options: Keyword arguments for search_file, plus skip_binary
+
+    Returns:
+        A hex digest identifying the query
+    """
+    query = {option: search_options.get(option) for option in QUERY_OPTIONS}
+    pattern_types = query["pattern_type"]
+    if isinstance(pattern_types, str):
+        pattern_types = [pattern_types]
+    pattern_pack = search_options.get("pattern_pack")
+    query["sources"] = [
+        (
+            [
+                pattern_pack[pattern_type].pattern,
+                pattern_pack[pattern_type].prefilter_pattern,
+            ]
+            if pattern_pack is not None and pattern_type in pattern_pack
+            else PATTERN_MAP.get(pattern_type)
+        )
+        for pattern_type in pattern_types
+    ]
+    query["version"] = CACHE_VERSION
+
+    encoded = json.dumps(query, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+class ResultCache:
+    """
+    On-disk cache of per-file search results, backed by SQLite.
+
+    Entries are keyed by the file's absolute path and the query fingerprint,
+    and only served while the file's size, mtime_ns and inode are unchanged.
+    The database is opened on first use. If it can't be opened, read or
+    written, a warning is printed on stderr once and the cache stays empty
+    from then on, so searches go on without it.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_size: int = DEFAULT_CACHE_SIZE):
+        """
+        Args:
+            path: Path to the SQLite file (default: default_cache_path())
+            max_size: Number of bytes of cached results to keep when evicting
+        """
+        self.path = path or default_cache_path()
+        self.max_size = max_size
+        self._connection: Optional[sqlite3.Connection] = None
+        self._disabled = False
+        # (last used, path, fingerprint) of hits, written out in batches
+        self._hits: List[Tuple[float, str, str]] = []
+
+    def get(
+        self, file_path: str, fingerprint: str, stat: os.stat_result
+    ) -> Optional[Dict]:
+        """
+        Look up the cached result of a file.
+
+        Args:
+            file_path: Path to the file
+            fingerprint: Query fingerprint from query_fingerprint
+            stat: Current os.stat() of the file
+
+        Returns:
+            The cached result without the file path (its "matches" or why it
+            was "skipped"), or None if there is none for this version of
+            the file
+        """
+        connection = self._connect()
+        if connection is None:
+            return None
+        try:
+            row = connection.execute(
+                "SELECT size, mtime_ns, inode, result FROM results "
+                "WHERE path = ? AND fingerprint = ?",
+                (os.path.abspath(file_path), fingerprint),
+            ).fetchone()
+        except _CACHE_ERRORS as e:
+            self._disable(e)
+            return None
+        identity = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        if row is None or tuple(row[:3]) != identity:
+            return None
+
+        self._hits.append((time.time(), os.path.abspath(file_path), fingerprint))
+        result = json.loads(row[3])
+        if isinstance(result.get("matches"), dict):
+            result["matches"] = MatchSet.from_columns(result["matches"])
+        return result
+
+    def put(
+        self, file_path: str, fingerprint: str, stat: os.stat_result, result: Dict
+    ) -> None:
+        """
+        Store the result of a file, replacing older entries for the query.
+
+        Args:
+            file_path: Path to the file
+            fingerprint: Query fingerprint from query_fingerprint
+            stat: os.stat() of the file taken before it was searched
+            result: The file's result from search_files; the path isn't stored
+        """
+        result = {key: value for key, value in result.items() if key != "file"}
+        if isinstance(result.get("matches"), MatchSet):
+            # stored column by column, the way MatchSet keeps them
+            result["matches"] = result["matches"].to_columns()
+        encoded = json.dumps(result, separators=(",", ":"))
+        connection = self._connect()
+        if connection is None:
+            return
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        os.path.abspath(file_path),
+                        fingerprint,
+                        stat.st_size,
+                        stat.st_mtime_ns,
+                        stat.st_ino,
+                        encoded,
+                        len(encoded),
+                        time.time()
+                    )
+                )
+        except _CACHE_ERRORS as e:
+            self._disable(e)
+
+    def evict(self) -> int:
+        """
+        Drop least recently used entries until the cache fits in max_size.
+
+        Returns:
+            Number of entries dropped
+        """
+        connection = self._connect()
+        if connection is None:
+            return 0
+        try:
+            self._write_hits()
+            total = connection.execute(
+                "SELECT COALESCE(SUM(bytes), 0) FROM results"
+            ).fetchone()[0]
+            if total <= self.max_size:
+                return 0
+
+            dropped = []
+            for path, fingerprint, size in connection.execute(
+                "SELECT path, fingerprint, bytes FROM results ORDER BY last_used"
+            ).fetchall():
+                if total <= self.max_size:
+                    break
+                dropped.append((path, fingerprint))
+                total -= size
+
+            with connection:
+                connection.executemany(
+                    "DELETE FROM results WHERE path = ? AND fingerprint = ?",
+                    dropped
+                )
+        except _CACHE_ERRORS as e:
+            self._disable(e)
+            return 0
+        return len(dropped)
+
+    def close(self) -> None:
+        """
+        Close the database connection, if open.
+        """
+        if self._connection is not None:
+            try:
+                self._write_hits()
+            except _CACHE_ERRORS as e:
+                self._disable(e)
+                return
+            self._connection.close()
+            self._connection = None
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """
+        Open the database on first use, creating it if needed.
+
+        Returns:
+            The connection, or None if the cache is unusable
+        """
+        if self._connection is None and not self._disabled:
+            connection = None
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                # concurrent runs may share the database; asearch_files uses
+                # the connection from a thread of its own, one call at a time
+                connection = sqlite3.connect(
+                    self.path, timeout=30, check_same_thread=False
+                )
+                connection.execute("PRAGMA journal_mode=WAL")
+                # commits don't wait for the disk, a crash can only lose entries
+                connection.execute("PRAGMA synchronous=NORMAL")
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS results ("
+                    "path TEXT, fingerprint TEXT, "
+                    "size INTEGER, mtime_ns INTEGER, inode INTEGER, "
+                    "result TEXT, bytes INTEGER, last_used REAL, "
+                    "PRIMARY KEY (path, fingerprint))"
+                )
+            except _CACHE_ERRORS as e:
+                if connection is not None:
+                    connection.close()
+                self._disable(e)
+                return None
+            self._connection = connection
+        return self._connection
+
+    def _disable(self, error: Exception) -> None:
+        """
+        Stop using the cache after an error, warning about it on stderr.
+
+        Args:
+            error: The error that made the cache unusable
+        """
+        if not self._disabled:
+            sys.stderr.write(
+                f"Warning: not using the result cache {self.path}: {error}\n"
+            )
+        self._disabled = True
+        self._hits = []
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except sqlite3.Error:
+                pass
+            self._connection = None
+
+    def _write_hits(self) -> None:
+        """
+        Record when the entries hit since the last call were used.
+        """
+        if not self._hits:
+            return
+        with self._connection:
+            self._connection.executemany(
+                "UPDATE results SET last_used = ? WHERE path = ? AND fingerprint = ?",
+                self._hits
+            )
+        self._hits = []
@@ -1,24 +1,131 @@
 import os
 import sys
 import click
-from typing import List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, TextIO
 
-from pattern_seek.core import search_files
-from pattern_seek.output import print_matches
+from pattern_seek.core import READERS, iter_search_files
+from pattern_seek.matches import Guarded
+from pattern_seek.output import MatchWriter
+from pattern_seek.patterns import LONG_LINE_POLICIES
 
-@click.command()
+if TYPE_CHECKING:  # imported by the options that use them, for a fast start
+    from pattern_seek.index import TrigramIndex
+    from pattern_seek.packs import PatternPack
+
+# Built-in pattern types searched for by default (and with --pattern all)
+PATTERN_TYPES = ['email', 'guid', 'date', 'url', 'ip']
+
+# Size suffixes accepted by --max-filesize
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+# Output formats (pattern_seek.formats.FORMATS, without importing the record
+# writers for "text")
+OUTPUT_FORMATS = ["text", "jsonl", "csv", "ndjson-compact"]
+
+# File each directory's index is kept in (pattern_seek.index.INDEX_FILE_NAME)
+INDEX_FILE_NAME = ".pattern-seek-index"
+
+# Lines of a file that weren't fully searched are reported on stderr, up to
+# this many per file
+GUARDED_REPORT_LIMIT = 5
+
+# What happened to a line that wasn't fully searched, by reason
+GUARDED_MESSAGES = {
+    "truncated": (
+        "line longer than {max_line_length} characters, searched up to there only"
+    ),
+    "skipped": "line longer than {max_line_length} characters, not searched",
+    "windowed": "line longer than {max_line_length} characters, searched in windows",
+    "timeout": (
+        "{pattern_type} pattern gave up after {pattern_timeout:g}s, "
+        "rest of the line not searched for it"
+    ),
+}
+
+def _parse_size(
+    ctx: click.Context, param: click.Parameter, value: Optional[str]
+) -> Optional[int]:
+    """
+    Parse a size like 512, 100K, 10M or 1G into a number of bytes.
+
+    Args:
+        ctx: Click context
+        param: The option being parsed
+        value: The size given on the command line
+
+    Returns:
+        The size in bytes, or None if the option wasn't given
+    """
+    if value is None:
+        return None
+    number, unit = value[:-1], value[-1:].upper()
+    if unit.isdigit():
+        number, unit = value, ""
+    if unit not in SIZE_UNITS or not number.isdigit():
+        raise click.BadParameter(f"Invalid size: {value}")
+    return int(number) * SIZE_UNITS[unit]
+
+class _DefaultGroup(click.Group):
+    """
+    Command group that runs the search command unless a subcommand is named,
+    so pattern-seek PATHS keeps working next to pattern-seek index build.
+
+    A first argument naming both a subcommand and an existing path is
+    searched as a path, unless it's followed by one of the subcommand's own
+    subcommands (as in index build).
+    """
+
+    def parse_args(self, ctx: click.Context, args: List[str]) -> List[str]:
+        if not args or not self._names_subcommand(args):
+            args = ["search"] + list(args)
+        return super().parse_args(ctx, args)
+
+    def _names_subcommand(self, args: List[str]) -> bool:
+        command = self.commands.get(args[0])
+        if command is None:
+            return False
+        if not os.path.exists(args[0]):
+            return True
+        subcommand = args[1] if len(args) > 1 else None
+        return isinstance(command, click.Group) and subcommand in command.commands
+
+@click.group(cls=_DefaultGroup)
+def main() -> None:
+    """
+    Pattern-seek: Search text files for specific patterns.
+    """
+
+@main.command()
 @click.argument('paths', nargs=-1, required=True)
 @click.option(
     '--pattern', '-p', 
-    type=click.Choice(['email', 'guid', 'date', 'url', 'ip', 'text', 'all']),
     multiple=True,
-    default=['all'],
-    help='Pattern types to search for'
+    help=(
+        f'Pattern types to search for: {", ".join(PATTERN_TYPES)}, text, all '
+        '(default), or one from --patterns-file'
+    )
+)
+@click.option(
+    '--patterns-file',
+    type=click.Path(exists=True, dir_okay=False),
+    help=(
+        'Pattern pack of named regexes (TOML or JSON) to search for, instead of the '
+        'built-in patterns unless --pattern says otherwise'
+    )
 )
 @click.option(
     '--text', '-t',
     type=str,
-    help='Text pattern to search for when using the "text" pattern type'
+    multiple=True,
+    help=(
+        'Text pattern to search for when using the "text" pattern type; repeat to '
+        'search for any of several'
+    )
+)
+@click.option(
+    '--text-file',
+    type=click.File('r', encoding='utf-8'),
+    help='File of text patterns to search for, one per line (blank lines are ignored)'
 )
 @click.option(
     '--case-sensitive', '-c',
@@ -36,18 +143,184 @@ from pattern_seek.output import print_matches
     default=0,
     help='Number of context lines to include before and after matches'
 )
+@click.option(
+    '--reader',
+    type=click.Choice(READERS),
+    default='full',
+    help=(
+        'How to read files: "full" loads each file at once, "stream" reads it in '
+        'chunks to bound memory, "mmap" searches the memory-mapped bytes'
+    )
+)
+@click.option(
+    '--jobs', '-j',
+    type=click.IntRange(min=0),
+    default=1,
+    help=(
+        'Number of processes to search files in, large files are split across them (0 '
+        'means one per CPU)'
+    )
+)
+@click.option(
+    '--threads',
+    type=click.IntRange(min=0),
+    default=1,
+    help=(
+        'Number of threads to read and search files in, so slow reads overlap with '
+        'searching (0 means one per CPU, ignored with --jobs)'
+    )
+)
+@click.option(
+    '--recursive', '-r',
+    is_flag=True,
+    help='Search directories recursively'
+)
+@click.option(
+    '--include',
+    multiple=True,
+    help='Only search files matching this glob in directories (repeatable)'
+)
+@click.option(
+    '--exclude',
+    multiple=True,
+    help='Skip files and directories matching this glob in directories (repeatable)'
+)
+@click.option(
+    '--ignore-file',
+    multiple=True,
+    help=(
+        'Honour .gitignore-style rules from files with this name, e.g. .gitignore '
+        '(repeatable)'
+    )
+)
+@click.option(
+    '--max-filesize',
+    callback=_parse_size,
+    help='Skip files in directories larger than this size, e.g. 10M'
+)
+@click.option(
+    '--max-depth',
+    type=click.IntRange(min=0),
+    help='Maximum depth of subdirectories to search when recursive'
+)
+@click.option(
+    '--follow', '-L',
+    is_flag=True,
+    help='Follow symlinked directories when searching recursively'
+)
+@click.option(
+    '--binary', '-a',
+    is_flag=True,
+    help='Search binary files too, instead of skipping them'
+)
+@click.option(
+    '--no-cache',
+    is_flag=True,
+    help='Search every file again instead of reusing cached results for unchanged files'
+)
+@click.option(
+    '--index', 'use_index',
+    is_flag=True,
+    help=(
+        'Skip files that can\'t match using the index built by "pattern-seek index '
+        f'build" ({INDEX_FILE_NAME} in each directory searched)'
+    )
+)
+@click.option(
+    '--count',
+    is_flag=True,
+    help='Print the number of matches in each file instead of the matches'
+)
+@click.option(
+    '--files-with-matches', '-l',
+    is_flag=True,
+    help=(
+        'Print only the paths of files with matches, stopping at the first match in '
+        'each'
+    )
+)
+@click.option(
+    '--max-count', '-m',
+    type=click.IntRange(min=1),
+    help='Stop searching a file after this many matches'
+)
+@click.option(
+    '--quiet', '-q',
+    is_flag=True,
+    help=(
+        'Print nothing and stop at the first match; the exit status tells whether '
+        'there was one'
+    )
+)
+@click.option(
+    '--max-line-length',
+    type=click.IntRange(min=1),
+    help=(
+        'Search lines longer than this many characters according to --long-lines, '
+        'reporting them on stderr'
+    )
+)
+@click.option(
+    '--long-lines',
+    type=click.Choice(LONG_LINE_POLICIES),
+    default='truncate',
+    help=(
+        'How to search lines longer than --max-line-length: only up to the limit, not '
+        'at all, or in overlapping windows'
+    )
+)
+@click.option(
+    '--pattern-timeout',
+    type=click.FloatRange(min=0, min_open=True),
+    help=(
+        'Seconds a pattern may spend on one line before giving up on the rest of it, '
+        'reporting the line on stderr'
+    )
+)
+@click.option(
+    '--format', 'output_format',
+    type=click.Choice(OUTPUT_FORMATS),
+    default='text',
+    help=(
+        'Output format: colored "text", or records for programs: "jsonl" objects, '
+        '"csv" rows or "ndjson-compact" arrays, with byte offsets and a record per file'
+    )
+)
 @click.option(
     '--no-color',
     is_flag=True,
     help='Disable colored output'
 )
-def main(
+def search(
     paths: List[str],
     pattern: List[str],
-    text: Optional[str],
+    patterns_file: Optional[str],
+    text: List[str],
+    text_file: Optional[TextIO],
     case_sensitive: bool,
     whole_word: bool,
     context: int,
+    reader: str,
+    jobs: int,
+    threads: int,
+    recursive: bool,
+    include: List[str],
+    exclude: List[str],
+    ignore_file: List[str],
+    max_filesize: Optional[int],
+    max_depth: Optional[int],
+    follow: bool,
+    binary: bool,
+    no_cache: bool,
+    use_index: bool,
+    count: bool,
+    files_with_matches: bool,
+    max_count: Optional[int],
+    quiet: bool,
+    max_line_length: Optional[int],
+    long_lines: str,
+    pattern_timeout: Optional[float],
+    output_format: str,
     no_color: bool
 ) -> None:
     """
@@ -55,49 +328,237 @@ def main(
     
     PATHS: One or more files or directories to search.
     Wildcards are supported, e.g., *.txt
+
+    Run "pattern-seek index build DIR" to index a directory for --index.
     """
     
+    # Load the pattern pack, checked and cached on first use
+    pattern_pack = None
+    if patterns_file is not None:
+        from pattern_seek.packs import load_pattern_pack
+        try:
+            pattern_pack = load_pattern_pack(patterns_file)
+        except (OSError, ValueError) as e:
+            click.echo(f"Error: {e}", err=True)
+            sys.exit(1)
+
      # Determine which patterns to search for
-    if 'all' in pattern:
-        pattern_types = ['email', 'guid', 'date', 'url', 'ip']
-    else:
-        pattern_types = list(pattern)
+    pattern_types = _select_pattern_types(list(pattern), pattern_pack)
         
+    # Collect the text patterns from the command line and the text file
+    terms = list(text)
+    if text_file is not None:
+        terms.extend(line.rstrip('\r\n') for line in text_file)
+    terms = [term for term in terms if term]
+
     # Check if text search is required but no pattern provided
-    if 'text' in pattern_types and not text:
+    if 'text' in pattern_types and not terms:
         click.echo("Error: Text pattern must be provided when searching for 'text' pattern type.", err=True)
         sys.exit(1)
         
-    # Process each path
-    all_results = []
-    fall_results = []
+    # Without the matches printed there's no need for their context, and
+    # knowing whether a file matches only takes its first match
+    if count or files_with_matches or quiet:
+        context = 0
+    if files_with_matches or quiet:
+        max_count = 1
+
+    # Reuse the results of unchanged files from earlier runs
+    cache = None
+    if not no_cache:
+        from pattern_seek.cache import ResultCache
+        cache = ResultCache()
+
+    # Write straight to the binary stdout; colorama would strip the colors
+    # when stdout isn't a terminal, so don't produce them in the first place
+    records = output_format != "text"
+    if records:
+        from pattern_seek.formats import create_writer
+        writer = create_writer(output_format, sys.stdout.buffer)
+    else:
+        writer = MatchWriter(
+            sys.stdout.buffer,
+            colored=not no_color and sys.stdout.isatty(),
+            encoding=sys.stdout.encoding or "utf-8"
+        )
+    if count:
+        write_result = writer.write_count
+    elif files_with_matches:
+        write_result = writer.write_file_name
+    else:
+        write_result = writer.write_result
+
+    # Process each path, printing each file's results as soon as they're ready
+    files_found = 0
+    files_skipped = 0
+    has_matches = False
     for path in paths:
+        if quiet and has_matches:
+            break
         try:
-            results = search_files(
+            index = _load_index(path) if use_index else None
+            for result in iter_search_files(
                 path, 
                 pattern_types, 
                 context_lines=context,
-                text_pattern=text,
+                text_pattern=terms,
                 case_sensitive=case_sensitive,
-                whole_word=whole_word
-            )
-            all_results.extend(results)
+                whole_word=whole_word,
+                reader=reader,
+                workers=jobs,
+                threads=threads,
+                recursive=recursive,
+                include=list(include),
+                exclude=list(exclude),
+                ignore_files=list(ignore_file),
+                max_file_size=max_filesize,
+                max_depth=max_depth,
+                follow_symlinks=follow,
+                skip_binary=not binary,
+                cache=cache,
+                index=index,
+                max_count=max_count,
+                max_line_length=max_line_length,
+                long_lines=long_lines,
+                pattern_timeout=pattern_timeout,
+                pattern_pack=pattern_pack
+            ):
+                if "skipped" in result:
+                    files_skipped += 1
+                    if records and not quiet:
+                        write_result(result)
+                    continue
+                files_found += 1
+                has_matches = has_matches or len(result.get("matches", [])) > 0
+                if quiet:
+                    if has_matches:
+                        break
+                    continue
+                guarded = getattr(result.get("matches"), "guarded", None)
+                if guarded:
+                    _report_guarded(result["file"], guarded, {
+                        "max_line_length": max_line_length,
+                        "pattern_timeout": pattern_timeout,
+                    })
+                write_result(result)
+                if not records:
+                    writer.flush()
         except Exception as e:
             click.echo(f"Error processing {path}: {str(e)}", err=True)
-            
-    # Print results
-    if all_results:
-        print_matches(all_results, colored=not no_color, include_file_info=True)
-    else:
+            # records report the path as a file that couldn't be searched
+            if records and not quiet:
+                write_result({"file": path, "error": str(e)})
+
+    if cache is not None:
+        cache.close()
+
+    if quiet:
+        pass
+    elif records:
+        writer.finish()
+        writer.flush()
+    elif not files_found:
         click.echo("No matches found.")
+    if files_skipped and not quiet:
+        plural = "s" if files_skipped != 1 else ""
+        click.echo(f"Skipped {files_skipped} binary file{plural}.", err=True)
         
     # Return non-zero exit code if no matches were found
-    has_matches = any(
-        len(result.get("matches", [])) > 0 
-        for result in all_results
-    )
     if not has_matches:
         sys.exit(1)
         
+def _select_pattern_types(
+    pattern: List[str], pattern_pack: Optional["PatternPack"]
+) -> List[str]:
+    """
+    Turn the --pattern options into the pattern types to search for.
+
+    Args:
+        pattern: The pattern types given, possibly "all" or none
+        pattern_pack: The pack from --patterns-file, if any
+
+    Returns:
+        The pattern types; a pack's types without --pattern, and every
+        type with "all"
+    """
+    pack_types = pattern_pack.names if pattern_pack is not None else []
+    if not pattern:
+        pattern = pack_types or ['all']
+
+    known = PATTERN_TYPES + ['text', 'all'] + pack_types
+    for pattern_type in pattern:
+        if pattern_type not in known:
+            raise click.BadParameter(
+                f"Unknown pattern type {pattern_type!r}, choose from: "
+                f"{', '.join(known)}",
+                param_hint="'--pattern' / '-p'"
+            )
+
+    if 'all' in pattern:
+        return PATTERN_TYPES + pack_types
+    return list(pattern)
+
+def _report_guarded(file_path: str, guarded: List[Guarded], limits: Dict) -> None:
+    """
+    Tell on stderr which lines of a file weren't fully searched, and why.
+
+    Args:
+        file_path: Path to the file
+        guarded: Its guarded lines, from MatchSet.guarded
+        limits: The max_line_length and pattern_timeout of the search
+    """
+    for line, pattern_type, reason in guarded[:GUARDED_REPORT_LIMIT]:
+        message = GUARDED_MESSAGES[reason].format(pattern_type=pattern_type, **limits)
+        click.echo(f"{file_path}:{line}: {message}", err=True)
+    if len(guarded) > GUARDED_REPORT_LIMIT:
+        more = len(guarded) - GUARDED_REPORT_LIMIT
+        click.echo(f"{file_path}: ... and {more} more", err=True)
+
+def _load_index(path: str) -> Optional["TrigramIndex"]:
+    """
+    Load the index of a directory being searched, if it has one.
+
+    Args:
+        path: The path being searched
+
+    Returns:
+        The directory's index, or None if the path isn't a directory or
+        hasn't been indexed
+    """
+    index_path = os.path.join(path, INDEX_FILE_NAME)
+    if not os.path.isdir(path):
+        return None
+    if not os.path.isfile(index_path):
+        click.echo(
+            f"No index in {path}, run: pattern-seek index build {path}", err=True
+        )
+        return None
+    from pattern_seek.index import TrigramIndex
+    return TrigramIndex.load(index_path)
+
+@main.group()
+def index() -> None:
+    """
+    Build trigram indexes that let searches skip files that can't match.
+    """
+
+@index.command()
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option(
+    '--rebuild',
+    is_flag=True,
+    help='Read every file again instead of only new and changed ones'
+)
+def build(directory: str, rebuild: bool) -> None:
+    """
+    Build or update the index of DIRECTORY, searched with --index.
+    """
+    from pattern_seek.index import build_index
+    stats = build_index(directory, rebuild=rebuild)
+    click.echo(
+        f"Indexed {stats['files']} files into {stats['path']} "
+        f"({stats['updated']} new or changed, {stats['removed']} removed)"
+    )
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
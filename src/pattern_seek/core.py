@@ -1,17 +1,84 @@
 import os
+import functools
 import glob
-from typing import Dict, List, Union, Optional
+import mmap
+from array import array
+from collections import deque
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Sequence,
+    TextIO,
+    Tuple,
+    Union,
+    Optional,
+)
 
-from pattern_seek.patterns import find_pattern_matches
+from pattern_seek.matches import MatchSet, MatchView
+from pattern_seek.patterns import (
+    count_line_breaks,
+    decode_line,
+    find_pattern_matches,
+    find_pattern_matches_bytes,
+)
+from pattern_seek.walker import is_binary_file, walk_files
+
+if TYPE_CHECKING:  # imported where used, to keep the CLI's startup fast
+    from concurrent.futures import Executor, Future
+    from pattern_seek.cache import ResultCache
+    from pattern_seek.index import TrigramIndex
+    from pattern_seek.packs import PatternPack
+
+# Readers search_file can use to get at the file content
+READERS = ["full", "stream", "mmap"]
+
+# Number of characters read at a time by the streaming reader
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# Files of at least twice MIN_RANGE_SIZE bytes are split across worker
+# processes in line-aligned ranges of MIN_RANGE_SIZE to MAX_RANGE_SIZE bytes
+MIN_RANGE_SIZE = 16 * 1024 * 1024
+MAX_RANGE_SIZE = 64 * 1024 * 1024
+
+# Small files are sent to worker processes in batches of about this many
+# bytes (or at most this many files), so they share one round trip
+BATCH_SIZE = 4 * 1024 * 1024
+BATCH_MAX_FILES = 256
+
+# Number of files asearch_files searches at once by default
+DEFAULT_ASYNC_CONCURRENCY = 8
+
+# When searching in threads, up to this many files per thread are read and
+# searched ahead of the one whose result is yielded next, so memory stays
+# bounded however many files there are
+THREAD_PREFETCH = 2
+
+# Likewise, when searching in worker processes, up to this many tasks (a
+# batch of files or a range of one) per worker are planned and submitted
+# ahead of the one whose results are yielded next
+PROCESS_PREFETCH = 2
 
 def search_file(
     file_path: str,
     pattern_type: Union[str, List[str]],
     context_lines: int = 0,
-    text_pattern: Optional[str] = None,
+    text_pattern: Optional[Union[str, Sequence[str]]] = None,
     case_sensitive: bool = False,
-    whole_word: bool = False
-) -> List[Dict]:
+    whole_word: bool = False,
+    reader: str = "full",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = 1,
+    max_count: Optional[int] = None,
+    max_line_length: Optional[int] = None,
+    long_lines: str = "truncate",
+    pattern_timeout: Optional[float] = None,
+    pattern_pack: Optional["PatternPack"] = None
+) -> MatchSet:
     """
     Search a file for patterns of the specified type(s).
     
@@ -19,13 +86,237 @@ def search_file(
         file_path: Path to the file to search
         pattern_type: Type(s) of patterns to search for
         context_lines: Number of lines to include before and after each match
-        text_pattern: Optional text to search for (for regular text search)
+        text_pattern: Optional text to search for (for regular text search),
+            or a list of terms to search for any of
         case_sensitive: Whether text search should be case-sensitive
         whole_word: Whether to match whole words only for text search
+        reader: How to read the file: "full" reads it into memory at once,
+            "stream" reads it in line-aligned chunks so memory stays bounded,
+            "mmap" memory-maps it and searches the raw bytes (falling back to
+            "full" when the search can't be done on bytes)
+        chunk_size: Number of characters per chunk for the "stream" reader
+        workers: Number of processes to split the file across (0 means one
+            per CPU). Files smaller than 2 * MIN_RANGE_SIZE are not split;
+            split files are read in line-aligned ranges and reader is ignored.
+        max_count: Stop searching the file after this many matches (see
+            find_pattern_matches); files aren't split across workers then
+        max_line_length: Search lines longer than this many characters
+            according to long_lines (see find_pattern_matches)
+        long_lines: How to search those lines: "truncate", "skip" or
+            "window"
+        pattern_timeout: Seconds a pattern type may spend on a line before
+            the rest of the line is given up on (see find_pattern_matches).
+            With a line length limit or a timeout, the "mmap" reader falls
+            back to "full".
+        pattern_pack: Pattern pack (see pattern_seek.packs) defining more
+            pattern types; the "mmap" reader falls back to "full" for them
         
     Returns:
-        A list of dictionaries containing information about each match
+        A MatchSet, whose items read like dictionaries with information
+        about each match
+    """
+    return _concat_match_sets(_iter_match_sets(
+        file_path,
+        pattern_type,
+        context_lines,
+        text_pattern=text_pattern,
+        case_sensitive=case_sensitive,
+        whole_word=whole_word,
+        reader=reader,
+        chunk_size=chunk_size,
+        workers=workers,
+        max_count=max_count,
+        max_line_length=max_line_length,
+        long_lines=long_lines,
+        pattern_timeout=pattern_timeout,
+        pattern_pack=pattern_pack
+    ))
+
+def iter_search_file(
+    file_path: str,
+    pattern_type: Union[str, List[str]],
+    context_lines: int = 0,
+    text_pattern: Optional[Union[str, Sequence[str]]] = None,
+    case_sensitive: bool = False,
+    whole_word: bool = False,
+    reader: str = "full",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = 1,
+    max_count: Optional[int] = None,
+    max_line_length: Optional[int] = None,
+    long_lines: str = "truncate",
+    pattern_timeout: Optional[float] = None,
+    pattern_pack: Optional["PatternPack"] = None
+) -> Iterator[MatchView]:
     """
+    Search a file for patterns of the specified type(s), yielding matches
+    as they are found.
+
+    With the "stream" reader, or when the file is split across workers,
+    matches are yielded chunk by chunk as soon as their context is complete,
+    so memory stays flat no matter how many matches there are. The other
+    readers search the whole file first.
+    
+    Args:
+        file_path: Path to the file to search
+        pattern_type: Type(s) of patterns to search for
+        context_lines: Number of lines to include before and after each match
+        text_pattern: Optional text to search for (for regular text search),
+            or a list of terms to search for any of
+        case_sensitive: Whether text search should be case-sensitive
+        whole_word: Whether to match whole words only for text search
+        reader: How to read the file: "full" reads it into memory at once,
+            "stream" reads it in line-aligned chunks so memory stays bounded,
+            "mmap" memory-maps it and searches the raw bytes (falling back to
+            "full" when the search can't be done on bytes)
+        chunk_size: Number of characters per chunk for the "stream" reader
+        workers: Number of processes to split the file across (0 means one
+            per CPU). Files smaller than 2 * MIN_RANGE_SIZE are not split;
+            split files are read in line-aligned ranges and reader is ignored.
+        max_count: Stop searching the file after this many matches (see
+            find_pattern_matches); files aren't split across workers then
+        max_line_length: Search lines longer than this many characters
+            according to long_lines (see find_pattern_matches)
+        long_lines: How to search those lines: "truncate", "skip" or
+            "window"
+        pattern_timeout: Seconds a pattern type may spend on a line before
+            the rest of the line is given up on (see find_pattern_matches).
+            With a line length limit or a timeout, the "mmap" reader falls
+            back to "full".
+        pattern_pack: Pattern pack (see pattern_seek.packs) defining more
+            pattern types; the "mmap" reader falls back to "full" for them
+        
+    Yields:
+        Read-only dictionaries containing information about each match
+    """
+    for matches in _iter_match_sets(
+        file_path,
+        pattern_type,
+        context_lines,
+        text_pattern=text_pattern,
+        case_sensitive=case_sensitive,
+        whole_word=whole_word,
+        reader=reader,
+        chunk_size=chunk_size,
+        workers=workers,
+        max_count=max_count,
+        max_line_length=max_line_length,
+        long_lines=long_lines,
+        pattern_timeout=pattern_timeout,
+        pattern_pack=pattern_pack
+    ):
+        yield from matches
+
+def _iter_match_sets(
+    file_path: str,
+    pattern_type: Union[str, List[str]],
+    context_lines: int = 0,
+    text_pattern: Optional[Union[str, Sequence[str]]] = None,
+    case_sensitive: bool = False,
+    whole_word: bool = False,
+    reader: str = "full",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = 1,
+    max_count: Optional[int] = None,
+    max_line_length: Optional[int] = None,
+    long_lines: str = "truncate",
+    pattern_timeout: Optional[float] = None,
+    pattern_pack: Optional["PatternPack"] = None
+) -> Iterator[MatchSet]:
+    """
+    Search a file the way iter_search_file does, yielding the matches in
+    batches.
+
+    Args:
+        file_path: Path to the file to search
+        pattern_type: Type(s) of patterns to search for
+        context_lines: Number of lines to include before and after each match
+        text_pattern: Optional text to search for (for regular text search),
+            or a list of terms to search for any of
+        case_sensitive: Whether text search should be case-sensitive
+        whole_word: Whether to match whole words only for text search
+        reader: How to read the file ("full", "stream" or "mmap")
+        chunk_size: Number of characters per chunk for the "stream" reader
+        workers: Number of processes to split the file across (0 means one
+            per CPU)
+        max_count: Stop searching the file after this many matches
+        max_line_length: Length above which lines are searched according to
+            long_lines
+        long_lines: "truncate", "skip" or "window"
+        pattern_timeout: Seconds a pattern type may spend on a line
+        pattern_pack: Pattern pack defining more pattern types
+
+    Yields:
+        Consecutive batches of matches, in file order
+    """
+    if reader not in READERS:
+        raise ValueError(f"Unknown reader: {reader}")
+
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    # a search that stops early gains nothing from splitting the file
+    if workers > 1 and max_count is None:
+        ranges = _split_file_ranges(file_path, workers)
+        if len(ranges) > 1:
+            search_options = {
+                "pattern_type": pattern_type,
+                "context_lines": context_lines,
+                "text_pattern": text_pattern,
+                "case_sensitive": case_sensitive,
+                "whole_word": whole_word,
+                "max_line_length": max_line_length,
+                "long_lines": long_lines,
+                "pattern_timeout": pattern_timeout,
+                "pattern_pack": pattern_pack,
+            }
+            # imported on use (like asyncio), which keeps the CLI quick to start
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(
+                        _search_file_range, file_path, start, end, search_options
+                    )
+                    for start, end in ranges
+                ]
+                yield from _iter_merged_chunks(
+                    (future.result() for future in futures),
+                    context_lines
+                )
+                return
+
+    if reader == "stream":
+        yield from _search_file_stream(
+            file_path,
+            pattern_type,
+            context_lines,
+            chunk_size,
+            max_count=max_count,
+            text_pattern=text_pattern,
+            case_sensitive=case_sensitive,
+            whole_word=whole_word,
+            max_line_length=max_line_length,
+            long_lines=long_lines,
+            pattern_timeout=pattern_timeout,
+            pattern_pack=pattern_pack
+        )
+        return
+
+    # guarded searches go line by line through decoded text
+    guarded = max_line_length is not None or pattern_timeout is not None
+    if reader == "mmap" and not guarded:
+        matches = _search_file_mmap(
+            file_path,
+            pattern_type,
+            context_lines,
+            text_pattern=text_pattern,
+            case_sensitive=case_sensitive,
+            whole_word=whole_word,
+            max_count=max_count,
+            pattern_pack=pattern_pack
+        )
+        if matches is not None:
+            yield matches
+            return
     
     # python encodings: https://docs.python.org/3.8/library/codecs.html#standard-encodings
     # utf-8 is the most lenient/common encoding and should read the file
@@ -39,35 +330,485 @@ def search_file(
         pattern_type,
         text_pattern=text_pattern,
         case_sensitive=case_sensitive,
-        whole_word=whole_word
+        whole_word=whole_word,
+        max_count=max_count,
+        max_line_length=max_line_length,
+        long_lines=long_lines,
+        pattern_timeout=pattern_timeout,
+        pattern_pack=pattern_pack
     )
     
     # Add context if requested
     if context_lines > 0:
-        lines = content.splitlines()
-        for match in matches:
-            line_idx = match["line"] - 1  # Convert to zero-based index
-            
-            # Store the original line that contains the match
-            match["context_line"] = lines[line_idx]
-            
-            # Get context before the match
-            start_idx = max(0, line_idx - context_lines)
-            match["context_before"] = lines[start_idx:line_idx]
-            
-            # Get context after the match
-            end_idx = min(len(lines), line_idx + context_lines + 1)
-            match["context_after"] = lines[line_idx + 1:end_idx]
+        _add_context(matches, content.splitlines(), context_lines)
     
+    yield matches
+
+def _add_context(matches: MatchSet, lines: List[str], context_lines: int) -> None:
+    """
+    Attach the line of each match and up to context_lines lines before and
+    after it, as hunks shared by the matches whose lines overlap or touch.
+
+    Args:
+        matches: Matches found in the text the lines were split from
+        lines: The lines of the text
+        context_lines: Number of lines to include before and after each match
+    """
+    matches.context_lines = context_lines
+    # zero-based [hunk_start, hunk_end) line range of the current hunk
+    hunk_start = hunk_end = first_idx = 0
+    for idx, match in enumerate(matches):
+        line_idx = match["line"] - 1  # Convert to zero-based index
+        start_idx = max(0, line_idx - context_lines)
+        if idx and start_idx > hunk_end:
+            matches.add_hunk(
+                hunk_start + 1, lines[hunk_start:hunk_end], range(first_idx, idx)
+            )
+            first_idx = idx
+        if idx == first_idx:
+            hunk_start = start_idx
+        hunk_end = min(line_idx + context_lines + 1, len(lines))
+
+    if matches:
+        matches.add_hunk(
+            hunk_start + 1, lines[hunk_start:hunk_end], range(first_idx, len(matches))
+        )
+
+def _concat_match_sets(match_sets: Iterable[MatchSet]) -> MatchSet:
+    """
+    Join batches of matches into one set.
+
+    Args:
+        match_sets: The batches, in order
+
+    Returns:
+        All the matches
+    """
+    merged = MatchSet()
+    for matches in match_sets:
+        merged.extend(matches)
+    return merged
+
+def _search_file_stream(
+    file_path: str,
+    pattern_type: Union[str, List[str]],
+    context_lines: int,
+    chunk_size: int,
+    max_count: Optional[int] = None,
+    **match_options
+) -> Iterator[MatchSet]:
+    """
+    Search a file chunk by chunk, keeping only one chunk and the last
+    context_lines lines in memory.
+
+    Context before a match comes from a ring buffer of the lines preceding
+    the current chunk; context after a match is filled in as the following
+    chunks arrive. Results are identical to reading the whole file.
+
+    Args:
+        file_path: Path to the file to search
+        pattern_type: Type(s) of patterns to search for
+        context_lines: Number of lines to include before and after each match
+        chunk_size: Number of characters to read at a time
+        max_count: Stop reading once this many matches (and the context
+            after the last of them) have been found
+        **match_options: Options passed on to find_pattern_matches
+
+    Yields:
+        Batches of matches, in file order
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        chunks = _read_line_chunks(f, chunk_size)
+        if max_count is None:
+            chunk_results = (
+                _search_chunk(chunk, pattern_type, context_lines, match_options)
+                for chunk in chunks
+            )
+        else:
+            chunk_results = _search_chunks_limited(
+                chunks, pattern_type, context_lines, match_options, max_count
+            )
+        yield from _iter_merged_chunks(chunk_results, context_lines)
+
+def _search_chunks_limited(
+    chunks: Iterable[str],
+    pattern_type: Union[str, List[str]],
+    context_lines: int,
+    match_options: Dict,
+    max_count: int
+) -> Iterator[Tuple[MatchSet, int, List[str], List[str]]]:
+    """
+    Search consecutive chunks with _search_chunk until max_count matches are
+    found, then only take the lines of the chunks still needed for the
+    context after the last match.
+
+    Args:
+        chunks: Line-aligned chunks of the file, in order
+        pattern_type: Type(s) of patterns to search for
+        context_lines: Number of lines to include before and after each match
+        match_options: Options passed on to find_pattern_matches
+        max_count: Number of matches to stop at
+
+    Yields:
+        The same tuples as _search_chunk, to be merged with _iter_merged_chunks
+    """
+    remaining = max_count
+    lines_after = 0
+    for chunk in chunks:
+        if remaining > 0:
+            result = _search_chunk(
+                chunk,
+                pattern_type,
+                context_lines,
+                dict(match_options, max_count=remaining),
+            )
+            remaining -= len(result[0])
+        elif lines_after < context_lines:
+            # no more matches, just the lines
+            result = _search_chunk(chunk, [], context_lines, {})
+            lines_after += result[1]
+        else:
+            return
+        yield result
+
+def _search_chunk(
+    chunk: str,
+    pattern_type: Union[str, List[str]],
+    context_lines: int,
+    match_options: Dict
+) -> Tuple[MatchSet, int, List[str], List[str]]:
+    """
+    Search one line-aligned chunk of a file on its own.
+
+    Args:
+        chunk: The chunk's text, ending on a line boundary
+        pattern_type: Type(s) of patterns to search for
+        context_lines: Number of lines to include before and after each match
+        match_options: Options passed on to find_pattern_matches
+
+    Returns:
+        A tuple of (matches with line numbers relative to the chunk and the
+        context the chunk itself provides, number of lines in the chunk,
+        its first context_lines lines, its last context_lines lines)
+    """
+    matches = find_pattern_matches(chunk, pattern_type, **match_options)
+    if context_lines <= 0:
+        return matches, count_line_breaks(chunk), [], []
+
+    lines = chunk.splitlines()
+    _add_context(matches, lines, context_lines)
+
+    return matches, len(lines), lines[:context_lines], lines[-context_lines:]
+
+def _iter_merged_chunks(
+    chunk_results: Iterable[Tuple[MatchSet, int, List[str], List[str]]],
+    context_lines: int
+) -> Iterator[MatchSet]:
+    """
+    Stitch the results of consecutive chunks from _search_chunk back together.
+
+    Chunk line numbers are turned into file line numbers, and context that
+    crosses a chunk boundary is completed: context before a match comes from
+    a ring buffer of the lines preceding the chunk, context after a match is
+    filled in from the chunks that follow, and hunks that meet across the
+    boundary are merged. Results are identical to searching the whole file
+    at once.
+
+    Args:
+        chunk_results: Results of _search_chunk, in file order
+        context_lines: Number of lines to include before and after each match
+
+    Yields:
+        Batches of matches, in file order, as soon as their context is
+        complete
+    """
+    line_offset = 0
+    previous_lines = deque(maxlen=context_lines)
+    # matches held back until their context_after is complete
+    pending = MatchSet()
+
+    for chunk_matches, line_count, first_lines, last_lines in chunk_results:
+        # Convert chunk line numbers to file line numbers
+        chunk_matches.shift_lines(line_offset)
+        line_offset += line_count
+
+        if context_lines > 0:
+            # Complete the context of matches from earlier chunks, and of
+            # this chunk's first matches
+            pending.pad_context([], first_lines)
+            chunk_matches.pad_context(list(previous_lines), [])
+            previous_lines.extend(last_lines)
+
+        pending.extend(chunk_matches)
+
+        # Only the last hunk can still be waiting for lines after it
+        ready = pending.complete_count()
+        if ready:
+            # the guarded lines found so far go with the first batch only
+            batch = pending[:ready]
+            pending = pending[ready:]
+            pending.guarded = []
+            yield batch
+
+    if pending or pending.guarded:
+        yield pending
+
+def _search_file_mmap(
+    file_path: str,
+    pattern_type: Union[str, List[str]],
+    context_lines: int,
+    **match_options
+) -> Optional[MatchSet]:
+    """
+    Search a memory-mapped file without decoding it as a whole.
+
+    Only the matched spans, the lines they sit on and their context lines
+    are decoded. Results are identical to reading the whole file.
+
+    Args:
+        file_path: Path to the file to search
+        pattern_type: Type(s) of patterns to search for
+        context_lines: Number of lines to include before and after each match
+        **match_options: Options passed on to find_pattern_matches_bytes
+
+    Returns:
+        The matches, or None if the file has to be searched as text instead
+    """
+    with open(file_path, 'rb') as f:
+        # empty files can't be mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            line_offsets = array('Q')
+            matches = find_pattern_matches_bytes(
+                buffer,
+                pattern_type,
+                line_offsets=line_offsets,
+                **match_options
+            )
+            if matches is None:
+                return None
+
+            if context_lines > 0 and not _add_buffer_context(
+                matches, buffer, line_offsets, context_lines
+            ):
+                return None
+
     return matches
 
+def _add_buffer_context(
+    matches: MatchSet,
+    buffer: mmap.mmap,
+    line_offsets: array,
+    context_lines: int
+) -> bool:
+    """
+    Attach context to matches found in a buffer, like _add_context but
+    decoding only the lines of the hunks, each of them once.
+
+    Args:
+        matches: Matches found in the buffer
+        buffer: The UTF-8 encoded file content
+        line_offsets: Byte offset of the line containing each match
+        context_lines: Number of lines to include before and after each match
+
+    Returns:
+        False if the lines after the last match break anywhere but at \\n,
+        which a search that stopped at max_count hasn't checked
+    """
+    matches.context_lines = context_lines
+    # byte range of the current hunk, from the start of its first line to the
+    # end of its last line, and the number of that last line
+    hunk_start = hunk_end = last_line = first_line = first_idx = 0
+    for idx, line_start in enumerate(line_offsets):
+        line = matches[idx]["line"]
+        if idx and line - context_lines > last_line + 1:
+            matches.add_hunk(
+                first_line,
+                _decode_lines(buffer[hunk_start:hunk_end]),
+                range(first_idx, idx),
+            )
+            first_idx = idx
+
+        if idx == first_idx:
+            # walk back one line at a time from the start of the matched line
+            hunk_start = line_start
+            first_line = line
+            while hunk_start > 0 and first_line > line - context_lines:
+                hunk_start = buffer.rfind(b"\n", 0, hunk_start - 1) + 1
+                first_line -= 1
+
+            hunk_end = buffer.find(b"\n", line_start)
+            if hunk_end < 0:
+                hunk_end = len(buffer)
+            last_line = line
+
+        # walk forward one line at a time from the end of the hunk
+        while hunk_end + 1 < len(buffer) and last_line < line + context_lines:
+            hunk_end = buffer.find(b"\n", hunk_end + 1)
+            if hunk_end < 0:
+                hunk_end = len(buffer)
+            last_line += 1
+
+    if matches:
+        raw = buffer[hunk_start:hunk_end]
+        if count_line_breaks(raw.decode("utf-8")) != raw.count(b"\n"):
+            return False
+        matches.add_hunk(first_line, _decode_lines(raw), range(first_idx, len(matches)))
+    return True
+
+def _decode_lines(raw: bytes) -> List[str]:
+    """
+    Decode whole lines of a UTF-8 buffer the way reading the file in text
+    mode would.
+
+    Args:
+        raw: The bytes of the lines, without a trailing \\n
+
+    Returns:
+        The decoded lines
+    """
+    return [decode_line(line) for line in raw.split(b"\n")]
+
+def _split_file_ranges(file_path: str, workers: int) -> List[Tuple[int, int]]:
+    """
+    Cut a file into byte ranges that start and end on line boundaries.
+
+    Ranges are about file size / workers bytes, but never smaller than
+    MIN_RANGE_SIZE or larger than MAX_RANGE_SIZE, so memory per worker stays
+    bounded on huge files.
+
+    Args:
+        file_path: Path to the file to split
+        workers: Number of worker processes that will search the ranges
+
+    Returns:
+        A list of (start, end) byte offsets covering the whole file
+    """
+    size = os.path.getsize(file_path)
+    range_size = min(max(size // workers, MIN_RANGE_SIZE), MAX_RANGE_SIZE)
+    parts = size // range_size if size >= 2 * MIN_RANGE_SIZE else 1
+
+    boundaries = [0]
+    with open(file_path, 'rb') as f:
+        for part in range(1, parts):
+            # move each cut forward to just after the next newline
+            f.seek(size * part // parts - 1)
+            f.readline()
+            position = f.tell()
+            if position >= size:
+                break
+            if position > boundaries[-1]:
+                boundaries.append(position)
+    boundaries.append(size)
+
+    return list(zip(boundaries, boundaries[1:]))
+
+def _search_file_range(
+    file_path: str,
+    start: int,
+    end: int,
+    search_options: Dict
+) -> Tuple[MatchSet, int, List[str], List[str]]:
+    """
+    Search the line-aligned byte range [start, end) of a file, typically in
+    a worker process.
+
+    Args:
+        file_path: Path to the file to search
+        start: Byte offset of the first line in the range
+        end: Byte offset just past the last line in the range
+        search_options: Keyword arguments for search_file (reader and
+            chunk_size are ignored)
+
+    Returns:
+        The same tuple as _search_chunk, to be merged with _iter_merged_chunks
+    """
+    match_options = {
+        key: search_options[key]
+        for key in (
+            "text_pattern", "case_sensitive", "whole_word",
+            "max_line_length", "long_lines", "pattern_timeout", "pattern_pack",
+        )
+    }
+
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    # decode the way reading the file in text mode would (universal newlines);
+    # ranges end after a \n, so a \r\n pair is never split between them
+    chunk = data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+    return _search_chunk(
+        chunk,
+        search_options["pattern_type"],
+        search_options["context_lines"],
+        match_options
+    )
+
+def _read_line_chunks(f: TextIO, chunk_size: int) -> Iterator[str]:
+    """
+    Read a text file in chunks that always end on a line boundary.
+
+    Whatever follows the last newline of a chunk is carried over to the
+    next one, so no line is ever split between chunks.
+
+    Args:
+        f: File object opened in text mode
+        chunk_size: Number of characters to read at a time
+
+    Yields:
+        Consecutive pieces of the file, each ending in a newline except
+        possibly the last one
+    """
+    carry = ""
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+
+        buffer = carry + chunk
+        cut = buffer.rfind("\n") + 1
+        if cut == 0:
+            # no complete line yet, keep reading
+            carry = buffer
+            continue
+
+        carry = buffer[cut:]
+        yield buffer[:cut]
+
+    if carry:
+        yield carry
+
 def search_files(
     path: Union[str, List[str]],
     pattern_type: Union[str, List[str]],
     context_lines: int = 0,
-    text_pattern: Optional[str] = None,
+    text_pattern: Optional[Union[str, Sequence[str]]] = None,
     case_sensitive: bool = False,
-    whole_word: bool = False
+    whole_word: bool = False,
+    reader: str = "full",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = 1,
+    threads: int = 1,
+    ordered: bool = True,
+    recursive: bool = False,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+    ignore_files: Optional[List[str]] = None,
+    max_file_size: Optional[int] = None,
+    max_depth: Optional[int] = None,
+    follow_symlinks: bool = False,
+    skip_binary: bool = True,
+    cache: Optional["ResultCache"] = None,
+    index: Optional["TrigramIndex"] = None,
+    max_count: Optional[int] = None,
+    max_line_length: Optional[int] = None,
+    long_lines: str = "truncate",
+    pattern_timeout: Optional[float] = None,
+    pattern_pack: Optional["PatternPack"] = None
 ) -> List[Dict]:
     """
     Search multiple files or directories for patterns of the specified type(s).
@@ -76,27 +817,439 @@ def search_files(
         path: File path, directory path, wildcard pattern, or list of paths
         pattern_type: Type(s) of patterns to search for
         context_lines: Number of lines to include before and after each match
-        text_pattern: Optional text to search for (for regular text search)
+        text_pattern: Optional text to search for (for regular text search),
+            or a list of terms to search for any of
         case_sensitive: Whether text search should be case-sensitive
         whole_word: Whether to match whole words only for text search
+        reader: How to read each file ("full", "stream" or "mmap", see search_file)
+        chunk_size: Number of characters per chunk for the "stream" reader
+        workers: Number of processes to search files in (0 means one per CPU).
+            Large files are also split across processes, see search_file.
+        threads: Number of threads to read and search files in when not
+            using processes (0 means one per CPU). Reading a file overlaps
+            with searching others, which pays off on slow or cold storage;
+            on free-threaded Python builds the searches run in parallel too.
+        ordered: Whether to return results in file order when searching in
+            parallel or in threads, rather than in the order files finish
+        recursive: Whether to search subdirectories of directories
+        include: Glob patterns files in directories must match to be searched
+        exclude: Glob patterns for files and directories to skip in directories
+        ignore_files: Names of .gitignore-style files to honour in directories
+        max_file_size: Skip files in directories larger than this many bytes
+        max_depth: Maximum depth of subdirectories to search when recursive
+        follow_symlinks: Whether to descend into symlinked directories
+        skip_binary: Whether to skip binary files (see is_binary_file). They
+            are reported with a "skipped" key instead of matches.
+        cache: Result cache to serve unchanged files from and store new
+            results in; least recently used entries are evicted at the end
+        index: Trigram index (see pattern_seek.index) used to rule out files
+            without opening them; they're reported with no matches
+        max_count: Stop searching each file after this many matches
+        max_line_length: Search lines longer than this many characters
+            according to long_lines (see search_file)
+        long_lines: How to search those lines: "truncate", "skip" or
+            "window"
+        pattern_timeout: Seconds a pattern type may spend on a line (see
+            search_file). Lines that weren't fully searched are listed in
+            the guarded attribute of a file's matches.
+        pattern_pack: Pattern pack (see pattern_seek.packs) defining more
+            pattern types
         
     Returns:
         A list of dictionaries, one per file, containing file path and matches
     """
+    return list(iter_search_files(
+        path,
+        pattern_type,
+        context_lines,
+        text_pattern=text_pattern,
+        case_sensitive=case_sensitive,
+        whole_word=whole_word,
+        reader=reader,
+        chunk_size=chunk_size,
+        workers=workers,
+        threads=threads,
+        ordered=ordered,
+        recursive=recursive,
+        include=include,
+        exclude=exclude,
+        ignore_files=ignore_files,
+        max_file_size=max_file_size,
+        max_depth=max_depth,
+        follow_symlinks=follow_symlinks,
+        skip_binary=skip_binary,
+        cache=cache,
+        index=index,
+        max_count=max_count,
+        max_line_length=max_line_length,
+        long_lines=long_lines,
+        pattern_timeout=pattern_timeout,
+        pattern_pack=pattern_pack
+    ))
+
+def iter_search_files(
+    path: Union[str, List[str]],
+    pattern_type: Union[str, List[str]],
+    context_lines: int = 0,
+    text_pattern: Optional[Union[str, Sequence[str]]] = None,
+    case_sensitive: bool = False,
+    whole_word: bool = False,
+    reader: str = "full",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = 1,
+    threads: int = 1,
+    ordered: bool = True,
+    recursive: bool = False,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+    ignore_files: Optional[List[str]] = None,
+    max_file_size: Optional[int] = None,
+    max_depth: Optional[int] = None,
+    follow_symlinks: bool = False,
+    skip_binary: bool = True,
+    cache: Optional["ResultCache"] = None,
+    index: Optional["TrigramIndex"] = None,
+    max_count: Optional[int] = None,
+    max_line_length: Optional[int] = None,
+    long_lines: str = "truncate",
+    pattern_timeout: Optional[float] = None,
+    pattern_pack: Optional["PatternPack"] = None
+) -> Iterator[Dict]:
+    """
+    Search multiple files or directories for patterns of the specified type(s),
+    yielding each file's result as soon as it is ready.
     
+    Args:
+        path: File path, directory path, wildcard pattern, or list of paths
+        pattern_type: Type(s) of patterns to search for
+        context_lines: Number of lines to include before and after each match
+        text_pattern: Optional text to search for (for regular text search),
+            or a list of terms to search for any of
+        case_sensitive: Whether text search should be case-sensitive
+        whole_word: Whether to match whole words only for text search
+        reader: How to read each file ("full", "stream" or "mmap", see search_file)
+        chunk_size: Number of characters per chunk for the "stream" reader
+        workers: Number of processes to search files in (0 means one per CPU).
+            Large files are also split across processes, see search_file.
+        threads: Number of threads to read and search files in when not
+            using processes (0 means one per CPU). Reading a file overlaps
+            with searching others, which pays off on slow or cold storage;
+            on free-threaded Python builds the searches run in parallel too.
+        ordered: Whether to yield results in file order when searching in
+            parallel or in threads, rather than in the order files finish
+        recursive: Whether to search subdirectories of directories
+        include: Glob patterns files in directories must match to be searched
+        exclude: Glob patterns for files and directories to skip in directories
+        ignore_files: Names of .gitignore-style files to honour in directories
+        max_file_size: Skip files in directories larger than this many bytes
+        max_depth: Maximum depth of subdirectories to search when recursive
+        follow_symlinks: Whether to descend into symlinked directories
+        skip_binary: Whether to skip binary files (see is_binary_file). They
+            are reported with a "skipped" key instead of matches.
+        cache: Result cache to serve unchanged files from and store new
+            results in; least recently used entries are evicted at the end
+        index: Trigram index (see pattern_seek.index) used to rule out files
+            without opening them; they're reported with no matches
+        max_count: Stop searching each file after this many matches
+        max_line_length: Search lines longer than this many characters
+            according to long_lines (see search_file)
+        long_lines: How to search those lines: "truncate", "skip" or
+            "window"
+        pattern_timeout: Seconds a pattern type may spend on a line (see
+            search_file). Lines that weren't fully searched are listed in
+            the guarded attribute of a file's matches.
+        pattern_pack: Pattern pack (see pattern_seek.packs) defining more
+            pattern types
+        
+    Yields:
+        A dictionary per file, containing file path and matches
+    """
+    file_paths = _resolve_file_paths(
+        path,
+        recursive=recursive,
+        include=include,
+        exclude=exclude,
+        ignore_files=ignore_files,
+        max_file_size=max_file_size,
+        max_depth=max_depth,
+        follow_symlinks=follow_symlinks
+    )
+    search_options = {
+        "pattern_type": pattern_type,
+        "context_lines": context_lines,
+        "text_pattern": text_pattern,
+        "case_sensitive": case_sensitive,
+        "whole_word": whole_word,
+        "reader": reader,
+        "chunk_size": chunk_size,
+        "max_count": max_count,
+        "max_line_length": max_line_length,
+        "long_lines": long_lines,
+        "pattern_timeout": pattern_timeout,
+        "pattern_pack": pattern_pack,
+    }
+
+    fingerprint = None
+    if cache is not None:
+        from pattern_seek.cache import query_fingerprint
+        fingerprint = query_fingerprint(dict(search_options, skip_binary=skip_binary))
+    may_match = (
+        index.candidate_filter(pattern_type, text_pattern)
+        if index is not None
+        else None
+    )
+
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if threads == 0:
+        threads = os.cpu_count() or 1
+    try:
+        if workers > 1:
+            yield from _search_files_parallel(
+                file_paths,
+                search_options,
+                workers,
+                ordered,
+                skip_binary,
+                cache,
+                fingerprint,
+                may_match,
+            )
+            return
+        if threads > 1:
+            yield from _search_files_threaded(
+                file_paths,
+                search_options,
+                threads,
+                ordered,
+                skip_binary,
+                cache,
+                fingerprint,
+                may_match,
+            )
+            return
+
+        # Process each file
+        for file_path in file_paths:
+            stat, result = _lookup_known_result(
+                file_path, cache, fingerprint, may_match
+            )
+            if result is None:
+                result = _search_file_entry(file_path, search_options, skip_binary)
+                _store_cache(result, stat, cache, fingerprint)
+            yield result
+    finally:
+        if cache is not None:
+            cache.evict()
+
+async def asearch_files(
+    path: Union[str, List[str]],
+    pattern_type: Union[str, List[str]],
+    context_lines: int = 0,
+    text_pattern: Optional[Union[str, Sequence[str]]] = None,
+    case_sensitive: bool = False,
+    whole_word: bool = False,
+    reader: str = "full",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    concurrency: int = DEFAULT_ASYNC_CONCURRENCY,
+    executor: Optional["Executor"] = None,
+    recursive: bool = False,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+    ignore_files: Optional[List[str]] = None,
+    max_file_size: Optional[int] = None,
+    max_depth: Optional[int] = None,
+    follow_symlinks: bool = False,
+    skip_binary: bool = True,
+    cache: Optional["ResultCache"] = None,
+    index: Optional["TrigramIndex"] = None,
+    max_count: Optional[int] = None,
+    max_line_length: Optional[int] = None,
+    long_lines: str = "truncate",
+    pattern_timeout: Optional[float] = None,
+    pattern_pack: Optional["PatternPack"] = None
+) -> AsyncIterator[Dict]:
+    """
+    Search multiple files or directories for patterns of the specified type(s)
+    without blocking the event loop, yielding each file's result as soon as
+    it is ready.
+
+    Directories are walked in the loop's default executor, and files read
+    and searched in the given one, up to concurrency files at a time.
+    Results come in the order files finish, so a slow large file doesn't
+    hold back the small ones. When the caller stops iterating or is
+    cancelled, files not yet started are dropped; files already being
+    searched finish in the executor and their results are discarded. The
+    cache is looked up and written in a thread of its own, so the loop
+    never waits on its disk I/O.
+
+    Args:
+        path: File path, directory path, wildcard pattern, or list of paths
+        pattern_type: Type(s) of patterns to search for
+        context_lines: Number of lines to include before and after each match
+        text_pattern: Optional text to search for (for regular text search),
+            or a list of terms to search for any of
+        case_sensitive: Whether text search should be case-sensitive
+        whole_word: Whether to match whole words only for text search
+        reader: How to read each file ("full", "stream" or "mmap", see search_file)
+        chunk_size: Number of characters per chunk for the "stream" reader
+        concurrency: Number of files to search at once
+        executor: Executor to search files in, the loop's default executor
+            if None; a ProcessPoolExecutor searches them in processes
+        recursive: Whether to search subdirectories of directories
+        include: Glob patterns files in directories must match to be searched
+        exclude: Glob patterns for files and directories to skip in directories
+        ignore_files: Names of .gitignore-style files to honour in directories
+        max_file_size: Skip files in directories larger than this many bytes
+        max_depth: Maximum depth of subdirectories to search when recursive
+        follow_symlinks: Whether to descend into symlinked directories
+        skip_binary: Whether to skip binary files (see is_binary_file). They
+            are reported with a "skipped" key instead of matches.
+        cache: Result cache to serve unchanged files from and store new
+            results in; least recently used entries are evicted at the end
+        index: Trigram index (see pattern_seek.index) used to rule out files
+            without opening them; they're reported with no matches
+        max_count: Stop searching each file after this many matches
+        max_line_length: Search lines longer than this many characters
+            according to long_lines (see search_file)
+        long_lines: How to search those lines: "truncate", "skip" or
+            "window"
+        pattern_timeout: Seconds a pattern type may spend on a line (see
+            search_file). Lines that weren't fully searched are listed in
+            the guarded attribute of a file's matches.
+        pattern_pack: Pattern pack (see pattern_seek.packs) defining more
+            pattern types
+
+    Yields:
+        A dictionary per file, containing file path and matches
+    """
+    if concurrency < 1:
+        raise ValueError(f"Concurrency must be at least 1, not {concurrency}")
+
+    import asyncio
+    loop = asyncio.get_running_loop()
+    # directories are walked in the loop's default executor, as walking
+    # can't move between processes
+    file_paths = iter(await loop.run_in_executor(None, functools.partial(
+        _resolve_file_paths,
+        path,
+        recursive=recursive,
+        include=include,
+        exclude=exclude,
+        ignore_files=ignore_files,
+        max_file_size=max_file_size,
+        max_depth=max_depth,
+        follow_symlinks=follow_symlinks
+    )))
+    search_options = {
+        "pattern_type": pattern_type,
+        "context_lines": context_lines,
+        "text_pattern": text_pattern,
+        "case_sensitive": case_sensitive,
+        "whole_word": whole_word,
+        "reader": reader,
+        "chunk_size": chunk_size,
+        "max_count": max_count,
+        "max_line_length": max_line_length,
+        "long_lines": long_lines,
+        "pattern_timeout": pattern_timeout,
+        "pattern_pack": pattern_pack,
+    }
+
+    fingerprint = None
+    cache_executor = None
+    if cache is not None:
+        from concurrent.futures import ThreadPoolExecutor
+        from pattern_seek.cache import query_fingerprint
+        fingerprint = query_fingerprint(dict(search_options, skip_binary=skip_binary))
+        # the cache's disk I/O runs off the loop, in a thread of its own so
+        # lookups and stores stay in order
+        cache_executor = ThreadPoolExecutor(max_workers=1)
+    may_match = (
+        index.candidate_filter(pattern_type, text_pattern)
+        if index is not None
+        else None
+    )
+
+    # stat of each file being searched, by its future
+    pending: Dict[asyncio.Future, Optional[os.stat_result]] = {}
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < concurrency:
+                # directories are walked lazily, a step at a time
+                file_path = await loop.run_in_executor(None, next, file_paths, None)
+                if file_path is None:
+                    exhausted = True
+                    break
+                if cache_executor is not None:
+                    stat, known = await loop.run_in_executor(
+                        cache_executor,
+                        _lookup_known_result,
+                        file_path,
+                        cache,
+                        fingerprint,
+                        may_match,
+                    )
+                else:
+                    stat, known = _lookup_known_result(file_path, None, None, may_match)
+                if known is not None:
+                    yield known
+                    continue
+                future = loop.run_in_executor(
+                    executor, _search_file_entry, file_path, search_options, skip_binary
+                )
+                pending[future] = stat
+
+            if not pending:
+                break
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                stat = pending.pop(future)
+                if cache_executor is not None:
+                    # stored in the background, ahead of the next lookup
+                    cache_executor.submit(
+                        _store_cache, result, stat, cache, fingerprint
+                    )
+                yield result
+    finally:
+        for future in pending:
+            future.cancel()
+        if cache_executor is not None:
+            try:
+                await loop.run_in_executor(cache_executor, cache.evict)
+            finally:
+                cache_executor.shutdown(wait=False)
+
+def _resolve_file_paths(
+    path: Union[str, List[str]],
+    **walk_options
+) -> Iterable[str]:
+    """
+    Expand a search path into the files to search.
+
+    Args:
+        path: File path, directory path, wildcard pattern, or list of paths
+        **walk_options: Options passed on to walk_files for directories
+
+    Returns:
+        The paths of existing files; directories are walked lazily
+    """
     # Handle single path
     if isinstance(path, str):
         # Check if the path is a directory
         if os.path.isdir(path):
-            # Search all files in the directory
-            file_paths = [
-                os.path.join(path, f) for f in os.listdir(path)
-                if os.path.isfile(os.path.join(path, f))
+            from pattern_seek.index import INDEX_FILE_NAME
+            # Search the files in the directory, except our own index
+            walk_options["exclude"] = list(walk_options.get("exclude") or []) + [
+                INDEX_FILE_NAME
             ]
+            file_paths = walk_files(path, **walk_options)
         # Check if the path contains wildcards
         elif any(c in path for c in ['*', '?', '[']):
             # Expand wildcards
-            file_paths = glob.glob(path)
+            file_paths = [f for f in glob.glob(path) if os.path.isfile(f)]
         # Single file
         elif os.path.isfile(path):
             file_paths = [path]
@@ -104,31 +1257,497 @@ def search_files(
             raise ValueError(f"Path not found: {path}")
     # Handle list of paths
     else:
-        file_paths = path
-        
-    # Process each file
-    results = []
+        file_paths = [f for f in path if os.path.isfile(f)]
+
+    return file_paths
+
+def _search_file_entry(
+    file_path: str, search_options: Dict, skip_binary: bool = False
+) -> Dict:
+    """
+    Search a single file and wrap the outcome in a per-file result.
+
+    Args:
+        file_path: Path to the file to search
+        search_options: Keyword arguments for search_file
+        skip_binary: Whether to skip the file if it's binary
+
+    Returns:
+        A dictionary with the file path and either its matches, the error,
+        or why it was skipped
+    """
+    try:
+        if skip_binary and is_binary_file(file_path):
+            return {
+                "file": file_path,
+                "skipped": "binary"
+            }
+        matches = search_file(file_path, **search_options)
+        return {
+            "file": file_path,
+            "matches": matches
+        }
+    except Exception as e:
+        # Skip files that can't be processed
+        return {
+            "file": file_path,
+            "error": str(e)
+        }
+
+def _search_file_batch(
+    file_paths: List[str],
+    search_options: Dict,
+    skip_binary: bool = False
+) -> List[Dict]:
+    """
+    Search a batch of files in a worker process.
+
+    Args:
+        file_paths: Paths of the files to search
+        search_options: Keyword arguments for search_file
+        skip_binary: Whether to skip binary files
+
+    Returns:
+        A list of per-file results, in the same order as file_paths
+    """
+    return [
+        _search_file_entry(file_path, search_options, skip_binary)
+        for file_path in file_paths
+    ]
+
+def _plan_parallel_search(
+    file_paths: Iterable[str],
+    workers: int,
+    skip_binary: bool = False,
+    cache: Optional["ResultCache"] = None,
+    fingerprint: Optional[str] = None,
+    may_match: Optional[Callable[[str], bool]] = None,
+    split_files: bool = True,
+) -> Iterator[
+    Tuple[
+        List[str], List[Tuple[int, int]], List[Optional[os.stat_result]], Optional[Dict]
+    ]
+]:
+    """
+    Split the search into tasks for worker processes, as the files are
+    walked.
+
+    Small files are grouped into batches of roughly BATCH_SIZE bytes, so
+    they don't each pay for a round trip to a worker. Large files get a task
+    of their own, cut into line-aligned ranges. Large binary files are left
+    in a batch when skip_binary is set, so the worker reports them skipped.
+    Files whose result is already known, from the cache or because the
+    index rules them out, get a task of their own that needs no worker.
+
+    Args:
+        file_paths: Paths of the files to search
+        workers: Number of worker processes
+        skip_binary: Whether binary files will be skipped
+        cache: Result cache to look files up in
+        fingerprint: Query fingerprint for the cache
+        may_match: Index predicate telling whether a file may match
+        split_files: Whether large files may be cut into ranges
+
+    Yields:
+        (file paths, ranges, stats, known result) tasks in file order;
+        ranges is only set for a single large file, the known result only
+        for a single file that needs no searching
+    """
+    batch: List[str] = []
+    batch_stats: List[Optional[os.stat_result]] = []
+    batch_size = 0
     for file_path in file_paths:
-        if os.path.isfile(file_path):
-            try:
-                matches = search_file(
-                    file_path, 
-                    pattern_type, 
-                    context_lines,
-                    text_pattern=text_pattern,
-                    case_sensitive=case_sensitive,
-                    whole_word=whole_word
+        stat, known = _lookup_known_result(file_path, cache, fingerprint, may_match)
+        if known is not None:
+            if batch:
+                yield (batch, [], batch_stats, None)
+                batch, batch_stats = [], []
+                batch_size = 0
+            yield ([file_path], [], [stat], known)
+            continue
+
+        try:
+            size = stat.st_size if stat is not None else os.path.getsize(file_path)
+        except OSError:
+            # let the worker report the error
+            size = 0
+
+        if (
+            split_files
+            and size >= 2 * MIN_RANGE_SIZE
+            and not (skip_binary and _is_binary_or_unreadable(file_path))
+        ):
+            ranges = _split_file_ranges(file_path, workers)
+            if len(ranges) > 1:
+                if batch:
+                    yield (batch, [], batch_stats, None)
+                    batch, batch_stats = [], []
+                    batch_size = 0
+                yield ([file_path], ranges, [stat], None)
+                continue
+
+        batch.append(file_path)
+        batch_stats.append(stat)
+        batch_size += size
+        if batch_size >= BATCH_SIZE or len(batch) >= BATCH_MAX_FILES:
+            yield (batch, [], batch_stats, None)
+            batch, batch_stats = [], []
+            batch_size = 0
+
+    if batch:
+        yield (batch, [], batch_stats, None)
+
+def _is_binary_or_unreadable(file_path: str) -> bool:
+    """
+    Check a file with is_binary_file, treating read errors as binary.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        True if the file looks binary or can't be read
+    """
+    try:
+        return is_binary_file(file_path)
+    except OSError:
+        return True
+
+def _search_files_parallel(
+    file_paths: Iterable[str],
+    search_options: Dict,
+    workers: int,
+    ordered: bool = True,
+    skip_binary: bool = False,
+    cache: Optional["ResultCache"] = None,
+    fingerprint: Optional[str] = None,
+    may_match: Optional[Callable[[str], bool]] = None
+) -> Iterator[Dict]:
+    """
+    Search files across a pool of worker processes.
+
+    Tasks are planned as the files are walked, and at most workers *
+    PROCESS_PREFETCH of them are in flight at once, so results start coming
+    before the walk is done and memory stays bounded. The cache is only used
+    from this process: files are looked up while planning the tasks and new
+    results are stored as tasks are collected.
+
+    Args:
+        file_paths: Paths of the files to search
+        search_options: Keyword arguments for search_file
+        workers: Number of worker processes
+        ordered: Whether to yield results in file order, rather than as
+            soon as each task finishes
+        skip_binary: Whether to skip binary files
+        cache: Result cache to serve unchanged files from and store new
+            results in
+        fingerprint: Query fingerprint for the cache
+        may_match: Index predicate telling whether a file may match
+
+    Yields:
+        Per-file results
+    """
+    from concurrent.futures import Future, ProcessPoolExecutor
+    context_lines = search_options["context_lines"]
+    window = workers * PROCESS_PREFETCH
+    # (file paths, ranges, stats, futures) of the tasks in flight, in file order
+    pending: deque = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            for task_paths, ranges, stats, known in _plan_parallel_search(
+                file_paths,
+                workers,
+                skip_binary,
+                cache,
+                fingerprint,
+                may_match,
+                split_files=search_options.get("max_count") is None
+            ):
+                if known is not None:
+                    # already done, and nothing to store
+                    future: Future = Future()
+                    future.set_result([known])
+                    futures = [future]
+                    stats = [None]
+                elif ranges:
+                    futures = [
+                        executor.submit(
+                            _search_file_range,
+                            task_paths[0],
+                            start,
+                            end,
+                            search_options,
+                        )
+                        for start, end in ranges
+                    ]
+                else:
+                    futures = [
+                        executor.submit(
+                            _search_file_batch, task_paths, search_options, skip_binary
+                        )
+                    ]
+                pending.append((task_paths, ranges, stats, futures))
+
+                while len(pending) >= window:
+                    yield from _collect_parallel(
+                        pending, ordered, context_lines, cache, fingerprint
+                    )
+            while pending:
+                yield from _collect_parallel(
+                    pending, ordered, context_lines, cache, fingerprint
                 )
-                results.append({
-                    "file": file_path,
-                    "matches": matches
-                })
-            except Exception as e:
-                # Skip files that can't be processed
-                results.append({
-                    "file": file_path,
-                    "error": str(e)
-                })
-    
+        finally:
+            # when the caller stops early (e.g. at the first match), don't
+            # wait for the tasks that haven't started
+            for task in pending:
+                for future in task[3]:
+                    future.cancel()
+
+def _collect_parallel(
+    pending: deque,
+    ordered: bool,
+    context_lines: int,
+    cache: Optional["ResultCache"] = None,
+    fingerprint: Optional[str] = None
+) -> List[Dict]:
+    """
+    Take finished tasks off the queue of _search_files_parallel, storing
+    their results in the cache.
+
+    Args:
+        pending: (file paths, ranges, stats, futures) of the tasks in
+            flight, in file order
+        ordered: Whether to wait for the first task in the queue, rather
+            than take whichever tasks are done
+        context_lines: Number of lines to include before and after each match
+        cache: Result cache to store the results in
+        fingerprint: Query fingerprint for the cache
+
+    Returns:
+        The per-file results of the tasks taken off the queue
+    """
+    if ordered:
+        done = [pending.popleft()]
+    else:
+        from concurrent.futures import FIRST_COMPLETED, wait
+        # a task is done once all of its futures are
+        done = [task for task in pending if all(f.done() for f in task[3])]
+        while not done:
+            wait(
+                [f for task in pending for f in task[3] if not f.done()],
+                return_when=FIRST_COMPLETED,
+            )
+            done = [task for task in pending if all(f.done() for f in task[3])]
+        for task in done:
+            pending.remove(task)
+
+    results = []
+    for task in done:
+        results.extend(_collect_task(task, context_lines, cache, fingerprint))
     return results
 
+def _search_files_threaded(
+    file_paths: Iterable[str],
+    search_options: Dict,
+    threads: int,
+    ordered: bool = True,
+    skip_binary: bool = False,
+    cache: Optional["ResultCache"] = None,
+    fingerprint: Optional[str] = None,
+    may_match: Optional[Callable[[str], bool]] = None
+) -> Iterator[Dict]:
+    """
+    Search files in a pool of threads, each reading a file and searching it.
+
+    Threads blocked reading a file let the others search theirs, so slow
+    reads overlap with matching. At most threads * THREAD_PREFETCH files are
+    in flight at once, which caps the file contents and results held in
+    memory. The cache and index are only used from this thread, as with
+    _search_files_parallel.
+
+    Args:
+        file_paths: Paths of the files to search
+        search_options: Keyword arguments for search_file
+        threads: Number of threads
+        ordered: Whether to yield results in file order, rather than as
+            soon as each file is done
+        skip_binary: Whether to skip binary files
+        cache: Result cache to serve unchanged files from and store new
+            results in
+        fingerprint: Query fingerprint for the cache
+        may_match: Index predicate telling whether a file may match
+
+    Yields:
+        Per-file results
+    """
+    from concurrent.futures import Future, ThreadPoolExecutor
+    window = threads * THREAD_PREFETCH
+    # (stat, future) of the files in flight, in file order
+    pending: deque = deque()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        try:
+            for file_path in file_paths:
+                stat, known = _lookup_known_result(
+                    file_path, cache, fingerprint, may_match
+                )
+                if known is not None:
+                    future: Future = Future()
+                    future.set_result(known)
+                    # already done, and nothing to store
+                    pending.append((None, future))
+                else:
+                    future = executor.submit(
+                        _search_file_entry, file_path, search_options, skip_binary
+                    )
+                    pending.append((stat, future))
+
+                while len(pending) >= window:
+                    yield from _collect_threaded(pending, ordered, cache, fingerprint)
+            while pending:
+                yield from _collect_threaded(pending, ordered, cache, fingerprint)
+        finally:
+            # when the caller stops early, don't search the files read ahead
+            for _, future in pending:
+                future.cancel()
+
+def _collect_threaded(
+    pending: deque,
+    ordered: bool,
+    cache: Optional["ResultCache"] = None,
+    fingerprint: Optional[str] = None
+) -> List[Dict]:
+    """
+    Take finished files off the queue of _search_files_threaded, storing
+    their results in the cache.
+
+    Args:
+        pending: (stat, future) of the files in flight, in file order
+        ordered: Whether to wait for the first file in the queue, rather
+            than take whichever files are done
+        cache: Result cache to store the results in
+        fingerprint: Query fingerprint for the cache
+
+    Returns:
+        The per-file results taken off the queue (at least one)
+    """
+    if ordered:
+        done = [pending.popleft()]
+    else:
+        from concurrent.futures import FIRST_COMPLETED, wait
+        finished, _ = wait(
+            [future for _, future in pending], return_when=FIRST_COMPLETED
+        )
+        done = [item for item in pending if item[1] in finished]
+        for item in done:
+            pending.remove(item)
+
+    results = []
+    for stat, future in done:
+        result = future.result()
+        _store_cache(result, stat, cache, fingerprint)
+        results.append(result)
+    return results
+
+def _collect_task(
+    task: Tuple[
+        List[str], List[Tuple[int, int]], List[Optional[os.stat_result]], List["Future"]
+    ],
+    context_lines: int,
+    cache: Optional["ResultCache"] = None,
+    fingerprint: Optional[str] = None,
+) -> List[Dict]:
+    """
+    Gather the per-file results of a finished task from _search_files_parallel,
+    storing them in the cache.
+
+    Args:
+        task: The task's file paths, ranges, stats and futures
+        context_lines: Number of lines to include before and after each match
+        cache: Result cache to store the results in
+        fingerprint: Query fingerprint for the cache
+
+    Returns:
+        A list of per-file results
+    """
+    task_paths, ranges, stats, futures = task
+    if not ranges:
+        results = futures[0].result()
+    else:
+        try:
+            matches = _concat_match_sets(_iter_merged_chunks(
+                (future.result() for future in futures),
+                context_lines
+            ))
+            results = [{
+                "file": task_paths[0],
+                "matches": matches
+            }]
+        except Exception as e:
+            # Skip files that can't be processed
+            results = [{
+                "file": task_paths[0],
+                "error": str(e)
+            }]
+
+    for result, stat in zip(results, stats):
+        _store_cache(result, stat, cache, fingerprint)
+    return results
+
+def _lookup_known_result(
+    file_path: str,
+    cache: Optional["ResultCache"],
+    fingerprint: Optional[str],
+    may_match: Optional[Callable[[str], bool]] = None
+) -> Tuple[Optional[os.stat_result], Optional[Dict]]:
+    """
+    Get a file's result without searching it, if the index rules out any
+    match or the result cache has it.
+
+    Args:
+        file_path: Path to the file
+        cache: Result cache, or None when not caching
+        fingerprint: Query fingerprint for the cache
+        may_match: Index predicate telling whether a file may match, or
+            None when not using an index
+
+    Returns:
+        The file's stat, to store its result with later, and its known
+        result if there is one. The stat is None when not caching, the file
+        can't be stat'ed or its result needn't be stored.
+    """
+    if may_match is not None and not may_match(file_path):
+        return None, {"file": file_path, "matches": MatchSet()}
+    if cache is None:
+        return None, None
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None, None
+
+    cached = cache.get(file_path, fingerprint, stat)
+    if cached is None:
+        return stat, None
+    return stat, dict({"file": file_path}, **cached)
+
+def _store_cache(
+    result: Dict,
+    stat: Optional[os.stat_result],
+    cache: Optional["ResultCache"],
+    fingerprint: Optional[str]
+) -> None:
+    """
+    Store a file's result in the result cache. Errors aren't cached, nor
+    are results cut short by a pattern timeout, which may not time out on
+    the next run.
+
+    Args:
+        result: The file's result
+        stat: The file's stat from _lookup_known_result, taken before searching it
+        cache: Result cache, or None when not caching
+        fingerprint: Query fingerprint for the cache
+    """
+    if cache is None or stat is None or "error" in result:
+        return
+    guarded = getattr(result.get("matches"), "guarded", ())
+    if any(reason == "timeout" for _, _, reason in guarded):
+        return
+    cache.put(result["file"], fingerprint, stat, result)
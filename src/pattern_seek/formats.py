@@ -0,0 +1,447 @@
+import csv
+import io
+import json
+import mmap
+import sys
+from abc import ABC, abstractmethod
+from array import array
+from collections import Counter
+from typing import BinaryIO, Callable, Dict, List, Optional, Sequence, Tuple, Union
+from pattern_seek.matches import MatchSet
+from pattern_seek.output import FORMAT_BATCH_SIZE, WRITE_BUFFER_SIZE, MatchWriter
+from pattern_seek.patterns import match_byte_offsets
+
+try:
+    # optional fast JSON encoder (pip install orjson)
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+# Output formats: colored text for people, the others for programs
+FORMATS = ("text", "jsonl", "csv", "ndjson-compact")
+
+# Columns of the csv format
+CSV_COLUMNS = (
+    "record", "file", "type", "line", "start", "end",
+    "byte_start", "byte_end", "match", "matches", "error",
+    "files", "files_with_matches", "skipped", "errors",
+)
+
+# Keys of the context of a match in a jsonl match record
+_CONTEXT_KEYS = ("context_line", "context_before", "context_after")
+
+class RecordWriter(ABC):
+    """
+    Writes search results to a binary stream as machine-readable records,
+    one file at a time as results arrive.
+
+    Each file gets a "file" record with its number of matches (or why it
+    wasn't searched), followed by a record per match with its position both
+    as line and columns and as byte offsets in the file, and the output ends
+    with a "summary" record. Subclasses decide how records are encoded.
+    """
+
+    def __init__(self, stream: Optional[BinaryIO] = None):
+        """
+        Args:
+            stream: Binary stream to write to (default: the buffer of
+                sys.stdout)
+        """
+        self.stream = stream if stream is not None else sys.stdout.buffer
+        self.files = 0
+        self.files_with_matches = 0
+        self.matches = 0
+        self.skipped = 0
+        self.errors = 0
+        self._pending: List[bytes] = []
+        self._pending_size = 0
+
+    def write_result(self, result: Dict) -> None:
+        """
+        Write the records of one file.
+
+        Args:
+            result: A file result from search_files or iter_search_files
+        """
+        self._write_result(result, True)
+
+    def write_count(self, result: Dict) -> None:
+        """
+        Write just the file record of one file, with its number of matches.
+
+        Args:
+            result: A file result from search_files or iter_search_files
+        """
+        self._write_result(result, False)
+
+    def write_file_name(self, result: Dict) -> None:
+        """
+        Write the file record of one file if it has matches (files without
+        are still counted in the summary).
+
+        Args:
+            result: A file result from search_files or iter_search_files
+        """
+        if result.get("matches"):
+            self._write_result(result, False)
+        else:
+            self._count(result)
+
+    def finish(self) -> None:
+        """
+        Write the summary record, after the last file.
+        """
+        self._write_summary()
+        self._flush_pending()
+
+    def flush(self) -> None:
+        """
+        Flush the underlying stream.
+        """
+        self._flush_pending()
+        self.stream.flush()
+
+    def _write_result(self, result: Dict, include_matches: bool) -> None:
+        """
+        Write the file record of one file, and its match records if
+        include_matches is set, counting the file in the summary.
+        """
+        file_path = result["file"]
+        matches = result.get("matches")
+        self._count(result)
+        self._write_file(file_path, result, matches)
+        if matches and include_matches:
+            byte_offsets = _byte_offsets(file_path, matches)
+            for start in range(0, len(matches), FORMAT_BATCH_SIZE):
+                stop = min(start + FORMAT_BATCH_SIZE, len(matches))
+                self._write_matches(file_path, matches, start, stop, byte_offsets)
+        self._flush_pending()
+
+    def _count(self, result: Dict) -> None:
+        """
+        Count one file in the summary.
+        """
+        matches = result.get("matches")
+        if "skipped" in result:
+            self.skipped += 1
+        elif "error" in result:
+            self.errors += 1
+        else:
+            self.files += 1
+            if matches:
+                self.files_with_matches += 1
+                self.matches += len(matches)
+
+    @abstractmethod
+    def _write_file(
+        self, file_path: str, result: Dict, matches: Optional[MatchSet]
+    ) -> None:
+        """
+        Encode the file record of one file.
+        """
+
+    @abstractmethod
+    def _write_matches(
+        self,
+        file_path: str,
+        matches: MatchSet,
+        start: int,
+        stop: int,
+        byte_offsets: Optional[array]
+    ) -> None:
+        """
+        Encode the match records of matches[start:stop].
+        """
+
+    @abstractmethod
+    def _write_summary(self) -> None:
+        """
+        Encode the summary record.
+        """
+
+    def _write(self, data: bytes) -> None:
+        """
+        Queue encoded records, writing them out once there are about
+        WRITE_BUFFER_SIZE bytes.
+        """
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self._pending_size >= WRITE_BUFFER_SIZE:
+            self._flush_pending()
+
+    def _flush_pending(self) -> None:
+        if self._pending:
+            self.stream.write(b"".join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+
+class JsonLinesWriter(RecordWriter):
+    """
+    Writes one JSON document per line.
+
+    In the "jsonl" format every record is an object with a "record" key
+    ("file", "match" or "summary"); match records carry the context of the
+    match when there is any, and file records list the lines that weren't
+    fully searched (see MatchSet.guarded) under "guarded". The
+    "ndjson-compact" format writes arrays instead, without context:
+
+    - ``["file", id, path, matches, error, skipped]``, ids counting from 0
+    - ``[id, type, line, start, end, byte_start, byte_end, match]``
+    - ``["summary", files, files_with_matches, matches, skipped, errors]``
+
+    Records are encoded with orjson when it is installed, json otherwise.
+    """
+
+    def __init__(self, stream: Optional[BinaryIO] = None, compact: bool = False):
+        """
+        Args:
+            stream: Binary stream to write to (default: the buffer of
+                sys.stdout)
+            compact: Whether to write the "ndjson-compact" arrays rather than
+                "jsonl" objects
+        """
+        super().__init__(stream)
+        self.compact = compact
+        self._encode = _json_encoder()
+        self._file_id = -1
+
+    def _write_file(
+        self, file_path: str, result: Dict, matches: Optional[MatchSet]
+    ) -> None:
+        self._file_id += 1
+        count = len(matches) if matches is not None else 0
+        if self.compact:
+            record = [
+                "file", self._file_id, file_path, count,
+                result.get("error"), result.get("skipped"),
+            ]
+        else:
+            record = {"record": "file", "file": file_path, "matches": count}
+            if matches:
+                record["counts"] = dict(
+                    Counter(match_type for match_type, _, _, _ in matches.rows())
+                )
+            if matches is not None and matches.guarded:
+                record["guarded"] = [
+                    {"line": line, "pattern": pattern_type, "reason": reason}
+                    for line, pattern_type, reason in matches.guarded
+                ]
+            for key in ("error", "skipped"):
+                if key in result:
+                    record[key] = result[key]
+        self._write(self._encode(record) + b"\n")
+
+    def _write_matches(
+        self,
+        file_path: str,
+        matches: MatchSet,
+        start: int,
+        stop: int,
+        byte_offsets: Optional[array]
+    ) -> None:
+        encode = self._encode
+        rows = list(matches.rows(start, stop))
+        byte_starts, byte_ends = _byte_spans(rows, start, byte_offsets)
+
+        spans = zip(rows, byte_starts, byte_ends)
+
+        if self.compact:
+            file_id = self._file_id
+            records = [
+                encode([
+                    file_id, match_type, line, match_start, match_start + len(text),
+                    byte_start, byte_end, text,
+                ])
+                for (match_type, line, match_start, text), byte_start, byte_end
+                in spans
+            ]
+        else:
+            records = []
+            has_context = matches.context_lines > 0
+            for index, (row, byte_start, byte_end) in enumerate(spans, start):
+                match_type, line, match_start, text = row
+                record = {
+                    "record": "match",
+                    "file": file_path,
+                    "type": match_type,
+                    "match": text,
+                    "line": line,
+                    "start": match_start,
+                    "end": match_start + len(text),
+                    "byte_start": byte_start,
+                    "byte_end": byte_end,
+                }
+                context = matches.context(index) if has_context else None
+                if context is not None:
+                    record.update(zip(_CONTEXT_KEYS, context))
+                records.append(encode(record))
+        records.append(b"")
+        self._write(b"\n".join(records))
+
+    def _write_summary(self) -> None:
+        counts = [
+            self.files, self.files_with_matches, self.matches, self.skipped, self.errors
+        ]
+        if self.compact:
+            record = ["summary"] + counts
+        else:
+            keys = ("files", "files_with_matches", "matches", "skipped", "errors")
+            record = dict({"record": "summary"}, **dict(zip(keys, counts)))
+        self._write(self._encode(record) + b"\n")
+
+class CsvWriter(RecordWriter):
+    """
+    Writes CSV rows with the CSV_COLUMNS, starting with a header row. The
+    "record" column tells file, match and summary rows apart; columns that
+    don't apply to a row are left empty, and context isn't included.
+    """
+
+    def __init__(self, stream: Optional[BinaryIO] = None):
+        """
+        Args:
+            stream: Binary stream to write to (default: the buffer of
+                sys.stdout)
+        """
+        super().__init__(stream)
+        self._rows = io.StringIO()
+        self._writer = csv.writer(self._rows, lineterminator="\n")
+        self._writer.writerow(CSV_COLUMNS)
+        self._write_rows()
+
+    def _write_rows(self) -> None:
+        self._write(self._rows.getvalue().encode("utf-8"))
+        self._rows.seek(0)
+        self._rows.truncate()
+
+    def _write_file(
+        self, file_path: str, result: Dict, matches: Optional[MatchSet]
+    ) -> None:
+        count = len(matches) if matches is not None else ""
+        error = result.get("error") or (
+            f"skipped: {result['skipped']}" if "skipped" in result else ""
+        )
+        self._writer.writerow(
+            _csv_row(record="file", file=file_path, matches=count, error=error)
+        )
+        self._write_rows()
+
+    def _write_matches(
+        self,
+        file_path: str,
+        matches: MatchSet,
+        start: int,
+        stop: int,
+        byte_offsets: Optional[array]
+    ) -> None:
+        rows = list(matches.rows(start, stop))
+        byte_starts, byte_ends = _byte_spans(rows, start, byte_offsets)
+        self._writer.writerows(
+            ("match", file_path, match_type, line, match_start, match_start + len(text),
+             byte_start, byte_end, text, "", "", "", "", "", "")
+            for (match_type, line, match_start, text), byte_start, byte_end
+            in zip(rows, byte_starts, byte_ends)
+        )
+        self._write_rows()
+
+    def _write_summary(self) -> None:
+        self._writer.writerow(_csv_row(
+            record="summary",
+            matches=self.matches,
+            files=self.files,
+            files_with_matches=self.files_with_matches,
+            skipped=self.skipped,
+            errors=self.errors,
+        ))
+        self._write_rows()
+
+def create_writer(
+    output_format: str,
+    stream: Optional[BinaryIO] = None,
+    colored: bool = True,
+    encoding: str = "utf-8"
+) -> Union[MatchWriter, RecordWriter]:
+    """
+    Create the writer for an output format.
+
+    Args:
+        output_format: One of FORMATS
+        stream: Binary stream to write to (default: the buffer of sys.stdout)
+        colored: Whether to use ANSI color codes ("text" only)
+        encoding: Encoding of the output ("text" only; records are UTF-8)
+
+    Returns:
+        A writer with write_result, write_count, write_file_name and flush
+        methods; record writers also need finish called after the last result
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    if output_format == "text":
+        return MatchWriter(stream, colored=colored, encoding=encoding)
+    if output_format in ("jsonl", "ndjson-compact"):
+        return JsonLinesWriter(stream, compact=output_format == "ndjson-compact")
+    if output_format == "csv":
+        return CsvWriter(stream)
+    raise ValueError(f"Unknown output format: {output_format}")
+
+def _csv_row(**values: object) -> Tuple:
+    """
+    Build a csv row from the values of some of the CSV_COLUMNS, leaving the
+    others empty.
+    """
+    return tuple(values.get(column, "") for column in CSV_COLUMNS)
+
+def _json_encoder() -> Callable[[object], bytes]:
+    """
+    Get the function encoding a record as compact JSON in UTF-8.
+    """
+    if orjson is not None:
+        return orjson.dumps
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    return lambda record: encode(record).encode("utf-8")
+
+def _byte_offsets(file_path: str, matches: MatchSet) -> Optional[array]:
+    """
+    Find the byte offset of each match in the file it was found in.
+
+    Args:
+        file_path: Path to the file
+        matches: The file's matches
+
+    Returns:
+        The offsets, or None if the file can no longer be read or no longer
+        holds the lines of the matches
+    """
+    try:
+        with open(file_path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                return match_byte_offsets(buffer, matches)
+    except (OSError, ValueError):
+        return None
+
+def _byte_spans(
+    rows: List[Tuple[str, int, int, str]],
+    start: int,
+    byte_offsets: Optional[array]
+) -> Tuple[Sequence[Optional[int]], Sequence[Optional[int]]]:
+    """
+    Get the byte offsets of the start and end of consecutive matches.
+
+    Args:
+        rows: The matches, from MatchSet.rows
+        start: Index of the first of them
+        byte_offsets: Byte offset of the start of every match, or None
+
+    Returns:
+        The start offsets and the end offsets (None when unknown)
+    """
+    if byte_offsets is None:
+        unknown = [None] * len(rows)
+        return unknown, unknown
+
+    byte_starts = byte_offsets[start:start + len(rows)]
+    byte_ends = [
+        byte_start + (len(text) if text.isascii() else len(text.encode("utf-8")))
+        for byte_start, (_, _, _, text) in zip(byte_starts, rows)
+    ]
+    return byte_starts, byte_ends
@@ -0,0 +1,663 @@
+import os
+import sys
+import json
+import struct
+from array import array
+from itertools import accumulate
+from typing import (
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from pattern_seek.patterns import PREFILTER_MAP, _BYTES_PREFILTERS
+from pattern_seek.walker import is_binary_file, walk_files
+
+# Name of the index file pattern-seek index build writes into a directory
+INDEX_FILE_NAME = ".pattern-seek-index"
+
+# Bumped whenever the index file layout changes; older indexes are rebuilt
+INDEX_VERSION = 1
+
+# Files are read this many bytes at a time when indexing
+INDEX_BLOCK_SIZE = 4 * 1024 * 1024
+
+# An incremental update rebuilds the index from scratch once more than this
+# fraction of the file ids belong to removed or changed files
+MAX_DEAD_RATIO = 0.5
+
+# The file starts with a NUL byte, so searches skip it as binary
+_MAGIC = b"\x00PSEEKIX"
+_HEADER = struct.Struct("<8sIQ")
+_COUNT = struct.Struct("<Q")
+
+# File flags: bit 0 marks files that must always be searched (binary or not
+# valid UTF-8); the next bits say which pattern types' prefilters matched
+_UNINDEXED = 1
+
+# Characters that re.IGNORECASE matches with ASCII letters, folded into
+# those letters so lowercased ASCII queries still find them
+_FOLD_REPLACEMENTS = [
+    ("İ".encode("utf-8"), b"i"),
+    ("ı".encode("utf-8"), b"i"),
+    ("K".encode("utf-8"), b"k"),
+    ("ſ".encode("utf-8"), b"s"),
+]
+
+# Lowercase ASCII and turn every other non-ASCII byte into 0x80
+_FOLD_TABLE = bytes(
+    byte + 32 if 65 <= byte <= 90 else min(byte, 0x80)
+    for byte in range(256)
+)
+
+# Bytes that end a line for str.splitlines(), which queries can't match across
+_LINE_BREAK_BYTES = frozenset(b"\n\r\x0b\x0c\x1c\x1d\x1e")
+
+FileEntry = List[Union[str, int]]
+
+# Three folded bytes, keyed in the index as (a << 16) | (b << 8) | c
+Trigram = Tuple[int, int, int]
+
+class TrigramIndex:
+    """
+    Trigram index of the files under a directory, read from an index file.
+
+    The index maps every trigram of (case-folded) file content to the
+    delta-encoded ids of the files containing it, and records for each file
+    which pattern types' prefilters it matches. Searches use it to rule out
+    files without opening them. Files that aren't in the index, or changed
+    since it was built, are always searched, so results are never lost.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        root: str,
+        files: List[Optional[FileEntry]],
+        anchors: List[Tuple[str, str]],
+        keys: array,
+        offsets: array,
+        lengths: array,
+        last_ids: array,
+        postings_start: int
+    ):
+        """
+        Args:
+            path: Path to the index file
+            root: Absolute path of the indexed directory
+            files: [relative path, size, mtime_ns, flags] per file id, None
+                for removed or changed files
+            anchors: (pattern type, prefilter source) for each flag bit
+                after _UNINDEXED
+            keys: Sorted trigram keys
+            offsets: Offset of each trigram's postings in the postings blob
+            lengths: Length in bytes of each trigram's postings
+            last_ids: Last file id in each trigram's postings
+            postings_start: Offset of the postings blob in the index file
+        """
+        self.path = path
+        self.root = root
+        self.files = files
+        self.anchors = anchors
+        self.keys = keys
+        self.offsets = offsets
+        self.lengths = lengths
+        self.last_ids = last_ids
+        self.postings_start = postings_start
+        self._ids = {
+            entry[0]: file_id
+            for file_id, entry in enumerate(files)
+            if entry is not None
+        }
+
+    @classmethod
+    def load(cls, path: str) -> "TrigramIndex":
+        """
+        Read an index file.
+
+        Only the header, file table and trigram table are read; postings are
+        read as queries need them.
+
+        Args:
+            path: Path to the index file
+
+        Returns:
+            The index
+
+        Raises:
+            ValueError: If the file isn't an index of this version
+        """
+        with open(path, 'rb') as f:
+            magic, version, meta_length = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _MAGIC or version != INDEX_VERSION:
+                raise ValueError(
+                    f"Not a pattern-seek index (version {INDEX_VERSION}): {path}"
+                )
+            meta = json.loads(f.read(meta_length).decode("utf-8"))
+            (count,) = _COUNT.unpack(f.read(_COUNT.size))
+
+            tables = []
+            for typecode in ("I", "Q", "I", "I"):
+                table = array(typecode)
+                table.frombytes(f.read(count * table.itemsize))
+                if sys.byteorder == "big":
+                    table.byteswap()
+                tables.append(table)
+            postings_start = f.tell()
+
+        return cls(
+            path,
+            meta["root"],
+            meta["files"],
+            [tuple(anchor) for anchor in meta["anchors"]],
+            *tables,
+            postings_start
+        )
+
+    def candidate_filter(
+        self,
+        pattern_types: Union[str, List[str]],
+        text_pattern: Optional[Union[str, Sequence[str]]] = None
+    ) -> Callable[[str], bool]:
+        """
+        Build a predicate telling whether a file may match a query.
+
+        Text is looked up case-folded whether or not the search is
+        case-sensitive, which only lets more files through.
+
+        Args:
+            pattern_types: Pattern types searched for
+            text_pattern: Text searched for with the "text" pattern type, or
+                a list of terms
+
+        Returns:
+            A function taking a file path and returning False only if the
+            index rules out any match in that file
+        """
+        candidates = self._candidate_ids(pattern_types, text_pattern)
+
+        def may_match(file_path: str) -> bool:
+            if candidates is None:
+                return True
+            relative_path = _relative_path(file_path, self.root)
+            file_id = (
+                self._ids.get(relative_path) if relative_path is not None else None
+            )
+            if file_id is None:
+                return True
+
+            _, size, mtime_ns, flags = self.files[file_id]
+            if flags & _UNINDEXED:
+                return True
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                # let the search report the error
+                return True
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                return True
+
+            return file_id in candidates
+
+        return may_match
+
+    def _candidate_ids(
+        self,
+        pattern_types: Union[str, List[str]],
+        text_pattern: Optional[Union[str, Sequence[str]]]
+    ) -> Optional[Set[int]]:
+        """
+        Find the ids of the indexed files that may match any of the pattern types.
+
+        Args:
+            pattern_types: Pattern types searched for
+            text_pattern: Text searched for with the "text" pattern type, or
+                a list of terms
+
+        Returns:
+            The candidate file ids, or None if the index can't narrow the
+            search down (e.g. a GUID search, or a term shorter than a trigram)
+        """
+        if isinstance(pattern_types, str):
+            pattern_types = [pattern_types]
+
+        candidates: Set[int] = set()
+        for pattern_type in pattern_types:
+            if pattern_type == "text" and text_pattern:
+                terms = (
+                    [text_pattern] if isinstance(text_pattern, str) else text_pattern
+                )
+                ids = set()
+                for term in filter(None, terms):
+                    term_ids = self._text_candidate_ids(term)
+                    if term_ids is None:
+                        ids = None
+                        break
+                    ids |= term_ids
+            else:
+                ids = self._anchor_candidate_ids(pattern_type)
+            if ids is None:
+                return None
+            candidates |= ids
+        return candidates
+
+    def _anchor_candidate_ids(self, pattern_type: str) -> Optional[Set[int]]:
+        """
+        Find the ids of the files where a pattern type's prefilter matched.
+
+        Args:
+            pattern_type: A built-in pattern type
+
+        Returns:
+            The file ids, or None if the index has no flag for the type's
+            current prefilter
+        """
+        anchor = (pattern_type, PREFILTER_MAP.get(pattern_type))
+        if anchor not in self.anchors:
+            return None
+
+        bit = 2 << self.anchors.index(anchor)
+        return {
+            file_id
+            for file_id, entry in enumerate(self.files)
+            if entry is not None and entry[3] & bit
+        }
+
+    def _text_candidate_ids(self, text_pattern: str) -> Optional[Set[int]]:
+        """
+        Find the ids of the files containing every trigram of the search text.
+
+        Args:
+            text_pattern: The search text
+
+        Returns:
+            The file ids, or None if the text has no usable trigram
+        """
+        keys = _query_trigrams(text_pattern)
+        if not keys:
+            return None
+
+        # intersect the shortest posting lists first
+        found = []
+        for key in keys:
+            idx = _find_key(self.keys, key)
+            if idx is None:
+                return set()
+            found.append(idx)
+        found.sort(key=lambda idx: self.lengths[idx])
+
+        candidates: Optional[Set[int]] = None
+        with open(self.path, 'rb') as f:
+            for idx in found:
+                f.seek(self.postings_start + self.offsets[idx])
+                ids = _decode_postings(f.read(self.lengths[idx]))
+                candidates = (
+                    set(ids) if candidates is None else candidates.intersection(ids)
+                )
+                if not candidates:
+                    break
+        return candidates
+
+def build_index(
+    root: str,
+    index_path: Optional[str] = None,
+    rebuild: bool = False
+) -> Dict:
+    """
+    Build or update the trigram index of the files under a directory.
+
+    If the index file already exists, only new and changed files (by size
+    and mtime_ns) are read; removed files are dropped from the file table
+    and the postings of unchanged files are copied over as they are.
+
+    Args:
+        root: Directory to index, recursively
+        index_path: Where to write the index (default: INDEX_FILE_NAME in root)
+        rebuild: Whether to read every file again even if an index exists
+
+    Returns:
+        A dictionary with the index "path" and the number of indexed
+        "files", "updated" (new or changed) files and "removed" files
+    """
+    root = os.path.abspath(root)
+    index_path = os.path.abspath(index_path or os.path.join(root, INDEX_FILE_NAME))
+    anchors = list(PREFILTER_MAP.items())
+
+    old = None
+    if not rebuild and os.path.exists(index_path):
+        try:
+            old = TrigramIndex.load(index_path)
+        except (ValueError, OSError, struct.error):
+            old = None
+        if old is not None and (old.root != root or old.anchors != anchors):
+            old = None
+
+    files: List[Optional[FileEntry]] = list(old.files) if old is not None else []
+    ids = dict(old._ids) if old is not None else {}
+    postings: Dict[Trigram, List[int]] = {}
+    seen: Set[int] = set()
+    updated = 0
+
+    for file_path in walk_files(root):
+        if os.path.abspath(file_path) == index_path:
+            continue
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            continue
+
+        relative_path = _relative_path(file_path, root)
+        file_id = ids.get(relative_path)
+        if file_id is not None:
+            if files[file_id][1:3] == [stat.st_size, stat.st_mtime_ns]:
+                seen.add(file_id)
+                continue
+            # changed: its old postings stay behind a dead id
+            files[file_id] = None
+
+        flags, trigrams = _index_file(file_path, anchors)
+        file_id = len(files)
+        files.append([relative_path, stat.st_size, stat.st_mtime_ns, flags])
+        ids[relative_path] = file_id
+        seen.add(file_id)
+        for trigram in trigrams:
+            file_ids = postings.get(trigram)
+            if file_ids is None:
+                postings[trigram] = [file_id]
+            else:
+                file_ids.append(file_id)
+        updated += 1
+
+    removed = 0
+    for file_id, entry in enumerate(files):
+        if entry is not None and file_id not in seen:
+            files[file_id] = None
+            removed += 1
+
+    if old is not None and files.count(None) > len(files) * MAX_DEAD_RATIO:
+        return build_index(root, index_path, rebuild=True)
+
+    _write_index(index_path, root, files, anchors, postings, old)
+    return {
+        "path": index_path,
+        "files": len(seen),
+        "updated": updated,
+        "removed": removed,
+    }
+
+def _index_file(
+    file_path: str, anchors: List[Tuple[str, str]]
+) -> Tuple[int, Set[Trigram]]:
+    """
+    Read a file and collect its flags and trigrams.
+
+    Args:
+        file_path: Path to the file
+        anchors: (pattern type, prefilter source) for each flag bit
+
+    Returns:
+        The file's flags and the set of its trigrams. Binary files,
+        files that aren't valid UTF-8 and unreadable files are flagged
+        _UNINDEXED, with no trigrams.
+    """
+    try:
+        if is_binary_file(file_path):
+            return _UNINDEXED, set()
+
+        flags = 0
+        trigrams: Set[Trigram] = set()
+        with open(file_path, 'rb') as f:
+            for block in _read_line_blocks(f):
+                # searches would fail to decode the file
+                block.decode("utf-8")
+
+                for bit, (pattern_type, _) in enumerate(anchors):
+                    prefilter = _BYTES_PREFILTERS[pattern_type]
+                    if not flags & (2 << bit) and prefilter.search(block):
+                        flags |= 2 << bit
+
+                folded = _fold(block)
+                trigrams.update(zip(folded, folded[1:], folded[2:]))
+    except (OSError, UnicodeDecodeError):
+        return _UNINDEXED, set()
+
+    return flags, trigrams
+
+def _read_line_blocks(f: BinaryIO) -> Iterator[bytes]:
+    """
+    Read a binary file in blocks of about INDEX_BLOCK_SIZE bytes that end at
+    a newline, so no character or line is split between blocks.
+
+    Args:
+        f: File opened in binary mode
+
+    Yields:
+        Blocks of whole lines (the last one may not end in a newline)
+    """
+    carry = b""
+    while True:
+        block = f.read(INDEX_BLOCK_SIZE)
+        if not block:
+            break
+        block = carry + block
+        cut = block.rfind(b"\n") + 1
+        if cut == 0:
+            carry = block
+            continue
+        carry = block[cut:]
+        yield block[:cut]
+    if carry:
+        yield carry
+
+def _fold(data: bytes) -> bytes:
+    """
+    Case-fold UTF-8 bytes the way the index stores them.
+
+    ASCII is lowercased, the non-ASCII letters re.IGNORECASE matches with
+    i, k and s become those letters, and every other non-ASCII byte becomes
+    0x80.
+
+    Args:
+        data: UTF-8 encoded text
+
+    Returns:
+        The folded bytes
+    """
+    for original, replacement in _FOLD_REPLACEMENTS:
+        data = data.replace(original, replacement)
+    return data.translate(_FOLD_TABLE)
+
+def _query_trigrams(text_pattern: str) -> Set[int]:
+    """
+    Get the trigram keys a file must contain for the search text to match.
+
+    Trigrams are only taken from runs of ASCII characters: other characters
+    may match case variants with a different UTF-8 length, and line breaks
+    can't be matched at all.
+
+    Args:
+        text_pattern: The search text
+
+    Returns:
+        The set of trigram keys, empty if the text has no usable run
+    """
+    folded = _fold(text_pattern.encode("utf-8"))
+    keys = set()
+    for idx in range(len(folded) - 2):
+        a, b, c = folded[idx:idx + 3]
+        if max(a, b, c) < 0x80 and not {a, b, c} & _LINE_BREAK_BYTES:
+            keys.add((a << 16) | (b << 8) | c)
+    return keys
+
+def _find_key(keys: array, key: int) -> Optional[int]:
+    """
+    Binary search the sorted trigram keys.
+
+    Args:
+        keys: Sorted trigram keys
+        key: The key to find
+
+    Returns:
+        The position of the key, or None if it isn't there
+    """
+    lo, hi = 0, len(keys)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if keys[mid] < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    if lo < len(keys) and keys[lo] == key:
+        return lo
+    return None
+
+def _encode_postings(file_ids: Iterable[int], previous: int = -1) -> bytes:
+    """
+    Delta-encode increasing file ids as varints.
+
+    Args:
+        file_ids: Increasing file ids
+        previous: The id the first delta is taken from (the last id already
+            encoded, when appending)
+
+    Returns:
+        The encoded deltas
+    """
+    file_ids = list(file_ids)
+    deltas = [b - a for a, b in zip([previous] + file_ids[:-1], file_ids)]
+    if max(deltas, default=0) < 0x80:
+        # every delta fits in one byte
+        return bytes(deltas)
+
+    encoded = bytearray()
+    for delta in deltas:
+        while delta >= 0x80:
+            encoded.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        encoded.append(delta)
+    return bytes(encoded)
+
+def _decode_postings(data: bytes) -> List[int]:
+    """
+    Decode postings written by _encode_postings.
+
+    Args:
+        data: The encoded deltas
+
+    Returns:
+        The file ids
+    """
+    if max(data, default=0) < 0x80:
+        deltas: Iterable[int] = data
+    else:
+        deltas = []
+        value = shift = 0
+        for byte in data:
+            value |= (byte & 0x7F) << shift
+            if byte & 0x80:
+                shift += 7
+            else:
+                deltas.append(value)
+                value = shift = 0
+    return list(accumulate(deltas, initial=-1))[1:]
+
+def _relative_path(file_path: str, root: str) -> Optional[str]:
+    """
+    Get the /-separated path of a file relative to the indexed directory.
+
+    Args:
+        file_path: Path to the file
+        root: Absolute path of the indexed directory
+
+    Returns:
+        The relative path, or None if the file is outside the directory
+    """
+    relative_path = os.path.relpath(os.path.abspath(file_path), root)
+    if relative_path == os.pardir or relative_path.startswith(os.pardir + os.sep):
+        return None
+    return relative_path.replace(os.sep, "/")
+
+def _write_index(
+    index_path: str,
+    root: str,
+    files: List[Optional[FileEntry]],
+    anchors: List[Tuple[str, str]],
+    postings: Dict[Trigram, List[int]],
+    old: Optional[TrigramIndex] = None
+) -> None:
+    """
+    Write an index file, replacing any existing one atomically.
+
+    Args:
+        index_path: Where to write the index
+        root: Absolute path of the indexed directory
+        files: File table
+        anchors: (pattern type, prefilter source) for each flag bit
+        postings: New file ids per trigram, appended after the old
+            index's postings for that trigram
+        old: The index being updated, if any
+    """
+    postings_by_key = {
+        (a << 16) | (b << 8) | c: file_ids for (a, b, c), file_ids in postings.items()
+    }
+    old_keys = old.keys if old is not None else array("I")
+    keys = array("I", sorted(set(old_keys) | set(postings_by_key)))
+    offsets = array("Q")
+    lengths = array("I")
+    last_ids = array("I")
+
+    meta = json.dumps({
+        "root": root,
+        "files": files,
+        "anchors": anchors,
+    }, separators=(",", ":")).encode("utf-8")
+
+    # The tables come before the postings but are only known once the
+    # postings are written, so leave room for them and fill them in after
+    temp_path = index_path + ".tmp"
+    with open(temp_path, 'wb') as out:
+        out.write(_HEADER.pack(_MAGIC, INDEX_VERSION, len(meta)))
+        out.write(meta)
+        out.write(_COUNT.pack(len(keys)))
+        tables_start = out.tell()
+        out.seek(tables_start + len(keys) * (4 + 8 + 4 + 4))
+
+        with (
+            open(old.path, 'rb') if old is not None else open(os.devnull, 'rb')
+        ) as old_file:
+            old_idx = 0
+            offset = 0
+            for key in keys:
+                data = b""
+                last_id = -1
+                if old_idx < len(old_keys) and old_keys[old_idx] == key:
+                    old_file.seek(old.postings_start + old.offsets[old_idx])
+                    data = old_file.read(old.lengths[old_idx])
+                    last_id = old.last_ids[old_idx]
+                    old_idx += 1
+                new_ids = postings_by_key.get(key)
+                if new_ids:
+                    data += _encode_postings(new_ids, last_id)
+                    last_id = new_ids[-1]
+
+                out.write(data)
+                offsets.append(offset)
+                lengths.append(len(data))
+                last_ids.append(last_id)
+                offset += len(data)
+
+        out.seek(tables_start)
+        for table in (keys, offsets, lengths, last_ids):
+            if sys.byteorder == "big":
+                table.byteswap()
+            out.write(table.tobytes())
+
+    os.replace(temp_path, index_path)
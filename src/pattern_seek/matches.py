@@ -0,0 +1,617 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping, Sequence
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence as SequenceType,
+    Tuple,
+    Union,
+)
+
+# Match texts are joined into one string per this many matches
+TEXT_BLOCK_SIZE = 4096
+
+# Context of a match: its line, the lines before it and the lines after it
+Context = Tuple[str, List[str], List[str]]
+
+# A run of consecutive lines around one or more matches: the number of its
+# first line, and the lines
+Hunk = Tuple[int, List[str]]
+
+# A line a search guard cut short: its number, the pattern type that timed
+# out on it (None when the whole line was), and the reason ("timeout",
+# "truncated", "windowed" or "skipped")
+Guarded = Tuple[int, Optional[str], str]
+
+class MatchSet(Sequence):
+    """
+    The matches of a search, stored column by column.
+
+    Pattern types are stored as codes into ``types``, line numbers and
+    offsets in arrays, and the matched texts joined into a few large
+    strings they are sliced from on access. That takes a few dozen bytes
+    per match instead of several hundred for a dictionary, and pickles
+    compactly for worker processes.
+
+    Items are MatchView objects, read-only mappings with the keys the
+    match dictionaries used to have ("type", "match", "start", "end",
+    "line", and "context_line", "context_before" and "context_after" when
+    context was added). A MatchSet compares equal to any sequence of
+    equal mappings, including a list of dictionaries.
+
+    Context lines are stored once, in hunks: the line ranges of matches
+    that overlap or touch are merged the way grep does, and every match
+    points to its hunk. The context of a match is sliced from its hunk on
+    access.
+
+    Lines the search didn't fully search because of a guard (a line length
+    cap or a pattern timeout) are listed in ``guarded``.
+    """
+
+    __slots__ = (
+        "types",
+        "line_numbers",
+        "_codes",
+        "_lines",
+        "_starts",
+        "_ends",
+        "_offsets",
+        "_blocks",
+        "_block_starts",
+        "_pending",
+        "_text_size",
+        "context_lines",
+        "_hunks",
+        "_hunk_ids",
+        "guarded",
+    )
+
+    def __init__(
+        self,
+        types: Optional[List[str]] = None,
+        line_numbers: bool = True,
+        context_lines: int = 0
+    ):
+        """
+        Args:
+            types: Pattern types the matches can have, in code order
+            line_numbers: Whether matches carry a line number
+            context_lines: Number of lines of context before and after each
+                match that has a hunk
+        """
+        self.types: List[str] = list(types or [])
+        self.line_numbers = line_numbers
+        self.context_lines = context_lines
+        self._codes = array("H")
+        self._lines = array("I")
+        self._starts = array("I")
+        self._ends = array("I")
+        # offset of each match's text in the joined texts
+        self._offsets = array("Q")
+        self._blocks: List[str] = []
+        self._block_starts: List[int] = []
+        # texts not joined into a block yet
+        self._pending: List[str] = []
+        self._text_size = 0
+        self._hunks: List[Hunk] = []
+        # index of each match's hunk (-1 for none), once some match has one
+        self._hunk_ids: Optional[array] = None
+        self.guarded: List[Guarded] = []
+
+    def append(
+        self, type_code: int, line: int, start: int, end: int, text: str
+    ) -> None:
+        """
+        Add a match.
+
+        Args:
+            type_code: Index of the match's pattern type in types
+            line: Line number of the match (ignored without line numbers)
+            start: Start index of the match in the line
+            end: End index of the match in the line
+            text: The matched text, end - start characters long
+        """
+        self._codes.append(type_code)
+        self._lines.append(line)
+        self._starts.append(start)
+        self._ends.append(end)
+        self._offsets.append(self._text_size)
+        self._text_size += len(text)
+        self._pending.append(text)
+        if len(self._pending) >= TEXT_BLOCK_SIZE:
+            self._flush()
+        if self._hunk_ids is not None:
+            self._hunk_ids.append(-1)
+
+    def extend(self, other: "MatchSet") -> None:
+        """
+        Add all the matches of another set, mapping its pattern types.
+
+        Args:
+            other: The matches to add
+        """
+        self.guarded.extend(other.guarded)
+        if not other:
+            return
+        if not self and not self.types:
+            self.types = list(other.types)
+            self.line_numbers = other.line_numbers
+        self.context_lines = self.context_lines or other.context_lines
+
+        if other._hunk_ids is not None and self._hunk_ids is None:
+            self._hunk_ids = array("i", [-1]) * len(self)
+        if self._hunk_ids is not None:
+            self._extend_hunks(other)
+
+        if other.types == self.types[:len(other.types)]:
+            self._codes.extend(other._codes)
+        else:
+            codes = [self._type_code(pattern_type) for pattern_type in other.types]
+            self._codes.extend(array("H", (codes[code] for code in other._codes)))
+
+        self._lines.extend(other._lines)
+        self._starts.extend(other._starts)
+        self._ends.extend(other._ends)
+
+        self._flush()
+        other._flush()
+        base = self._text_size
+        self._offsets.extend(array("Q", (base + offset for offset in other._offsets)))
+        self._block_starts.extend(
+            base + block_start for block_start in other._block_starts
+        )
+        self._blocks.extend(other._blocks)
+        self._text_size += other._text_size
+
+    def shift_lines(self, offset: int) -> None:
+        """
+        Add an offset to the line number of every match, e.g. to turn line
+        numbers within a chunk into line numbers within the file.
+
+        Args:
+            offset: Number of lines to add
+        """
+        if offset:
+            self._lines = array("I", (line + offset for line in self._lines))
+            self._hunks = [
+                (first_line + offset, lines) for first_line, lines in self._hunks
+            ]
+            self.guarded = [
+                (line + offset, pattern_type, reason)
+                for line, pattern_type, reason in self.guarded
+            ]
+
+    def context(self, index: int) -> Optional[Context]:
+        """
+        Get the context of a match.
+
+        Args:
+            index: Index of the match
+
+        Returns:
+            The match's (line, lines before, lines after), or None if it has
+            no context
+        """
+        hunk = self.hunk(index)
+        if hunk is None:
+            return None
+        first_line, lines = hunk
+        line_idx = self._lines[index] - first_line
+        return (
+            lines[line_idx],
+            lines[max(0, line_idx - self.context_lines):line_idx],
+            lines[line_idx + 1:line_idx + self.context_lines + 1]
+        )
+
+    def hunk(self, index: int) -> Optional[Hunk]:
+        """
+        Get the hunk holding the context of a match.
+
+        Args:
+            index: Index of the match
+
+        Returns:
+            The hunk, or None if the match has no context
+        """
+        if self._hunk_ids is None or self._hunk_ids[index] < 0:
+            return None
+        return self._hunks[self._hunk_ids[index]]
+
+    def hunks(self) -> Iterator[Tuple[Optional[Hunk], range]]:
+        """
+        Group the matches by hunk.
+
+        Yields:
+            Each hunk (None for matches without context) and the indices of
+            the consecutive matches that share it
+        """
+        if self._hunk_ids is None:
+            if self:
+                yield None, range(len(self))
+            return
+
+        start = 0
+        for index in range(1, len(self) + 1):
+            if index == len(self) or self._hunk_id(index) != self._hunk_id(start):
+                yield self.hunk(start), range(start, index)
+                start = index
+
+    def add_hunk(self, first_line: int, lines: List[str], indices: range) -> None:
+        """
+        Attach context to matches.
+
+        Args:
+            first_line: Number of the first line of the hunk
+            lines: Consecutive lines covering the line and context of each
+                of the matches, clipped to the text they were found in
+            indices: Indices of the matches
+        """
+        if self._hunk_ids is None:
+            self._hunk_ids = array("i", [-1]) * len(self)
+        for index in indices:
+            self._hunk_ids[index] = len(self._hunks)
+        self._hunks.append((first_line, lines))
+
+    def pad_context(self, before: SequenceType[str], after: SequenceType[str]) -> None:
+        """
+        Complete the context of matches near the edges of the text they
+        were found in (e.g. one chunk of a file), adding only the lines
+        their context is missing.
+
+        Args:
+            before: Lines just before the text (only the last ones are used)
+            after: Lines just after the text (only the first ones are used)
+        """
+        if not self._hunks:
+            return
+        first_line, lines = self._hunks[0]
+        missing = self.context_lines - (self._first_line(0) - first_line)
+        if missing > 0 and before:
+            added = list(before[-missing:])
+            self._hunks[0] = (first_line - len(added), added + lines)
+
+        first_line, lines = self._hunks[-1]
+        missing = self.context_lines - (first_line + len(lines) - 1 - self._lines[-1])
+        if missing > 0 and after:
+            self._hunks[-1] = (first_line, lines + list(after[:missing]))
+
+    def complete_count(self) -> int:
+        """
+        Count the leading matches whose context can't grow any more: all of
+        them unless the last hunk is still short of lines after its last
+        match (because the text ended), in which case its matches are left
+        out.
+
+        Returns:
+            The number of matches
+        """
+        if not self._hunks or self._hunk_ids[-1] < 0:
+            return len(self)
+        first_line, lines = self._hunks[-1]
+        if first_line + len(lines) - 1 - self._lines[-1] >= self.context_lines:
+            return len(self)
+        return self._hunk_ids.index(len(self._hunks) - 1)
+
+    def text(self, index: int) -> str:
+        """
+        Get the matched text of a match.
+
+        Args:
+            index: Index of the match
+
+        Returns:
+            The matched text
+        """
+        self._flush()
+        offset = self._offsets[index]
+        block_idx = bisect_right(self._block_starts, offset) - 1
+        start = offset - self._block_starts[block_idx]
+        return self._blocks[block_idx][
+            start : start + self._ends[index] - self._starts[index]
+        ]
+
+    def texts(self, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        """
+        Get the matched texts of consecutive matches at once.
+
+        Args:
+            start: Index of the first match
+            stop: Index just past the last match (default: the end)
+
+        Returns:
+            The matched texts
+        """
+        self._flush()
+        stop = len(self) if stop is None else min(stop, len(self))
+        offsets = self._offsets
+        texts: List[str] = []
+        while start < stop:
+            # the matches from start that sit in the same block
+            block_idx = bisect_right(self._block_starts, offsets[start]) - 1
+            block = self._blocks[block_idx]
+            block_start = self._block_starts[block_idx]
+            block_stop = max(
+                bisect_left(offsets, block_start + len(block), start, stop), start + 1
+            )
+            texts.extend([
+                block[offset - block_start:offset - block_start + end - match_start]
+                for offset, match_start, end in zip(
+                    offsets[start:block_stop],
+                    self._starts[start:block_stop],
+                    self._ends[start:block_stop]
+                )
+            ])
+            start = block_stop
+        return texts
+
+    def rows(
+        self, start: int = 0, stop: Optional[int] = None
+    ) -> Iterator[Tuple[str, int, int, str]]:
+        """
+        Iterate over the pattern type, line number, start and text of
+        consecutive matches, without going through MatchView objects.
+
+        Args:
+            start: Index of the first match
+            stop: Index just past the last match (default: the end)
+
+        Returns:
+            An iterator of (type, line, start, matched text)
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        return zip(
+            map(self.types.__getitem__, self._codes[start:stop]),
+            self._lines[start:stop],
+            self._starts[start:stop],
+            self.texts(start, stop)
+        )
+
+    def positions(
+        self, start: int = 0, stop: Optional[int] = None
+    ) -> Iterator[Tuple[int, int]]:
+        """
+        Iterate over the line number and start column of consecutive matches.
+
+        Args:
+            start: Index of the first match
+            stop: Index just past the last match (default: the end)
+
+        Returns:
+            An iterator of (line, start)
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        return zip(self._lines[start:stop], self._starts[start:stop])
+
+    def to_columns(self) -> Dict:
+        """
+        Convert the matches to plain lists and strings, e.g. for JSON.
+
+        Returns:
+            A dictionary that from_columns turns back into an equal set
+        """
+        self._flush()
+        return {
+            "types": self.types,
+            "line_numbers": self.line_numbers,
+            "codes": self._codes.tolist(),
+            "lines": self._lines.tolist(),
+            "starts": self._starts.tolist(),
+            "ends": self._ends.tolist(),
+            "text": "".join(self._blocks),
+            "context_lines": self.context_lines,
+            "hunks": self._hunks,
+            "hunk_ids": self._hunk_ids.tolist() if self._hunk_ids is not None else None,
+            "guarded": self.guarded,
+        }
+
+    @classmethod
+    def from_columns(cls, columns: Dict) -> "MatchSet":
+        """
+        Rebuild a set from the output of to_columns.
+
+        Args:
+            columns: The columns
+
+        Returns:
+            The matches
+        """
+        matches = cls(
+            columns["types"], columns["line_numbers"], columns["context_lines"]
+        )
+        matches._codes = array("H", columns["codes"])
+        matches._lines = array("I", columns["lines"])
+        matches._starts = array("I", columns["starts"])
+        matches._ends = array("I", columns["ends"])
+
+        offset = 0
+        for start, end in zip(matches._starts, matches._ends):
+            matches._offsets.append(offset)
+            offset += end - start
+        matches._blocks = [columns["text"]]
+        matches._block_starts = [0]
+        matches._text_size = len(columns["text"])
+
+        matches._hunks = [(first_line, lines) for first_line, lines in columns["hunks"]]
+        if columns["hunk_ids"] is not None:
+            matches._hunk_ids = array("i", columns["hunk_ids"])
+        matches.guarded = [tuple(entry) for entry in columns["guarded"]]
+        return matches
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union["MatchView", "MatchSet"]:
+        if isinstance(index, slice):
+            return self._take(range(len(self))[index])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("match index out of range")
+        return MatchView(self, index)
+
+    def __iter__(self) -> Iterator["MatchView"]:
+        for index in range(len(self)):
+            yield MatchView(self, index)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self) -> str:
+        return f"MatchSet({[dict(match) for match in self]!r})"
+
+    def __getstate__(self) -> Dict:
+        self._flush()
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state: Dict) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def _type_code(self, pattern_type: str) -> int:
+        """
+        Get the code of a pattern type, adding it if it's new.
+        """
+        if pattern_type not in self.types:
+            self.types.append(pattern_type)
+        return self.types.index(pattern_type)
+
+    def _hunk_id(self, index: int) -> int:
+        """
+        Get the index of a match's hunk, -1 for none.
+        """
+        return -1 if self._hunk_ids is None else self._hunk_ids[index]
+
+    def _first_line(self, hunk_id: int) -> int:
+        """
+        Get the line number of the first match in a hunk.
+        """
+        return self._lines[self._hunk_ids.index(hunk_id)]
+
+    def _extend_hunks(self, other: "MatchSet") -> None:
+        """
+        Add the hunks of another set whose matches are being added, merging
+        its first hunk into the last one of this set when they overlap or
+        touch.
+
+        Args:
+            other: The matches being added, in the same text after these
+        """
+        if other._hunk_ids is None:
+            self._hunk_ids.extend(array("i", [-1]) * len(other))
+            return
+
+        other_hunks = other._hunks
+        base = len(self._hunks)
+        if self._hunks and other_hunks:
+            first_line, lines = self._hunks[-1]
+            other_first_line, other_lines = other_hunks[0]
+            overlap = first_line + len(lines) - other_first_line
+            if overlap >= 0:
+                self._hunks[-1] = (first_line, lines + other_lines[overlap:])
+                other_hunks = other_hunks[1:]
+                base -= 1
+        self._hunks.extend(other_hunks)
+        self._hunk_ids.extend(
+            array(
+                "i",
+                (hunk_id + base if hunk_id >= 0 else -1 for hunk_id in other._hunk_ids),
+            )
+        )
+
+    def _flush(self) -> None:
+        """
+        Join the pending match texts into a block.
+        """
+        if self._pending:
+            self._block_starts.append(self._text_size - sum(map(len, self._pending)))
+            self._blocks.append("".join(self._pending))
+            self._pending = []
+
+    def _take(self, indices: range) -> "MatchSet":
+        """
+        Copy some of the matches into a new set, with all the guarded lines.
+
+        Args:
+            indices: Indices of the matches to copy, in order
+
+        Returns:
+            The new set
+        """
+        taken = MatchSet(self.types, self.line_numbers, self.context_lines)
+        if indices.step == 1:
+            texts = self.texts(indices.start, indices.stop)
+        else:
+            texts = [self.text(index) for index in indices]
+        for index, text in zip(indices, texts):
+            taken.append(
+                self._codes[index],
+                self._lines[index],
+                self._starts[index],
+                self._ends[index],
+                text
+            )
+        if self._hunk_ids is not None:
+            taken._hunk_ids = array("i", [-1]) * len(taken)
+            hunk_ids: Dict[int, int] = {}
+            for taken_index, index in enumerate(indices):
+                hunk_id = self._hunk_ids[index]
+                if hunk_id >= 0:
+                    if hunk_id not in hunk_ids:
+                        hunk_ids[hunk_id] = len(taken._hunks)
+                        taken._hunks.append(self._hunks[hunk_id])
+                    taken._hunk_ids[taken_index] = hunk_ids[hunk_id]
+        taken.guarded = list(self.guarded)
+        return taken
+
+class MatchView(Mapping):
+    """
+    One match of a MatchSet, as a read-only mapping.
+    """
+
+    __slots__ = ("_matches", "_index")
+
+    def __init__(self, matches: MatchSet, index: int):
+        self._matches = matches
+        self._index = index
+
+    def __getitem__(self, key: str) -> Union[str, int, List[str]]:
+        matches = self._matches
+        index = self._index
+        if key == "type":
+            return matches.types[matches._codes[index]]
+        if key == "match":
+            return matches.text(index)
+        if key == "start":
+            return matches._starts[index]
+        if key == "end":
+            return matches._ends[index]
+        if key == "line" and matches.line_numbers:
+            return matches._lines[index]
+
+        context = matches.context(index)
+        if context is not None:
+            if key == "context_line":
+                return context[0]
+            if key == "context_before":
+                return context[1]
+            if key == "context_after":
+                return context[2]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from ("type", "match", "start", "end")
+        if self._matches.line_numbers:
+            yield "line"
+        if self._matches.hunk(self._index) is not None:
+            yield from ("context_line", "context_before", "context_after")
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
@@ -1,129 +1,475 @@
 import sys
-from typing import Dict, List, TextIO, Optional, Union
-import colorama
-from colorama import Fore, Style
+from typing import (
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Sequence,
+    TextIO,
+    Tuple,
+    Optional,
+    Union,
+)
+from pattern_seek.matches import Hunk, MatchSet
 
-# Initialize colorama
-colorama.init()
-
-# Color mapping for different pattern types
+# Color mapping for different pattern types, by colorama.Fore name
 COLOR_MAP = {
-    "email": Fore.BLUE,
-    "guid": Fore.GREEN,
-    "date": Fore.YELLOW,
-    "url": Fore.MAGENTA,
-    "ip": Fore.CYAN,
-    "default": Fore.WHITE
+    "email": "BLUE",
+    "guid": "GREEN",
+    "date": "YELLOW",
+    "url": "MAGENTA",
+    "ip": "CYAN",
+    "default": "WHITE"
 }
 
+# colorama, once colored output has loaded it (see _colors)
+_colorama = None
+
+# Output is written once about this many characters are ready
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Matches without context are formatted this many at a time
+FORMAT_BATCH_SIZE = 4096
+
+# Prefix and suffix around highlighted matches, per pattern type
+Styles = Dict[str, Tuple[str, str]]
+
 def format_matches(
-    matches: Union[List[Dict], List[Dict[str, Union[str, List[Dict]]]]],
+    matches: Union[Sequence[Mapping], List[Dict[str, Union[str, Sequence[Mapping]]]]],
     colored: bool = True,
     include_file_info: bool = False
 ) -> str:
-    result = []
-    
-    # Check if we're dealing with file matches
-    if include_file_info:
-        for file_entry in matches:
-            file_path = file_entry["file"]
-            result.append(f"\n{Fore.WHITE}{Style.BRIGHT}File: {file_path}{Style.RESET_ALL}")
-            
-            if "error" in file_entry:
-                result.append(f"  {Fore.RED}Error: {file_entry['error']}{Style.RESET_ALL}")
-                continue
-                
-            file_matches = file_entry["matches"]
-            if not file_matches:
-                result.append(f"  {Fore.YELLOW}No matches found{Style.RESET_ALL}")
-                continue
-                
-            # Format matches for this file
-            file_result = format_matches(file_matches, colored, include_file_info=False)
-            
-            # Indent all lines
-            indented = "\n".join(f"  {line}" for line in file_result.splitlines())
-            result.append(indented)
-    else:
-        # Format individual matches
-        for match in matches:
-            # Get match color based on type
-            color = COLOR_MAP.get(match["type"], COLOR_MAP["default"]) if colored else ""
-            reset = Style.RESET_ALL if colored else ""
-            
-            # Add context before match if available
-            if "context_before" in match:
-                for i, line in enumerate(match["context_before"]):
-                    context_line_num = match["line"] - len(match["context_before"]) + i
-                    result.append(f"Line {context_line_num}: {line}")
-            
-            # Get the full line if available
-            line_num = match["line"]
-            match_text = match["match"]
-            line_content = None
-            
-            # If we have context information, try to extract the original line
-            if "context_before" in match or "context_after" in match:
-                all_context_lines = []
-                if "context_before" in match:
-                    all_context_lines.extend(match["context_before"])
-                
-                # The current line should be at this position
-                current_line_idx = len(match.get("context_before", []))
-                if "context_line" in match:
-                    # Use the stored context line if available
-                    line_content = match["context_line"]
-                else:
-                    # Try to find the match in context lines
-                    for i, line in enumerate(all_context_lines):
-                        if match_text in line:
-                            line_content = line
-                            break
-            
-            # If we couldn't find the original line, just use the match text
-            if line_content is None:
-                line_content = match_text
-            
-            # Highlight the match in the line
-            start = line_content.find(match_text)
-            if start >= 0:
-                end = start + len(match_text)
-                highlighted = (
-                    line_content[:start] + 
-                    f"{color}{Style.BRIGHT}{match_text}{reset}" + 
-                    line_content[end:]
-                )
-                result.append(f"Line {line_num}: {highlighted}")
-            else:
-                # If we can't find the match in the line, just show the line
-                result.append(f"Line {line_num}: {line_content}")
-            
-            # Add context after match if available
-            if "context_after" in match:
-                for i, line in enumerate(match["context_after"]):
-                    context_line_num = match["line"] + i + 1
-                    result.append(f"Line {context_line_num}: {line}")
-                    
-            # Add a separator between matches
-            result.append("")
-    
-    return "\n".join(result)
+    """
+    Format search matches for display.
+
+    Args:
+        matches: Matches (e.g. a MatchSet), or list of file match dictionaries
+        colored: Whether to use ANSI color codes
+        include_file_info: Whether matches include file information
+
+    Returns:
+        The formatted matches
+    """
+    return "\n".join(_iter_lines(matches, colored, include_file_info))
 
 def print_matches(
-    matches: Union[List[Dict], List[Dict[str, Union[str, List[Dict]]]]],
+    matches: Union[Sequence[Mapping], List[Dict[str, Union[str, Sequence[Mapping]]]]],
     colored: bool = True,
     include_file_info: bool = False,
     output: TextIO = sys.stdout
 ) -> None:
     """
     Print formatted search matches to the specified output.
-    
+
     Args:
-        matches: List of match dictionaries, or list of file match dictionaries
+        matches: Matches (e.g. a MatchSet), or list of file match dictionaries
         colored: Whether to use ANSI color codes in the output
         include_file_info: Whether matches include file information
         output: Output stream to print to (default: sys.stdout)
     """
-    
-    formatted = format_matches(matches, colored, include_file_info)
-    print(formatted, file=output)
\ No newline at end of file
+    if not _write_lines(_iter_lines(matches, colored, include_file_info), output.write):
+        output.write("\n")
+
+class MatchWriter:
+    """
+    Writes search results to a binary stream as they arrive, in the format
+    of print_matches.
+
+    Matches are highlighted at the offsets they already carry, formatted
+    in batches, and encoded and written about WRITE_BUFFER_SIZE characters
+    at a time, so memory stays flat and large outputs are bound by I/O.
+    """
+
+    def __init__(
+        self,
+        stream: Optional[BinaryIO] = None,
+        colored: bool = True,
+        encoding: str = "utf-8"
+    ):
+        """
+        Args:
+            stream: Binary stream to write to (default: the buffer of
+                sys.stdout). ANSI codes are written as they are, without
+                colorama's processing.
+            colored: Whether to use ANSI color codes
+            encoding: Encoding of the output; characters it can't represent
+                are replaced
+        """
+        self.stream = stream if stream is not None else sys.stdout.buffer
+        self.colored = colored
+        self.encoding = encoding
+        self._styles = _highlight_styles(colored)
+
+    def write_result(self, result: Dict) -> None:
+        """
+        Write the matches of one file, with a header naming the file.
+
+        Args:
+            result: A file result from search_files or iter_search_files
+        """
+        _write_lines(_iter_file_lines(result, self._styles, self.colored), self._write)
+
+    def write_count(self, result: Dict) -> None:
+        """
+        Write one file's number of matches, as a "path:count" line.
+
+        Args:
+            result: A file result from search_files or iter_search_files
+        """
+        if "skipped" in result:
+            return
+        name = self._file_name(result["file"])
+        if "error" in result:
+            error, reset = ("", "")
+            if self.colored:
+                Fore, Style = _colors()
+                error, reset = Fore.RED, Style.RESET_ALL
+            self._write(f"{name}: {error}Error: {result['error']}{reset}\n")
+        else:
+            self._write(f"{name}:{len(result['matches'])}\n")
+
+    def write_file_name(self, result: Dict) -> None:
+        """
+        Write the path of one file on a line of its own if it has matches.
+
+        Args:
+            result: A file result from search_files or iter_search_files
+        """
+        if result.get("matches"):
+            self._write(self._file_name(result["file"]) + "\n")
+
+    def write_matches(self, matches: Sequence[Mapping]) -> None:
+        """
+        Write matches without file information.
+
+        Args:
+            matches: The matches (e.g. a MatchSet)
+        """
+        _write_lines(_iter_match_lines(matches, self._styles), self._write)
+
+    def flush(self) -> None:
+        """
+        Flush the underlying stream.
+        """
+        self.stream.flush()
+
+    def _write(self, text: str) -> None:
+        self.stream.write(text.encode(self.encoding, "replace"))
+
+    def _file_name(self, file_path: str) -> str:
+        if not self.colored:
+            return file_path
+        Fore, Style = _colors()
+        return f"{Fore.MAGENTA}{file_path}{Style.RESET_ALL}"
+
+def _colors():
+    """
+    Import and initialize colorama the first time colored output is
+    written, so runs without colors (e.g. output to a pipe) never load it.
+
+    Returns:
+        colorama's (Fore, Style)
+    """
+    global _colorama
+    if _colorama is None:
+        import colorama
+        colorama.init()
+        _colorama = colorama
+    return _colorama.Fore, _colorama.Style
+
+def _write_lines(lines: Iterable[str], write: Callable[[str], None]) -> bool:
+    """
+    Write lines, each followed by a newline, joining them into strings of
+    about WRITE_BUFFER_SIZE characters.
+
+    Args:
+        lines: The lines (a "line" may hold several, separated by newlines)
+        write: Function writing a string
+
+    Returns:
+        Whether anything was written
+    """
+    written = False
+    batch: List[str] = []
+    size = 0
+    for line in lines:
+        batch.append(line)
+        size += len(line) + 1
+        if size >= WRITE_BUFFER_SIZE:
+            batch.append("")
+            write("\n".join(batch))
+            written = True
+            batch = []
+            size = 0
+    if batch:
+        batch.append("")
+        write("\n".join(batch))
+        written = True
+    return written
+
+def _highlight_styles(colored: bool) -> Styles:
+    """
+    Build the prefix and suffix highlighting a match of each pattern type.
+
+    Args:
+        colored: Whether to use ANSI color codes
+
+    Returns:
+        The (prefix, suffix) of each type in COLOR_MAP
+    """
+    if not colored:
+        return {pattern_type: ("", "") for pattern_type in COLOR_MAP}
+    Fore, Style = _colors()
+    return {
+        pattern_type: (f"{getattr(Fore, color)}{Style.BRIGHT}", Style.RESET_ALL)
+        for pattern_type, color in COLOR_MAP.items()
+    }
+
+def _iter_lines(
+    matches: Union[Sequence[Mapping], List[Dict[str, Union[str, Sequence[Mapping]]]]],
+    colored: bool,
+    include_file_info: bool
+) -> Iterator[str]:
+    """
+    Produce the lines format_matches joins.
+
+    Args:
+        matches: Matches, or list of file match dictionaries
+        colored: Whether to use ANSI color codes
+        include_file_info: Whether matches include file information
+
+    Yields:
+        The output lines
+    """
+    styles = _highlight_styles(colored)
+    if include_file_info:
+        for file_entry in matches:
+            yield from _iter_file_lines(file_entry, styles, colored)
+    else:
+        yield from _iter_match_lines(matches, styles)
+
+def _iter_file_lines(file_entry: Dict, styles: Styles, colored: bool) -> Iterator[str]:
+    """
+    Produce the lines of one file's results: a blank line, a header naming
+    the file, then its matches (or error) indented.
+
+    Args:
+        file_entry: The file's result
+        styles: Highlighting of each pattern type
+        colored: Whether to use ANSI color codes
+
+    Yields:
+        The output lines
+    """
+    # Skipped files (e.g. binaries) aren't listed
+    if "skipped" in file_entry:
+        return
+
+    if colored:
+        Fore, Style = _colors()
+        reset = Style.RESET_ALL
+        header, error, notice = f"{Fore.WHITE}{Style.BRIGHT}", Fore.RED, Fore.YELLOW
+    else:
+        reset = header = error = notice = ""
+    yield ""
+    yield f"{header}File: {file_entry['file']}{reset}"
+
+    if "error" in file_entry:
+        yield f"  {error}Error: {file_entry['error']}{reset}"
+        return
+
+    file_matches = file_entry["matches"]
+    if not file_matches:
+        yield f"  {notice}No matches found{reset}"
+        return
+
+    # Indented matches, separated by an (indented) blank line
+    for idx, block in enumerate(_iter_blocks(file_matches, styles, "  ")):
+        if idx:
+            yield "  "
+        yield block
+
+def _iter_match_lines(matches: Sequence[Mapping], styles: Styles) -> Iterator[str]:
+    """
+    Produce the lines of matches without file information, each match (or
+    hunk) followed by a blank line.
+
+    Args:
+        matches: The matches
+        styles: Highlighting of each pattern type
+
+    Yields:
+        The output lines
+    """
+    for block in _iter_blocks(matches, styles, ""):
+        yield block
+        yield ""
+
+def _iter_blocks(
+    matches: Sequence[Mapping], styles: Styles, indent: str
+) -> Iterator[str]:
+    """
+    Format matches as blocks of lines: one per match, or one per hunk of
+    shared context lines for a MatchSet with context.
+
+    Consecutive blocks are meant to be separated by a line holding just the
+    indent. Matches of a MatchSet without context are formatted in batches
+    of FORMAT_BATCH_SIZE, each batch yielded as a single string holding its
+    blocks and the separators between them.
+
+    Args:
+        matches: The matches
+        styles: Highlighting of each pattern type
+        indent: Text to start each line with
+
+    Yields:
+        The lines of each block (or batch), joined with newlines
+    """
+    if not isinstance(matches, MatchSet):
+        for match in matches:
+            yield "\n".join(indent + line for line in _format_match(match, styles))
+        return
+
+    separator = f"\n{indent}\n"
+    for hunk, indices in matches.hunks():
+        if hunk is not None:
+            yield "\n".join(
+                indent + line for line in _format_hunk(matches, hunk, indices, styles)
+            )
+            continue
+
+        # Without context, a match's line is just its highlighted text
+        prefixes = {}
+        suffixes = {}
+        for pattern_type in matches.types:
+            prefixes[pattern_type], suffixes[pattern_type] = (
+                styles.get(pattern_type) or styles["default"]
+            )
+        for start in range(indices.start, indices.stop, FORMAT_BATCH_SIZE):
+            rows = matches.rows(start, min(start + FORMAT_BATCH_SIZE, indices.stop))
+            yield separator.join(
+                [
+                    f"{indent}Line {line}: "
+                    f"{prefixes[pattern_type]}{text}{suffixes[pattern_type]}"
+                    for pattern_type, line, _, text in rows
+                ]
+            )
+
+def _format_match(match: Mapping, styles: Styles) -> List[str]:
+    """
+    Format one match with the context it carries.
+
+    Args:
+        match: The match
+        styles: Highlighting of each pattern type
+
+    Returns:
+        The output lines
+    """
+    result = []
+    prefix, suffix = styles.get(match["type"]) or styles["default"]
+
+    # Add context before match if available
+    if "context_before" in match:
+        for i, line in enumerate(match["context_before"]):
+            context_line_num = match["line"] - len(match["context_before"]) + i
+            result.append(f"Line {context_line_num}: {line}")
+
+    # Get the full line if available
+    line_num = match["line"]
+    match_text = match["match"]
+    line_content = None
+
+    # If we have context information, try to extract the original line
+    if "context_before" in match or "context_after" in match:
+        all_context_lines = []
+        if "context_before" in match:
+            all_context_lines.extend(match["context_before"])
+
+        if "context_line" in match:
+            # Use the stored context line if available
+            line_content = match["context_line"]
+        else:
+            # Try to find the match in context lines
+            for i, line in enumerate(all_context_lines):
+                if match_text in line:
+                    line_content = line
+                    break
+
+    # If we couldn't find the original line, just use the match text
+    if line_content is None:
+        line_content = match_text
+
+    # Highlight the match in the line, where it starts if that's known
+    start = match.get("start", -1)
+    if start < 0 or line_content[start:start + len(match_text)] != match_text:
+        start = line_content.find(match_text)
+    if start >= 0:
+        end = start + len(match_text)
+        highlighted = (
+            line_content[:start] +
+            f"{prefix}{match_text}{suffix}" +
+            line_content[end:]
+        )
+        result.append(f"Line {line_num}: {highlighted}")
+    else:
+        # If we can't find the match in the line, just show the line
+        result.append(f"Line {line_num}: {line_content}")
+
+    # Add context after match if available
+    if "context_after" in match:
+        for i, line in enumerate(match["context_after"]):
+            context_line_num = match["line"] + i + 1
+            result.append(f"Line {context_line_num}: {line}")
+
+    return result
+
+def _format_hunk(
+    matches: MatchSet, hunk: Hunk, indices: range, styles: Styles
+) -> List[str]:
+    """
+    Format a hunk of context lines, highlighting the matches in it.
+
+    Args:
+        matches: The matches
+        hunk: The hunk
+        indices: Indices of the matches in the hunk
+        styles: Highlighting of each pattern type
+
+    Returns:
+        The output lines
+    """
+    # spans to highlight in each matched line
+    spans: Dict[int, List[Tuple[int, int, str, str]]] = {}
+    first_line, lines = hunk
+    for pattern_type, line_num, start, match_text in matches.rows(
+        indices.start, indices.stop
+    ):
+        line_content = lines[line_num - first_line]
+        if line_content[start:start + len(match_text)] != match_text:
+            start = line_content.find(match_text)
+        if start >= 0:
+            prefix, suffix = styles.get(pattern_type) or styles["default"]
+            spans.setdefault(line_num, []).append(
+                (start, start + len(match_text), prefix, suffix)
+            )
+
+    result = []
+    for line_num, line_content in enumerate(lines, first_line):
+        # highlight from the right so earlier spans keep their offsets
+        previous_start = len(line_content)
+        for start, end, prefix, suffix in sorted(spans.get(line_num, []), reverse=True):
+            if end > previous_start:
+                continue
+            line_content = (
+                line_content[:start] +
+                f"{prefix}{line_content[start:end]}{suffix}" +
+                line_content[end:]
+            )
+            previous_start = start
+        result.append(f"Line {line_num}: {line_content}")
+
+    return result
@@ -0,0 +1,368 @@
+import os
+import re
+import sys
+import json
+import hashlib
+import warnings
+from typing import Dict, Iterator, List, Optional, Pattern, Sequence, Tuple
+
+from pattern_seek.cache import default_cache_path
+from pattern_seek.patterns import PATTERN_MAP
+
+try:
+    # TOML packs need Python 3.11+ or tomli (pip install tomli)
+    import tomllib
+except ImportError:  # pragma: no cover - depends on the Python version
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+# Errors a malformed pack file raises while parsing
+_PARSE_ERRORS = (UnicodeDecodeError, json.JSONDecodeError) + (
+    (tomllib.TOMLDecodeError,) if tomllib is not None else ()
+)
+
+# Bumped whenever the layout of cached packs changes, so old entries miss
+PACK_CACHE_VERSION = 2
+
+# Flags a pack pattern may set, and the inline flag each one becomes
+PACK_FLAGS = {
+    "IGNORECASE": "i",
+    "ASCII": "a",
+    "DOTALL": "s",
+    "VERBOSE": "x",
+}
+
+# Names pack patterns can't take: the built-in pattern types and the words
+# the command line gives a meaning of their own
+RESERVED_NAMES = set(PATTERN_MAP) | {"text", "all", "default"}
+
+_NAME = re.compile(r'[A-Za-z][A-Za-z0-9_.-]*\Z')
+
+class PackPattern:
+    """
+    A named regex from a pattern pack, with the parts of the re.Pattern
+    interface the pattern scanners use.
+
+    The regex and its prefilter are compiled on first use, so the patterns
+    of a large pack that never get past their prefilter cost nothing. The
+    pack's flags are part of the source, as a scoped inline group, so flags
+    is always 0.
+    """
+
+    flags = 0
+
+    def __init__(self, name: str, pattern: str, prefilter: Optional[str] = None):
+        """
+        Args:
+            name: The pattern type the pattern is searched for as
+            pattern: Source of the regex, with its flags inline
+            prefilter: Source of a regex every match contains a match of,
+                or None
+        """
+        self.name = name
+        self.pattern = pattern
+        self.prefilter_pattern = prefilter
+        self._compiled: Optional[Pattern] = None
+        self._prefilter: Optional[Pattern] = None
+
+    def __reduce__(self):
+        # sent to worker processes as its sources, to be compiled there on use
+        return (PackPattern, (self.name, self.pattern, self.prefilter_pattern))
+
+    def __repr__(self) -> str:
+        return f"PackPattern({self.name!r}, {self.pattern!r})"
+
+    @property
+    def compiled(self) -> Pattern:
+        """The compiled regex."""
+        # threads racing here compile it twice at worst
+        if self._compiled is None:
+            self._compiled = re.compile(self.pattern)
+        return self._compiled
+
+    @property
+    def prefilter(self) -> Optional[Pattern]:
+        """The compiled prefilter, or None if the pattern has none."""
+        if self._prefilter is None and self.prefilter_pattern is not None:
+            self._prefilter = re.compile(self.prefilter_pattern)
+        return self._prefilter
+
+    def finditer(
+        self, string: str, pos: int = 0, endpos: int = sys.maxsize
+    ) -> Iterator:
+        return self.compiled.finditer(string, pos, endpos)
+
+    def search(self, string: str, pos: int = 0, endpos: int = sys.maxsize):
+        return self.compiled.search(string, pos, endpos)
+
+    def match(self, string: str, pos: int = 0, endpos: int = sys.maxsize):
+        return self.compiled.match(string, pos, endpos)
+
+class PatternPack:
+    """
+    Named regexes loaded from a pattern-pack file with load_pattern_pack,
+    searched for as pattern types next to the built-in ones.
+
+    Packs are immutable, and equal when loaded from the same content, so
+    copies sent to worker processes share compiled queries there.
+    """
+
+    def __init__(self, patterns: Sequence[PackPattern], digest: str):
+        """
+        Args:
+            patterns: The pack's patterns, in file order
+            digest: Hash of the pack file's content
+        """
+        self.patterns = {pattern.name: pattern for pattern in patterns}
+        self.digest = digest
+
+    @property
+    def names(self) -> List[str]:
+        """The pattern types the pack defines, in file order."""
+        return list(self.patterns)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.patterns
+
+    def __getitem__(self, name: str) -> PackPattern:
+        return self.patterns[name]
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, PatternPack) and other.digest == self.digest
+
+    def __hash__(self) -> int:
+        return hash(self.digest)
+
+def default_pack_cache_dir() -> str:
+    """
+    Get the directory loaded packs are cached in, next to the result cache.
+
+    Returns:
+        Path to the directory
+    """
+    return os.path.join(os.path.dirname(default_cache_path()), "packs")
+
+def load_pattern_pack(path: str, cache_dir: Optional[str] = None) -> PatternPack:
+    """
+    Load a pattern pack from a TOML or JSON file.
+
+    A pack maps pattern type names to a regex, optional flags and optional
+    prefilter literals, one of which every match must contain (lines
+    without any are skipped):
+
+        [patterns.aws-access-key]
+        regex = '(?:AKIA|ASIA)[0-9A-Z]{16}'
+        prefilter = ["AKIA", "ASIA"]
+
+        [patterns.private-key]
+        regex = '-----BEGIN [A-Z ]*PRIVATE KEY-----'
+        flags = ["IGNORECASE"]
+        prefilter = ["PRIVATE KEY"]
+
+    JSON packs have the same layout, as {"patterns": {"name": {...}}}.
+    Checking a pack compiles each of its regexes, so the checked pack is
+    cached in cache_dir by the hash of the file's content; loading the same
+    file again reads it from there, and each regex is only compiled once
+    it's searched with.
+
+    Args:
+        path: Path to the pack file; .toml files are read as TOML, others
+            as JSON
+        cache_dir: Directory to cache checked packs in (default:
+            default_pack_cache_dir())
+
+    Returns:
+        The pack
+
+    Raises:
+        ValueError: If the pack is malformed or a regex doesn't compile
+    """
+    with open(path, 'rb') as f:
+        content = f.read()
+    # the Python version decides which regexes compile
+    key = hashlib.sha256(content)
+    version = f"{PACK_CACHE_VERSION}:{sys.version_info[0]}.{sys.version_info[1]}"
+    key.update(version.encode("ascii"))
+    digest = key.hexdigest()
+    cache_path = os.path.join(cache_dir or default_pack_cache_dir(), f"{digest}.json")
+
+    definitions = _read_cached_pack(cache_path)
+    if definitions is None:
+        definitions = _check_pack(_parse_pack(path, content), path)
+        _write_cached_pack(cache_path, definitions)
+
+    return PatternPack(
+        [
+            PackPattern(name, pattern, prefilter)
+            for name, pattern, prefilter in definitions
+        ],
+        digest,
+    )
+
+def _parse_pack(path: str, content: bytes) -> Dict:
+    """
+    Parse a pack file.
+
+    Args:
+        path: Path to the pack file, whose extension picks the format
+        content: Its content
+
+    Returns:
+        The parsed document
+    """
+    toml = path.lower().endswith(".toml")
+    if toml and tomllib is None:
+        raise ValueError(
+            "TOML pattern packs need Python 3.11+ or tomli (pip install tomli)"
+        )
+    try:
+        text = content.decode("utf-8")
+        return tomllib.loads(text) if toml else json.loads(text)
+    except _PARSE_ERRORS as e:
+        raise ValueError(f"Can't read pattern pack {path}: {e}") from e
+
+def _check_pack(document: Dict, path: str) -> List[Tuple[str, str, Optional[str]]]:
+    """
+    Check the patterns of a parsed pack and turn them into regex sources.
+
+    Args:
+        document: The parsed pack
+        path: Path to the pack file, for error messages
+
+    Returns:
+        A (name, pattern, prefilter) tuple per pattern, with the flags inline
+        in the pattern and the prefilter literals as one alternation
+    """
+    patterns = document.get("patterns") if isinstance(document, dict) else None
+    if not isinstance(patterns, dict) or not patterns:
+        raise ValueError(f"Pattern pack {path} has no [patterns] table")
+
+    definitions = []
+    for name, definition in patterns.items():
+        if not _NAME.match(name):
+            raise ValueError(f"Invalid pattern name in {path}: {name!r}")
+        if name in RESERVED_NAMES:
+            raise ValueError(f"Pattern name {name!r} in {path} is reserved")
+        if not isinstance(definition, dict) or not isinstance(
+            definition.get("regex"), str
+        ):
+            raise ValueError(f"Pattern {name!r} in {path} needs a regex string")
+        unknown = set(definition) - {"regex", "flags", "prefilter"}
+        if unknown:
+            raise ValueError(
+                f"Unknown keys for pattern {name!r} in {path}: "
+                f"{', '.join(sorted(unknown))}"
+            )
+
+        flags = definition.get("flags", [])
+        literals = definition.get("prefilter", [])
+        if isinstance(literals, str):
+            literals = [literals]
+        if not isinstance(flags, list) or any(
+            str(flag).upper() not in PACK_FLAGS for flag in flags
+        ):
+            raise ValueError(
+                f"Invalid flags for pattern {name!r} in {path}, use: "
+                f"{', '.join(PACK_FLAGS)}"
+            )
+        if not isinstance(literals, list) or not all(
+            isinstance(literal, str) and literal for literal in literals
+        ):
+            raise ValueError(
+                f"Prefilter of pattern {name!r} in {path} "
+                "must be a list of non-empty strings"
+            )
+
+        inline = "".join(sorted({PACK_FLAGS[str(flag).upper()] for flag in flags}))
+        pattern = _scoped_source(definition["regex"], inline)
+        prefilter = None
+        if literals:
+            # sorted longest first, like a text search, so the longest literal wins
+            alternation = "|".join(
+                re.escape(literal)
+                for literal in sorted(literals, key=len, reverse=True)
+            )
+            prefilter = f"(?i:{alternation})" if "i" in inline else alternation
+
+        # flags wrap the regex in a group, where global inline flags like
+        # (?i) are an error (or deprecated before Python 3.11)
+        for source in (pattern, prefilter):
+            if source is None:
+                continue
+            with warnings.catch_warnings():
+                warnings.simplefilter("error", DeprecationWarning)
+                try:
+                    compiled = re.compile(source)
+                except (re.error, DeprecationWarning) as e:
+                    raise ValueError(
+                        f"Invalid regex for pattern {name!r} in {path}: {e}"
+                    ) from e
+            # it would match between every two characters of every line
+            if compiled.fullmatch(""):
+                raise ValueError(f"Pattern {name!r} in {path} matches the empty string")
+        definitions.append((name, pattern, prefilter))
+    return definitions
+
+def _scoped_source(source: str, inline: str) -> str:
+    """
+    Apply inline flags to a regex source as a scoped group.
+
+    Args:
+        source: The regex source
+        inline: Inline flag letters, e.g. "ix"
+
+    Returns:
+        The source with the flags applied
+    """
+    if not inline:
+        return source
+    # a verbose pattern may end in a comment, which would swallow the ")"
+    end = "\n)" if "x" in inline else ")"
+    return f"(?{inline}:{source}{end}"
+
+def _read_cached_pack(
+    cache_path: str,
+) -> Optional[List[Tuple[str, str, Optional[str]]]]:
+    """
+    Read a checked pack from the cache.
+
+    Args:
+        cache_path: Path of the cache entry
+
+    Returns:
+        The pack's (name, pattern, prefilter) tuples, or None if it isn't cached
+    """
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            cached = json.load(f)
+        return [
+            (name, pattern, prefilter)
+            for name, pattern, prefilter in cached["patterns"]
+        ]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def _write_cached_pack(
+    cache_path: str, definitions: List[Tuple[str, str, Optional[str]]]
+) -> None:
+    """
+    Write a checked pack to the cache. Failing to is not an error.
+
+    Args:
+        cache_path: Path of the cache entry
+        definitions: The pack's (name, pattern, prefilter) tuples
+    """
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": PACK_CACHE_VERSION, "patterns": definitions}, f)
+        # concurrent runs may write the same entry
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass
@@ -1,6 +1,35 @@
+import mmap
 import re
-from typing import Dict, List, Union, Optional
+from array import array
+from bisect import bisect_right
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Pattern,
+    Sequence,
+    Tuple,
+    Union,
+    Optional,
+)
+from pattern_seek.aho_corasick import ACCELERATED, TermMatcher, terms_pattern
+from pattern_seek.matches import Guarded, MatchSet
 from pattern_seek.regex_patterns import GUID_PATTERN, EMAIL_PATTERN, DATE_PATTERN, URL_PATTERN, IPV4_PATTERN, IPV6_PATTERN
+from pattern_seek.regex_patterns import (
+    EMAIL_PREFILTER,
+    DATE_PREFILTER,
+    URL_PREFILTER,
+    IP_PREFILTER,
+)
+
+if TYPE_CHECKING:  # pattern_seek.packs builds on this module
+    import regex
+    from pattern_seek.packs import PatternPack
 
 # pattern type mapping
 PATTERN_MAP = {
@@ -12,38 +41,213 @@ PATTERN_MAP = {
     # add text patterns dynamically
 }
 
-# Pre-compile patterns for potential small performance gains
+class LazyPatterns(Mapping):
+    """
+    A read-only mapping of pattern types to regexes compiled on first lookup,
+    so importing the package (and starting the CLI) doesn't pay for patterns
+    a search never uses.
+    """
+
+    def __init__(
+        self, sources: Dict[str, str], compile: Callable[[str], Pattern] = re.compile
+    ):
+        """
+        Args:
+            sources: Regex source per pattern type
+            compile: Compiles a source
+        """
+        self._sources = sources
+        self._compile = compile
+        self._compiled: Dict[str, Pattern] = {}
+
+    def __getitem__(self, pattern_type: str) -> Pattern:
+        compiled = self._compiled.get(pattern_type)
+        if compiled is None:
+            # threads racing here compile it twice at worst
+            compiled = self._compiled[pattern_type] = self._compile(
+                self._sources[pattern_type]
+            )
+        return compiled
+
+    def __contains__(self, pattern_type: object) -> bool:
+        return pattern_type in self._sources
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._sources)
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+# Patterns are compiled once, on first use (text searches are compiled per
+# query, see compile_query)
 # Resources:
     # https://www.theserverside.com/tip/The-benefits-of-using-compiled-regex-in-Python-and-Java
     # https://stackoverflow.com/questions/452104/is-it-worth-using-pythons-re-compile
     # https://pynative.com/python-regex-compile/
     # 
-COMPILED_PATTERNS = {
-    pattern_type: re.compile(pattern) 
-    for pattern_type, pattern in PATTERN_MAP.items()
+COMPILED_PATTERNS = LazyPatterns(PATTERN_MAP)
+
+# Necessary conditions for each pattern type (see regex_patterns.py); only
+# lines where the prefilter matches are searched with the full pattern
+PREFILTER_MAP = {
+    "email": EMAIL_PREFILTER,
+    "date": DATE_PREFILTER,
+    "url": URL_PREFILTER,
+    "ip": IP_PREFILTER
 }
 
+COMPILED_PREFILTERS = LazyPatterns(PREFILTER_MAP)
+_BYTES_PREFILTERS = LazyPatterns(
+    PREFILTER_MAP, lambda prefilter: re.compile(prefilter.encode("ascii"))
+)
+
+# Once the candidate lines add up to more than this fraction of the text
+# scanned so far (after the first _PREFILTER_WARMUP characters), the rest of
+# the text is searched without the prefilter
+_PREFILTER_MAX_DENSITY = 0.5
+_PREFILTER_WARMUP = 64 * 1024
+
+# Line breaks that str.splitlines() honours besides \n and \r\n
+_SPECIAL_LINE_BREAK = re.compile(r'\r(?!\n)|[\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+_LINE_BREAK = re.compile(r'[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+_NEWLINE = re.compile(r'\n')
+
+# Bytes that would make the decoded text split into lines anywhere but at \n
+# (\x1f too, since \s matches it in str patterns but not in bytes patterns),
+# looked for one at a time since find is much faster than a regex alternation
+_SPECIAL_LINE_BREAK_NEEDLES = (
+    b"\x0b", b"\x0c", b"\x1c", b"\x1d", b"\x1e", b"\x1f",
+    b"\xc2\x85", b"\xe2\x80\xa8", b"\xe2\x80\xa9",
+)
+_LONE_CARRIAGE_RETURN_BYTES = re.compile(rb'\r(?!\n)')
+_NON_ASCII_BYTES = re.compile(rb'[\x80-\xff]')
+
+# Every line break str.splitlines() honours, as UTF-8 (\r\n counts once)
+_LINE_BREAK_BYTES = re.compile(
+    rb'\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e]|\xc2\x85|\xe2\x80[\xa8\xa9]'
+)
+
+# Block size used when counting newlines in a buffer
+_COUNT_BLOCK_SIZE = 16 * 1024 * 1024
+
+# Skipping more lines than this in a buffer counts them in blocks of
+# _SKIP_BLOCK_SIZE bytes first, rather than finding each newline
+_SKIP_BLOCK_LINES = 64
+_SKIP_BLOCK_SIZE = 64 * 1024
+
+# A search with max_count goes through the text in blocks of whole lines,
+# starting at _FIRST_BLOCK_SIZE characters (or bytes) and doubling up to
+# _MAX_BLOCK_SIZE, and stops at the first block that completes the count
+_FIRST_BLOCK_SIZE = 64 * 1024
+_MAX_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Searching for this many text terms or more uses an Aho-Corasick automaton
+# rather than a regex alternation, which re tries term by term at every
+# position. With pyahocorasick installed the automaton wins from two terms.
+MIN_AUTOMATON_TERMS = 16
+
+# How lines longer than max_line_length are searched: up to the limit only,
+# not at all, or whole in overlapping windows as long as the limit
+LONG_LINE_POLICIES = ("truncate", "skip", "window")
+
+# Number of compiled queries compile_query keeps
+QUERY_CACHE_SIZE = 64
+
+# Windows of a long line overlap by this many characters (at most half a
+# window), so a match no longer than that is always whole in one of them
+WINDOW_OVERLAP = 1024
+
+class CompiledQuery(NamedTuple):
+    """
+    The compiled patterns of a search, from compile_query.
+
+    A query is immutable and holds everything the search functions look
+    up, so one query can be searched with by any number of calls and
+    threads at once.
+
+    Attributes:
+        pattern_types: Pattern types searched for, in result order
+        patterns: Compiled pattern of each type (a TermMatcher for a text
+            search with many terms, a PackPattern for a pattern pack's type)
+        prefilters: Prefilter of each type (see PREFILTER_MAP), or None
+        bytes_patterns: The patterns compiled as bytes, or None if one of
+            them can't be searched as bytes
+        text_terms: Terms of the text search, if any
+        line_bound: Whether no pattern can match across a line break, so
+            the whole text can be scanned at once. Pack patterns may (e.g.
+            with \\s), so they are scanned line by line.
+    """
+    pattern_types: Tuple[str, ...]
+    patterns: Tuple[Union[Pattern, TermMatcher], ...]
+    prefilters: Tuple[Optional[Pattern], ...]
+    bytes_patterns: Optional[Tuple[Pattern, ...]]
+    text_terms: Tuple[str, ...]
+    line_bound: bool
+
 def find_pattern_matches(
     text: str, 
-    pattern_type: Union[str, List[str]],
+    pattern_type: Union[str, List[str], CompiledQuery],
     line_numbers: bool = True,
-    text_pattern: Optional[str] = None,
+    text_pattern: Optional[Union[str, Sequence[str]]] = None,
     case_sensitive: bool = False,
-    whole_word: bool = False
-) -> List[Dict]:
+    whole_word: bool = False,
+    whole_buffer: bool = True,
+    prefilter: bool = True,
+    max_count: Optional[int] = None,
+    max_line_length: Optional[int] = None,
+    long_lines: str = "truncate",
+    pattern_timeout: Optional[float] = None,
+    pattern_pack: Optional["PatternPack"] = None
+) -> MatchSet:
     """
     Find all matches of the specified pattern type(s) in the text.
     
     Args:
         text: The text to search in
-        pattern_type: Either a string or a list of strings specifying the pattern types to search for
+        pattern_type: Either a string or a list of strings specifying the
+            pattern types to search for, or a query from compile_query
         line_numbers: Whether to include line numbers in the results
-        text_pattern: Optional text to search for (for regular text search)
+        text_pattern: Optional text to search for (for regular text search),
+            or a list of terms to search for any of (ignored for a query)
         case_sensitive: Whether text search should be case-sensitive
+            (ignored for a query)
         whole_word: Whether to match whole words only for text search
+            (ignored for a query)
+        whole_buffer: Whether to run the patterns over the whole text at once
+            and map match offsets back to lines, instead of splitting the text
+            into lines first. Falls back to line-by-line scanning when the text
+            uses line breaks other than \\n or \\r\\n. Results are identical
+            either way.
+        prefilter: Whether to skip lines without a cheap necessary condition
+            of a pattern type (see PREFILTER_MAP) before running its regex.
+            Results are identical either way.
+        max_count: Stop after this many matches, returning the first ones in
+            file order; the text after the line completing the count is
+            only searched as far as the block it falls in
+        max_line_length: Search lines longer than this many characters
+            according to long_lines (default: no limit)
+        long_lines: How to search lines longer than max_line_length, one of
+            LONG_LINE_POLICIES: "truncate" searches their first
+            max_line_length characters as if the line ended there, "skip"
+            doesn't search them, and "window" searches all of them in
+            overlapping windows. A window is searched as if the line ended
+            where it does, so a match longer than WINDOW_OVERLAP can be cut
+            short, and a lookahead (like the email pattern's check for a
+            later underscore) doesn't see past it.
+        pattern_timeout: Give up on a pattern type for the rest of a line
+            (or of a window) once it has spent this many seconds on it, to
+            keep patterns that backtrack badly on hostile input in check.
+            Matches are then found with the regex package, which can be
+            interrupted, line by line.
+        pattern_pack: Pattern pack (see pattern_seek.packs) defining more
+            pattern types (ignored for a query)
+
+        Lines that weren't fully searched because of max_line_length or
+        pattern_timeout are listed in the guarded attribute of the results.
         
     Returns:
-        A list of dictionaries containing information about each match:
+        A MatchSet, whose items read like dictionaries with information
+        about each match:
         {
             "type": pattern type (e.g., "email"),
             "match": the matched text,
@@ -51,49 +255,887 @@ def find_pattern_matches(
             "start": start index of the match in the line,
             "end": end index of the match in the line
         }
+
+    Raises:
+        ValueError: If a pattern type or the long line policy is unknown
     """
-    results = []
-    
-    # Convert single pattern type to list
+    if long_lines not in LONG_LINE_POLICIES:
+        raise ValueError(f"Unknown long line policy: {long_lines}")
+    query = compile_query(
+        pattern_type, text_pattern, case_sensitive, whole_word, pattern_pack
+    )
+    if not query.pattern_types:
+        return MatchSet(query.pattern_types, line_numbers)
+
+    scan_options = (
+        query, line_numbers, whole_buffer, prefilter,
+        max_line_length, long_lines, pattern_timeout
+    )
+    if max_count is None:
+        return _find_text_matches(text, *scan_options)
+
+    # Search block by block until there are enough matches; blocks end after
+    # a \n, so their lines are exactly the lines of the text
+    results = MatchSet(query.pattern_types, line_numbers)
+    line_offset = 0
+    for start, end in _iter_line_blocks(text, "\n"):
+        if len(results) >= max_count:
+            break
+        block = text[start:end]
+        block_matches = _find_text_matches(block, *scan_options)
+        block_matches.shift_lines(line_offset)
+        results.extend(block_matches)
+        line_offset += count_line_breaks(block)
+
+    return results[:max_count] if len(results) > max_count else results
+
+def _find_text_matches(
+    text: str,
+    query: CompiledQuery,
+    line_numbers: bool,
+    whole_buffer: bool,
+    prefilter: bool,
+    max_line_length: Optional[int] = None,
+    long_lines: str = "truncate",
+    pattern_timeout: Optional[float] = None
+) -> MatchSet:
+    """
+    Find all matches in the text, for find_pattern_matches.
+
+    Args:
+        text: The text to search in
+        query: The compiled query
+        line_numbers: Whether to include line numbers in the results
+        whole_buffer: Whether to scan the whole text at once when that's safe
+        prefilter: Whether to use the prefilters of the pattern types
+        max_line_length: Length above which lines are searched according to
+            long_lines, if any
+        long_lines: One of LONG_LINE_POLICIES
+        pattern_timeout: Time budget of a pattern type per line, if any
+
+    Returns:
+        The matches
+    """
+    if pattern_timeout is not None or _has_long_line(text, max_line_length):
+        return _find_guarded_matches(
+            text,
+            query,
+            line_numbers,
+            prefilter,
+            max_line_length,
+            long_lines,
+            pattern_timeout,
+        )
+
+    results = MatchSet(query.pattern_types, line_numbers)
+
+    # Scan the whole buffer at once when line breaks can't change the result
+    if (
+        whole_buffer
+        and query.line_bound
+        and _can_scan_whole_buffer(text, query.text_terms)
+    ):
+        buffer_matches = _scan(text, query, prefilter)
+        if not buffer_matches:
+            return results
+
+        # Map buffer offsets to (line, column) and restore the per-line order
+        line_starts = _line_starts(text)
+        located = [
+            (bisect_right(line_starts, start) - 1, idx, start, end)
+            for idx, start, end in buffer_matches
+        ]
+        if len(query.pattern_types) > 1:
+            located.sort(key=lambda item: (item[0], item[1]))
+
+        for line_idx, idx, start, end in located:
+            line_start = line_starts[line_idx]
+            results.append(
+                idx, line_idx + 1, start - line_start, end - line_start, text[start:end]
+            )
+
+        return results
+
+    # Process text line by line
+    for line_idx, line in enumerate(text.splitlines()):
+        for idx, start, end in _scan(line, query, prefilter):
+            results.append(idx, line_idx + 1, start, end, line[start:end])
+
+    return results
+
+def _find_guarded_matches(
+    text: str,
+    query: CompiledQuery,
+    line_numbers: bool,
+    prefilter: bool,
+    max_line_length: Optional[int],
+    long_lines: str,
+    pattern_timeout: Optional[float]
+) -> MatchSet:
+    """
+    Find all matches in the text line by line, within the limits of
+    max_line_length and pattern_timeout, for find_pattern_matches.
+
+    Args:
+        text: The text to search in
+        query: The compiled query
+        line_numbers: Whether to include line numbers in the results
+        prefilter: Whether to use the prefilters of the pattern types
+        max_line_length: Length above which lines are searched according to
+            long_lines, if any
+        long_lines: One of LONG_LINE_POLICIES
+        pattern_timeout: Time budget of a pattern type per line, if any
+
+    Returns:
+        The matches, with the lines that weren't fully searched in guarded
+    """
+    results = MatchSet(query.pattern_types, line_numbers)
+    patterns = query.patterns
+    if pattern_timeout is not None:
+        patterns = [_interruptible_pattern(compiled) for compiled in patterns]
+    prefilters = query.prefilters if prefilter else [None] * len(patterns)
+
+    for line_idx, line in enumerate(text.splitlines()):
+        windows = [(0, len(line), len(line))]
+        if max_line_length is not None and len(line) > max_line_length:
+            if long_lines == "skip":
+                results.guarded.append((line_idx + 1, None, "skipped"))
+                continue
+            if long_lines == "truncate":
+                results.guarded.append((line_idx + 1, None, "truncated"))
+                windows = [(0, max_line_length, max_line_length)]
+            else:
+                results.guarded.append((line_idx + 1, None, "windowed"))
+                windows = _line_windows(len(line), max_line_length)
+
+        for idx, (compiled, line_prefilter) in enumerate(zip(patterns, prefilters)):
+            for start, end in _scan_windows(
+                compiled, line_prefilter, line, windows, pattern_timeout,
+                query.pattern_types[idx], line_idx + 1, results.guarded
+            ):
+                results.append(idx, line_idx + 1, start, end, line[start:end])
+
+    return results
+
+def _has_long_line(text: str, max_line_length: Optional[int]) -> bool:
+    """
+    Check whether any line of the text is longer than max_line_length.
+    """
+    if max_line_length is None or len(text) <= max_line_length:
+        return False
+    return any(len(line) > max_line_length for line in text.splitlines())
+
+def _line_windows(length: int, max_line_length: int) -> List[Tuple[int, int, int]]:
+    """
+    Cut a long line into overlapping windows of max_line_length characters.
+
+    Args:
+        length: Length of the line
+        max_line_length: Length of a window
+
+    Returns:
+        A (start, keep_end, end) tuple per window: the window is searched
+        from start to end, and its matches starting before keep_end are
+        kept, the others being left to the next window
+    """
+    overlap = min(WINDOW_OVERLAP, max_line_length // 2)
+    step = max_line_length - overlap
+    windows = []
+    start = 0
+    while start + max_line_length < length:
+        windows.append((start, start + step, start + max_line_length))
+        start += step
+    windows.append((start, length, length))
+    return windows
+
+def _scan_windows(
+    compiled: Union[Pattern, "regex.Pattern", TermMatcher],
+    prefilter: Optional[Pattern],
+    line: str,
+    windows: List[Tuple[int, int, int]],
+    pattern_timeout: Optional[float],
+    pattern_type: str,
+    line_number: int,
+    guarded: List[Guarded]
+) -> Iterator[Tuple[int, int]]:
+    """
+    Find the matches of one pattern in windows of a line, giving up on the
+    line if a window takes longer than pattern_timeout.
+
+    A window is searched from the end of the last match kept when that is
+    further, so matches don't overlap, as when searching the whole line.
+
+    Args:
+        compiled: The pattern, from _interruptible_pattern if there is a
+            timeout
+        prefilter: Its necessary condition, or None to search every window
+        line: The line
+        windows: Windows of the line, from _line_windows
+        pattern_timeout: Time budget of the pattern per window, if any
+        pattern_type: Pattern type of the pattern, to report a timeout
+        line_number: Number of the line, to report a timeout
+        guarded: List to add a timeout to
+
+    Yields:
+        The (start, end) of each match, in order
+    """
+    resume = 0
+    for window_start, keep_end, window_end in windows:
+        if prefilter is not None and not prefilter.search(
+            line, window_start, window_end
+        ):
+            continue
+        start = max(window_start, resume)
+        if pattern_timeout is not None and not isinstance(compiled, TermMatcher):
+            matches = compiled.finditer(
+                line, start, window_end, timeout=pattern_timeout
+            )
+        else:
+            matches = compiled.finditer(line, start, window_end)
+        try:
+            for match in matches:
+                if match.start() >= keep_end:
+                    break
+                resume = match.end()
+                yield match.start(), match.end()
+        except TimeoutError:
+            guarded.append((line_number, pattern_type, "timeout"))
+            return
+
+def _interruptible_pattern(
+    compiled: Union[Pattern, TermMatcher],
+) -> Union["regex.Pattern", TermMatcher]:
+    """
+    Get the regex package's version of a pattern, which takes a timeout.
+    TermMatchers run in linear time and are returned as they are.
+    """
+    if isinstance(compiled, TermMatcher):
+        return compiled
+    return _compile_interruptible(compiled.pattern, compiled.flags & re.IGNORECASE)
+
+@lru_cache(maxsize=32)
+def _compile_interruptible(pattern: str, ignore_case: int) -> "regex.Pattern":
+    # imported here: only searches with a pattern timeout need it
+    import regex
+    return regex.compile(pattern, regex.IGNORECASE if ignore_case else 0)
+
+def find_pattern_matches_bytes(
+    buffer: Union[bytes, mmap.mmap],
+    pattern_type: Union[str, List[str], CompiledQuery],
+    text_pattern: Optional[Union[str, Sequence[str]]] = None,
+    case_sensitive: bool = False,
+    whole_word: bool = False,
+    line_offsets: Optional[array] = None,
+    max_count: Optional[int] = None,
+    pattern_pack: Optional["PatternPack"] = None
+) -> Optional[MatchSet]:
+    """
+    Find all matches of the specified pattern type(s) in a UTF-8 encoded buffer.
+
+    The patterns are compiled as bytes and run straight over the buffer (e.g.
+    a memory-mapped file), so only the matches and the lines they sit on are
+    decoded. Lines containing non-ASCII characters are decoded and searched
+    as text, because ``\\b``, ``\\d``, ``\\s`` and case-insensitive matching
+    are Unicode-aware in str patterns but not in bytes patterns.
+
+    Args:
+        buffer: The UTF-8 encoded content to search in
+        pattern_type: Either a string or a list of strings specifying the
+            pattern types to search for, or a query from compile_query
+        text_pattern: Optional text to search for (for regular text search),
+            or a list of terms to search for any of (ignored for a query)
+        case_sensitive: Whether text search should be case-sensitive
+            (ignored for a query)
+        whole_word: Whether to match whole words only for text search
+            (ignored for a query)
+        line_offsets: Optional array to append the byte offset of each
+            match's line to, in match order
+        max_count: Stop after this many matches, as find_pattern_matches
+            does; only the lines up to the block completing the count need
+            to be searchable as bytes
+        pattern_pack: Pattern pack defining more pattern types (ignored for
+            a query)
+
+    Returns:
+        The same matches find_pattern_matches returns for the decoded
+        buffer, or None if the search can't be done on bytes with
+        identical results (a pattern that isn't plain ASCII or comes from a
+        pattern pack, or line breaks
+        other than \\n or \\r\\n in the buffer). Callers should then fall back
+        to decoding the buffer and using find_pattern_matches.
+
+    Raises:
+        UnicodeDecodeError: If the buffer is not valid UTF-8
+    """
+    query = compile_query(
+        pattern_type, text_pattern, case_sensitive, whole_word, pattern_pack
+    )
+    if not query.pattern_types:
+        return MatchSet()
+
+    if query.bytes_patterns is None:
+        return None
+    if max_count is None:
+        return _find_bytes_matches(buffer, query, line_offsets)
+
+    # Search block by block until there are enough matches, like
+    # find_pattern_matches
+    results = MatchSet(query.pattern_types)
+    first_offset = len(line_offsets) if line_offsets is not None else 0
+    line_offset = 0
+    for start, end in _iter_line_blocks(buffer, b"\n"):
+        if len(results) >= max_count:
+            break
+        block = buffer[start:end]
+        block_offsets = array('Q')
+        block_matches = _find_bytes_matches(block, query, block_offsets)
+        if block_matches is None:
+            return None
+        block_matches.shift_lines(line_offset)
+        results.extend(block_matches)
+        if line_offsets is not None:
+            line_offsets.extend(start + offset for offset in block_offsets)
+        line_offset += block.count(b"\n")
+
+    if len(results) > max_count:
+        results = results[:max_count]
+        if line_offsets is not None:
+            del line_offsets[first_offset + max_count:]
+    return results
+
+def _find_bytes_matches(
+    buffer: Union[bytes, mmap.mmap],
+    query: CompiledQuery,
+    line_offsets: Optional[array] = None
+) -> Optional[MatchSet]:
+    """
+    Find all matches in a UTF-8 encoded buffer, for find_pattern_matches_bytes.
+
+    Args:
+        buffer: The UTF-8 encoded content to search in
+        query: The compiled query, with bytes patterns
+        line_offsets: Optional array to append the byte offset of each
+            match's line to, in match order
+
+    Returns:
+        The matches, or None if the buffer has line breaks other than \\n
+        or \\r\\n
+    """
+    if _has_special_line_breaks(buffer):
+        return None
+
+    # (line start offset, pattern index, start, end, matched text) per match
+    located = []
+
+    # Search lines with non-ASCII characters as text
+    text_lines = []
+    pos = 0
+    while True:
+        non_ascii = _NON_ASCII_BYTES.search(buffer, pos)
+        if not non_ascii:
+            break
+        line_start = buffer.rfind(b"\n", 0, non_ascii.start()) + 1
+        line_end = buffer.find(b"\n", non_ascii.start())
+        if line_end < 0:
+            line_end = len(buffer)
+        text_lines.append((line_start, line_end))
+        pos = line_end + 1
+
+        line = decode_line(buffer[line_start:line_end])
+        for idx, start, end in _scan(line, query):
+            located.append((line_start, idx, start, end, line[start:end]))
+
+    # Everything else is ASCII, where bytes and str patterns agree
+    text_line_starts = [line_start for line_start, _ in text_lines]
+    for idx, compiled in enumerate(query.bytes_patterns):
+        prefilter = _BYTES_PREFILTERS.get(query.pattern_types[idx])
+        for match in _finditer_prefiltered(compiled, prefilter, buffer):
+            start, end = match.span()
+            text_line_idx = bisect_right(text_line_starts, start) - 1
+            if text_line_idx >= 0 and start <= text_lines[text_line_idx][1]:
+                continue
+
+            line_start = buffer.rfind(b"\n", 0, start) + 1
+            located.append((
+                line_start,
+                idx,
+                start - line_start,
+                end - line_start,
+                match.group(0).decode("ascii")
+            ))
+
+    # Restore the per-line order and count lines only between matched lines
+    located.sort(key=lambda item: (item[0], item[1]))
+
+    results = MatchSet(query.pattern_types)
+    line_number = 1
+    previous_line_start = 0
+    for line_start, idx, start, end, match_text in located:
+        line_number += _count_newlines(buffer, previous_line_start, line_start)
+        previous_line_start = line_start
+
+        results.append(idx, line_number, start, end, match_text)
+        if line_offsets is not None:
+            line_offsets.append(line_start)
+
+    return results
+
+def match_byte_offsets(buffer: Union[bytes, mmap.mmap], matches: MatchSet) -> array:
+    """
+    Find the byte offset of each match in the UTF-8 encoded text it was
+    found in, from its line number and the column it starts at.
+
+    Line numbers are counted the way the readers count them, at every line
+    break ``str.splitlines()`` honours.
+
+    Args:
+        buffer: The encoded text, e.g. the memory-mapped file
+        matches: Matches found in the text, in order
+
+    Returns:
+        The byte offset of the start of each match
+
+    Raises:
+        ValueError: If the text has fewer lines than the matches need
+    """
+    offsets = array('Q')
+    # in files with only \n and \r\n line breaks, lines are found with find
+    breaks = (
+        _LINE_BREAK_BYTES.finditer(buffer) if _has_special_line_breaks(buffer) else None
+    )
+
+    line = 1
+    line_start = 0
+    for match_line, start in matches.positions():
+        if match_line < line:
+            raise ValueError("Matches are out of order")
+        if match_line > line:
+            if breaks is not None:
+                for _ in range(match_line - line):
+                    line_break = next(breaks, None)
+                    if line_break is None:
+                        raise ValueError(f"The text has no line {match_line}")
+                    line_start = line_break.end()
+            elif match_line - line == 1:
+                line_start = buffer.find(b"\n", line_start) + 1
+                if not line_start:
+                    raise ValueError(f"The text has no line {match_line}")
+            else:
+                line_start = _skip_lines(buffer, line_start, match_line - line)
+            line = match_line
+
+        if buffer[line_start:line_start + start].isascii():
+            offsets.append(line_start + start)
+        else:
+            line_break = _LINE_BREAK_BYTES.search(buffer, line_start)
+            line_end = line_break.start() if line_break else len(buffer)
+            prefix = buffer[line_start:line_end].decode('utf-8')[:start]
+            offsets.append(line_start + len(prefix.encode('utf-8')))
+    return offsets
+
+def _has_special_line_breaks(buffer: Union[bytes, mmap.mmap]) -> bool:
+    """
+    Check whether decoding a UTF-8 buffer would give text that splits into
+    lines anywhere but at \\n (or at \\x1f, see _SPECIAL_LINE_BREAK_NEEDLES).
+
+    Args:
+        buffer: The encoded text
+
+    Returns:
+        True if the buffer holds such a line break
+    """
+    if any(buffer.find(needle) >= 0 for needle in _SPECIAL_LINE_BREAK_NEEDLES):
+        return True
+    return (
+        buffer.find(b"\r") >= 0
+        and _LONE_CARRIAGE_RETURN_BYTES.search(buffer) is not None
+    )
+
+def _skip_lines(buffer: Union[bytes, mmap.mmap], position: int, count: int) -> int:
+    """
+    Find the start of the line count lines after the one at position, in a
+    buffer whose only line breaks are \n and \r\n.
+
+    Args:
+        buffer: The encoded text
+        position: Byte offset of the start of a line
+        count: Number of lines to skip
+
+    Returns:
+        The byte offset of the start of the later line
+
+    Raises:
+        ValueError: If the buffer has fewer lines
+    """
+    # skip whole blocks while they hold fewer newlines than are left
+    while count > _SKIP_BLOCK_LINES:
+        block_end = min(position + _SKIP_BLOCK_SIZE, len(buffer))
+        newlines = buffer[position:block_end].count(b"\n")
+        if newlines >= count:
+            break
+        if block_end == len(buffer):
+            raise ValueError("The text has fewer lines than the matches need")
+        count -= newlines
+        position = block_end
+
+    for _ in range(count):
+        position = buffer.find(b"\n", position) + 1
+        if not position:
+            raise ValueError("The text has fewer lines than the matches need")
+    return position
+
+def _iter_line_blocks(
+    text: Union[str, bytes, mmap.mmap],
+    newline: Union[str, bytes]
+) -> Iterator[Tuple[int, int]]:
+    """
+    Cut text into blocks of whole lines, of _FIRST_BLOCK_SIZE characters at
+    first and then doubling up to _MAX_BLOCK_SIZE.
+
+    Args:
+        text: The text (or bytes) to cut
+        newline: The newline of the text, "\\n" or b"\\n"
+
+    Yields:
+        (start, end) of consecutive blocks covering the text, each ending
+        just after a newline except possibly the last one
+    """
+    length = len(text)
+    size = _FIRST_BLOCK_SIZE
+    start = 0
+    while start < length:
+        end = text.find(newline, start + size - 1)
+        end = length if end < 0 else end + 1
+        yield start, end
+        start = end
+        size = min(size * 2, _MAX_BLOCK_SIZE)
+
+def decode_line(raw: bytes) -> str:
+    """
+    Decode one line of a UTF-8 buffer the way reading the file in text mode
+    would, dropping the \\r of a \\r\\n line ending.
+
+    Args:
+        raw: The bytes of the line, without the trailing \\n
+
+    Returns:
+        The decoded line
+    """
+    if raw.endswith(b"\r"):
+        raw = raw[:-1]
+    return raw.decode("utf-8")
+
+def compile_query(
+    pattern_type: Union[str, Sequence[str], CompiledQuery],
+    text_pattern: Optional[Union[str, Sequence[str]]] = None,
+    case_sensitive: bool = False,
+    whole_word: bool = False,
+    pattern_pack: Optional["PatternPack"] = None
+) -> CompiledQuery:
+    """
+    Compile the patterns of a search into a query that find_pattern_matches
+    and find_pattern_matches_bytes can be called with again and again.
+
+    The last QUERY_CACHE_SIZE queries are kept, so compiling the same search
+    again costs a lookup. The module's patterns are never modified, which
+    makes searches with different text patterns safe to run concurrently.
+
+    Args:
+        pattern_type: Either a string or a list of strings specifying the
+            pattern types to search for (a query is returned as it is)
+        text_pattern: Optional text to search for (for regular text search),
+            or a list of terms to search for any of
+        case_sensitive: Whether text search should be case-sensitive
+        whole_word: Whether to match whole words only for text search
+        pattern_pack: Pattern pack (see pattern_seek.packs) defining more
+            pattern types
+
+    Returns:
+        The query
+
+    Raises:
+        ValueError: If a pattern type is unknown, or "text" is searched for
+            without a text pattern
+    """
+    if isinstance(pattern_type, CompiledQuery):
+        return pattern_type
     if isinstance(pattern_type, str):
         pattern_type = [pattern_type]
-        
-    # if text search is requested, create a pattern for it
-    if "text" in pattern_type and text_pattern:
-        if whole_word:
-            text_search_pattern = fr'\b{re.escape(text_pattern)}\b'
+    pattern_types = tuple(pattern_type)
+
+    # queries that don't use the pack are shared with searches without it
+    if pattern_pack is not None and not any(pt in pattern_pack for pt in pattern_types):
+        pattern_pack = None
+
+    # the text options only matter to text searches
+    if "text" not in pattern_types:
+        return _compile_query(pattern_types, (), False, False, pattern_pack)
+    return _compile_query(
+        pattern_types,
+        _text_terms(text_pattern),
+        case_sensitive,
+        whole_word,
+        pattern_pack,
+    )
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _compile_query(
+    pattern_types: Tuple[str, ...],
+    terms: Tuple[str, ...],
+    case_sensitive: bool,
+    whole_word: bool,
+    pattern_pack: Optional["PatternPack"]
+) -> CompiledQuery:
+    """
+    Compile a query, for compile_query.
+    """
+    patterns = []
+    prefilters = []
+    for pt in pattern_types:
+        if pt == "text":
+            if not terms:
+                raise ValueError(
+                    "Text pattern must be provided when searching for 'text'"
+                )
+            patterns.append(_compile_text_pattern(terms, case_sensitive, whole_word))
+            prefilters.append(None)
+        elif pt in COMPILED_PATTERNS:
+            patterns.append(COMPILED_PATTERNS[pt])
+            prefilters.append(COMPILED_PREFILTERS.get(pt))
+        elif pattern_pack is not None and pt in pattern_pack:
+            patterns.append(pattern_pack[pt])
+            prefilters.append(pattern_pack[pt].prefilter)
         else:
-            text_search_pattern = re.escape(text_pattern)
-            
-        # Compile with appropriate flags
-        flags = 0 if case_sensitive else re.IGNORECASE
-        COMPILED_PATTERNS["text"] = re.compile(text_search_pattern, flags)
-    elif "text" in pattern_type and not text_pattern:
-        raise ValueError("Text pattern must be provided when searching for 'text'")
-        
-        
-    # Validate pattern types
-     # Validate pattern types
-    for pt in pattern_type:
-        if pt not in COMPILED_PATTERNS and pt != "text":
             raise ValueError(f"Unknown pattern type: {pt}")
-        if pt == "text" and pt not in COMPILED_PATTERNS:
-            raise ValueError("Text pattern must be provided when searching for 'text'")
-    
-    # Process text line by line
-    lines = text.splitlines()
-    for line_idx, line in enumerate(lines):
-        for pt in pattern_type:
-            for match in COMPILED_PATTERNS[pt].finditer(line):
-                result = {
-                    "type": pt,
-                    "match": match.group(0),
-                    "start": match.start(),
-                    "end": match.end(),
-                }
-                if line_numbers:
-                    result["line"] = line_idx + 1
-                    
-                results.append(result)
-                
-    return results
+
+    bytes_patterns = _compile_bytes_patterns(patterns)
+    return CompiledQuery(
+        pattern_types=pattern_types,
+        patterns=tuple(patterns),
+        prefilters=tuple(prefilters),
+        bytes_patterns=tuple(bytes_patterns) if bytes_patterns is not None else None,
+        text_terms=terms,
+        line_bound=pattern_pack is None
+    )
+
+def _text_terms(text_pattern: Optional[Union[str, Sequence[str]]]) -> Tuple[str, ...]:
+    """
+    Get the non-empty terms of a text search.
+
+    Args:
+        text_pattern: The text to search for, or a list of terms
+
+    Returns:
+        The terms, in order
+    """
+    if not text_pattern:
+        return ()
+    if isinstance(text_pattern, str):
+        return (text_pattern,)
+    return tuple(term for term in text_pattern if term)
+
+@lru_cache(maxsize=16)
+def _compile_text_pattern(
+    terms: Tuple[str, ...],
+    case_sensitive: bool,
+    whole_word: bool
+) -> Union[Pattern, TermMatcher]:
+    """
+    Compile the pattern for a text search.
+
+    A single term is searched for with ``re.escape``; several terms match
+    the longest of them at each position. Building an automaton for
+    thousands of terms takes a while, so compiled patterns are kept.
+
+    Args:
+        terms: The non-empty terms to search for
+        case_sensitive: Whether text search should be case-sensitive
+        whole_word: Whether to match whole words only for text search
+
+    Returns:
+        A compiled regex, or a TermMatcher for many terms
+    """
+    distinct_terms = len(set(terms))
+    if distinct_terms > 1 and (ACCELERATED or distinct_terms >= MIN_AUTOMATON_TERMS):
+        return TermMatcher(terms, case_sensitive, whole_word)
+
+    flags = 0 if case_sensitive else re.IGNORECASE
+    return re.compile(terms_pattern(terms, whole_word), flags)
+
+def count_line_breaks(text: str) -> int:
+    """
+    Count the line breaks in the text the way ``str.splitlines()`` does.
+
+    For text that ends in a line break this is the number of lines
+    ``splitlines()`` returns, without building them.
+
+    Args:
+        text: The text to count line breaks in
+
+    Returns:
+        The number of line breaks (``\\r\\n`` counts once)
+    """
+    return text.count("\n") + len(_SPECIAL_LINE_BREAK.findall(text))
+
+def _can_scan_whole_buffer(
+    text: str,
+    text_pattern: Optional[Union[str, Sequence[str]]] = None
+) -> bool:
+    """
+    Check whether scanning the whole text gives the same matches as scanning
+    each line from ``str.splitlines()`` on its own.
+
+    That holds as long as lines only end in ``\\n`` or ``\\r\\n``: none of the
+    built-in patterns can consume those, and ``.`` stops at ``\\n``. The other
+    separators ``splitlines()`` honours (``\\r``, ``\\x0b``, ``\\u2028``, ...)
+    would let a match or lookahead run on into the next line.
+
+    Args:
+        text: The text to search in
+        text_pattern: Optional text to search for (for regular text search),
+            or a list of terms to search for any of
+
+    Returns:
+        True if the whole-buffer scan is safe
+    """
+    if _SPECIAL_LINE_BREAK.search(text):
+        return False
+    if any(_LINE_BREAK.search(term) for term in _text_terms(text_pattern)):
+        return False
+    return True
+
+def _line_starts(text: str) -> List[int]:
+    """
+    Build the offset of the first character of every line in the text.
+
+    Args:
+        text: Text containing only ``\\n`` / ``\\r\\n`` line breaks
+
+    Returns:
+        A sorted list of line start offsets, suitable for ``bisect``
+    """
+    return [0] + [match.end() for match in _NEWLINE.finditer(text)]
+
+def _scan(
+    text: str,
+    query: CompiledQuery,
+    prefilter: bool = True
+) -> List[Tuple[int, int, int]]:
+    """
+    Find all matches in the text, pattern type by pattern type.
+
+    Args:
+        text: The text to scan (a line or a whole buffer)
+        query: The compiled query
+        prefilter: Whether to use the prefilters of the pattern types
+
+    Returns:
+        A list of (index into the query's pattern types, start, end) tuples,
+        grouped by pattern type and ordered by position within each type
+    """
+    return [
+        (idx, match.start(), match.end())
+        for idx, (compiled, pattern_prefilter) in enumerate(
+            zip(query.patterns, query.prefilters)
+        )
+        for match in _finditer_prefiltered(
+            compiled, pattern_prefilter if prefilter else None, text
+        )
+    ]
+
+def _finditer_prefiltered(
+    compiled: Pattern,
+    prefilter: Optional[Pattern],
+    text: Union[str, bytes, mmap.mmap],
+) -> Iterator[re.Match]:
+    """
+    Find the matches of a pattern, only on the lines where its prefilter matches.
+
+    The text is cut at \n only, and a line is searched in place with
+    ``finditer(text, line_start, line_end)``, which sees the same boundaries
+    as searching that line on its own. The results are the same as
+    ``compiled.finditer(text)`` as long as matches can't span lines, which
+    holds wherever whole-buffer scanning is used. If most lines turn out to
+    be candidates, the rest of the text is searched in one go.
+
+    Args:
+        compiled: The pattern to search for
+        prefilter: Its necessary condition, or None to search everything
+        text: The text (or bytes) to search
+
+    Yields:
+        The matches of compiled, in order
+    """
+    if prefilter is None:
+        yield from compiled.finditer(text)
+        return
+
+    newline = "\n" if isinstance(text, str) else b"\n"
+    length = len(text)
+    pos = 0
+    scanned = 0
+    while pos < length:
+        if pos > _PREFILTER_WARMUP and scanned > pos * _PREFILTER_MAX_DENSITY:
+            yield from compiled.finditer(text, pos)
+            return
+
+        hit = prefilter.search(text, pos)
+        if hit is None:
+            return
+
+        # pos is always at the start of a line
+        line_start = text.rfind(newline, pos, hit.start()) + 1 or pos
+        line_end = text.find(newline, hit.start())
+        if line_end < 0:
+            line_end = length
+
+        yield from compiled.finditer(text, line_start, line_end)
+        scanned += line_end - line_start
+        pos = line_end + 1
+
+def _compile_bytes_patterns(
+    patterns: Sequence[Union[Pattern, TermMatcher]],
+) -> Optional[List[Pattern]]:
+    """
+    Compile bytes versions of patterns.
+
+    Args:
+        patterns: The compiled patterns
+
+    Returns:
+        The compiled bytes patterns in the same order, or None if one of the
+        patterns can't be expressed as an ASCII bytes pattern
+    """
+    bytes_patterns = []
+    for compiled in patterns:
+        if isinstance(compiled, TermMatcher):
+            # its regex equivalent would be far slower than decoding
+            return None
+        if not isinstance(compiled, re.Pattern):
+            # pack patterns may rely on str semantics (\s, \w, ...) anywhere
+            return None
+        try:
+            source = compiled.pattern.encode("ascii")
+            bytes_patterns.append(re.compile(source, compiled.flags & re.IGNORECASE))
+        except (UnicodeEncodeError, re.error):
+            # e.g. non-ASCII text search or \\u escapes
+            return None
+    return bytes_patterns
+
+def _count_newlines(buffer: Union[bytes, mmap.mmap], start: int, end: int) -> int:
+    """
+    Count the \\n bytes in buffer[start:end] without copying it all at once.
+
+    Args:
+        buffer: The buffer to count in
+        start: Start offset
+        end: End offset
+
+    Returns:
+        The number of newlines in the range
+    """
+    count = 0
+    for block_start in range(start, end, _COUNT_BLOCK_SIZE):
+        block_end = min(block_start + _COUNT_BLOCK_SIZE, end)
+        count += buffer[block_start:block_end].count(b"\n")
+    return count
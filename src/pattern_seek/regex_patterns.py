@@ -47,3 +47,18 @@ IPV4_PATTERN = r'\b(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.(?:25[0-5]|2[0-4][0
 # - Interface identifiers (%eth0)
 # Examples: 2001:0db8:85a3:0000:0000:8a2e:0370:7334, ::1, 2001:db8::1
 IPV6_PATTERN = r'(([0-9a-fA-F]{1,4}:){7,7}[0-9a-fA-F]{1,4}|([0-9a-fA-F]{1,4}:){1,7}:|([0-9a-fA-F]{1,4}:){1,6}:[0-9a-fA-F]{1,4}|([0-9a-fA-F]{1,4}:){1,5}(:[0-9a-fA-F]{1,4}){1,2}|([0-9a-fA-F]{1,4}:){1,4}(:[0-9a-fA-F]{1,4}){1,3}|([0-9a-fA-F]{1,4}:){1,3}(:[0-9a-fA-F]{1,4}){1,4}|([0-9a-fA-F]{1,4}:){1,2}(:[0-9a-fA-F]{1,4}){1,5}|[0-9a-fA-F]{1,4}:((:[0-9a-fA-F]{1,4}){1,6})|:((:[0-9a-fA-F]{1,4}){1,7}|:)|fe80:(:[0-9a-fA-F]{0,4}){0,4}%[0-9a-zA-Z]{1,}|::(ffff(:0{1,4}){0,1}:){0,1}((25[0-5]|(2[0-4]|1{0,1}[0-9]){0,1}[0-9])\.){3,3}(25[0-5]|(2[0-4]|1{0,1}[0-9]){0,1}[0-9])|([0-9a-fA-F]{1,4}:){1,4}:((25[0-5]|(2[0-4]|1{0,1}[0-9]){0,1}[0-9])\.){3,3}(25[0-5]|(2[0-4]|1{0,1}[0-9]){0,1}[0-9]))'
+
+# Prefilters
+# Cheap necessary conditions: every match of a pattern contains a match of its
+# prefilter, so lines without one can be skipped before running the pattern.
+# None of them can match a line break.
+# - Email: the @ sign
+# - Date: the - or / between numbers, or a month name
+# - URL: the :// of http(s):// or www.
+# - IP: a digit-dot-digit run for IPv4, or a colon for IPv6
+# GUIDs have none: the only necessary condition (a hyphen or 32 hex digits)
+# costs as much to find as the GUID pattern itself.
+EMAIL_PREFILTER = r'@'
+DATE_PREFILTER = r'[-/]|Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec'
+URL_PREFILTER = r'://|www\.'
+IP_PREFILTER = r'\d\.\d|:'
@@ -0,0 +1,355 @@
+import os
+import re
+import fnmatch
+from typing import Iterator, List, Optional, Sequence, Set, Tuple, Pattern
+
+# Compiled ignore rule: (regex, negated, directories only)
+IgnoreRule = Tuple[Pattern, bool, bool]
+
+# Number of bytes read from the start of a file to tell whether it's binary
+BINARY_SAMPLE_SIZE = 8 * 1024
+
+# Fraction of control bytes in the sample above which a file is binary
+BINARY_CONTROL_RATIO = 0.3
+
+# Bytes that count as text when sniffing: printable ASCII, common whitespace,
+# backspace, escape and anything non-ASCII (text in any encoding)
+_TEXT_BYTES = (
+    bytes([8, 9, 10, 11, 12, 13, 27]) + bytes(range(32, 127)) + bytes(range(128, 256))
+)
+
+def walk_files(
+    root: str,
+    recursive: bool = True,
+    include: Optional[Sequence[str]] = None,
+    exclude: Optional[Sequence[str]] = None,
+    ignore_files: Optional[Sequence[str]] = None,
+    max_file_size: Optional[int] = None,
+    max_depth: Optional[int] = None,
+    follow_symlinks: bool = False
+) -> Iterator[str]:
+    """
+    Walk a directory and yield the paths of the files to search.
+
+    Directories are read with os.scandir, so file types come from the
+    directory listing itself and a file is only stat'ed when max_file_size
+    is set. Excluded and ignored directories are pruned before anything
+    inside them is listed.
+
+    Args:
+        root: Directory to walk
+        recursive: Whether to descend into subdirectories
+        include: Glob patterns a file must match to be searched (any of them)
+        exclude: Glob patterns for files and directories to skip
+        ignore_files: Names of .gitignore-style files whose rules apply to
+            the directory they're in and everything below it
+        max_file_size: Skip files larger than this many bytes
+        max_depth: Maximum depth of subdirectories to descend into
+            (0 only searches root itself)
+        follow_symlinks: Whether to descend into symlinked directories.
+            Directories already visited are skipped, which breaks loops.
+
+    Yields:
+        File paths, in sorted order within each directory
+    """
+    if not recursive:
+        max_depth = 0
+
+    visited: Set[Tuple[int, int]] = set()
+    yield from _walk(
+        root,
+        "",
+        0,
+        [],
+        visited,
+        include or [],
+        exclude or [],
+        ignore_files or [],
+        max_file_size,
+        max_depth,
+        follow_symlinks
+    )
+
+def _walk(
+    directory: str,
+    relative_dir: str,
+    depth: int,
+    ignore_rules: List[Tuple[str, List[IgnoreRule]]],
+    visited: Set[Tuple[int, int]],
+    include: Sequence[str],
+    exclude: Sequence[str],
+    ignore_files: Sequence[str],
+    max_file_size: Optional[int],
+    max_depth: Optional[int],
+    follow_symlinks: bool
+) -> Iterator[str]:
+    """
+    Walk one directory for walk_files, then recurse into its subdirectories.
+
+    Args:
+        directory: Directory to list
+        relative_dir: Path of the directory relative to the walk root
+        depth: Depth of the directory below the walk root
+        ignore_rules: (base directory, rules) for every ignore file read so
+            far on the way down, outermost first
+        visited: (device, inode) of directories already walked
+        (remaining arguments as in walk_files)
+
+    Yields:
+        File paths
+    """
+    try:
+        stat = os.stat(directory)
+    except OSError:
+        return
+    if (stat.st_dev, stat.st_ino) in visited:
+        return
+    visited.add((stat.st_dev, stat.st_ino))
+
+    # Rules from ignore files in this directory apply to everything below it
+    for ignore_file in ignore_files:
+        rules = _read_ignore_file(os.path.join(directory, ignore_file))
+        if rules:
+            ignore_rules = ignore_rules + [(relative_dir, rules)]
+
+    try:
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+    except OSError:
+        return
+
+    subdirectories = []
+    for entry in entries:
+        relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+
+        try:
+            is_dir = entry.is_dir(follow_symlinks=follow_symlinks)
+            # symlinked files are searched like regular files
+            is_file = not is_dir and entry.is_file()
+        except OSError:
+            continue
+
+        if _matches_any(entry.name, relative_path, exclude):
+            continue
+        if _is_ignored(relative_path, is_dir, ignore_rules):
+            continue
+
+        if is_dir:
+            if max_depth is None or depth < max_depth:
+                subdirectories.append((entry.path, relative_path))
+            continue
+
+        if not is_file:
+            continue
+        if include and not _matches_any(entry.name, relative_path, include):
+            continue
+        if max_file_size is not None:
+            try:
+                if entry.stat().st_size > max_file_size:
+                    continue
+            except OSError:
+                continue
+
+        yield entry.path
+
+    for path, relative_path in subdirectories:
+        yield from _walk(
+            path,
+            relative_path,
+            depth + 1,
+            ignore_rules,
+            visited,
+            include,
+            exclude,
+            ignore_files,
+            max_file_size,
+            max_depth,
+            follow_symlinks
+        )
+
+def is_binary_file(file_path: str, sample_size: int = BINARY_SAMPLE_SIZE) -> bool:
+    """
+    Tell whether a file is binary from the first few KB of it.
+
+    A file is binary if the sample contains a NUL byte or more than
+    BINARY_CONTROL_RATIO of it is control characters. The encoding isn't
+    checked: text that isn't UTF-8 is searched, and reported as an error
+    if it can't be decoded, rather than skipped as binary.
+
+    Args:
+        file_path: Path to the file
+        sample_size: Number of bytes to read from the start of the file
+
+    Returns:
+        True if the file looks binary
+    """
+    with open(file_path, 'rb') as f:
+        sample = f.read(sample_size)
+
+    if not sample:
+        return False
+    if b"\0" in sample:
+        return True
+
+    control_bytes = len(sample.translate(None, _TEXT_BYTES))
+    return control_bytes > len(sample) * BINARY_CONTROL_RATIO
+
+def _matches_any(name: str, relative_path: str, patterns: Sequence[str]) -> bool:
+    """
+    Check a file or directory against include/exclude globs.
+
+    Args:
+        name: Name of the file or directory
+        relative_path: Its path relative to the walk root
+        patterns: Globs to check; globs with a slash match relative_path,
+            others match name
+
+    Returns:
+        True if any of the globs matches
+    """
+    for pattern in patterns:
+        target = relative_path if "/" in pattern else name
+        if fnmatch.fnmatchcase(target, pattern):
+            return True
+    return False
+
+def _is_ignored(
+    relative_path: str,
+    is_dir: bool,
+    ignore_rules: List[Tuple[str, List[IgnoreRule]]]
+) -> bool:
+    """
+    Check a path against ignore rules.
+
+    As in git, the last matching rule wins, and rules from ignore files
+    deeper in the tree come after (and so override) outer ones.
+
+    Args:
+        relative_path: Path relative to the walk root
+        is_dir: Whether the path is a directory
+        ignore_rules: (base directory, rules) for each ignore file that applies
+
+    Returns:
+        True if the path is ignored
+    """
+    ignored = False
+    for base_dir, rules in ignore_rules:
+        if base_dir:
+            if not relative_path.startswith(base_dir + "/"):
+                continue
+            path = relative_path[len(base_dir) + 1:]
+        else:
+            path = relative_path
+
+        for regex, negated, dir_only in rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(path):
+                ignored = not negated
+    return ignored
+
+def _read_ignore_file(path: str) -> List[IgnoreRule]:
+    """
+    Read and compile the rules of a .gitignore-style file.
+
+    Args:
+        path: Path to the ignore file
+
+    Returns:
+        The compiled rules, or an empty list if the file doesn't exist
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    except (OSError, UnicodeDecodeError):
+        return []
+
+    rules = []
+    for line in lines:
+        rule = parse_ignore_rule(line)
+        if rule is not None:
+            rules.append(rule)
+    return rules
+
+def parse_ignore_rule(line: str) -> Optional[IgnoreRule]:
+    """
+    Compile one line of a .gitignore-style file.
+
+    Supports comments, ! negation, trailing / for directories, leading or
+    inner / to anchor a pattern to the ignore file's directory, and the
+    *, ?, [...] and ** wildcards.
+
+    Args:
+        line: A line of the ignore file
+
+    Returns:
+        A (regex, negated, directories only) rule, or None for blank lines
+        and comments
+    """
+    line = line.rstrip()
+    if not line or line.startswith("#"):
+        return None
+    if line.startswith("\\"):
+        # escaped leading # or !
+        line = line[1:]
+        negated = False
+    else:
+        negated = line.startswith("!")
+        if negated:
+            line = line[1:]
+
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+
+    # Patterns with a slash are relative to the ignore file's directory,
+    # others match at any depth
+    anchored = "/" in line
+    line = line.lstrip("/")
+
+    regex = _translate_glob(line)
+    if not anchored:
+        regex = "(?:.*/)?" + regex
+    return re.compile(f"^{regex}$"), negated, dir_only
+
+def _translate_glob(pattern: str) -> str:
+    """
+    Translate a gitignore glob into a regex.
+
+    Args:
+        pattern: The glob, without leading or trailing slashes
+
+    Returns:
+        Regex source where * and ? don't cross directories and ** does
+    """
+    regex = []
+    idx = 0
+    while idx < len(pattern):
+        char = pattern[idx]
+        if pattern.startswith("**/", idx):
+            regex.append("(?:.*/)?")
+            idx += 3
+            continue
+        if pattern.startswith("**", idx):
+            regex.append(".*")
+            idx += 2
+            continue
+        if char == "*":
+            regex.append("[^/]*")
+        elif char == "?":
+            regex.append("[^/]")
+        elif char == "[":
+            end = pattern.find("]", idx + 2)
+            if end < 0:
+                regex.append(re.escape(char))
+            else:
+                body = pattern[idx + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                regex.append(f"[{body}]")
+                idx = end
+        else:
+            regex.append(re.escape(char))
+        idx += 1
+    return "".join(regex)
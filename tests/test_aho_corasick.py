@@ -0,0 +1,73 @@
+import re
+import pytest
+from pattern_seek import aho_corasick
+from pattern_seek.aho_corasick import TermMatcher, terms_pattern
+
+class TestTermMatcher:
+    def spans(self, matcher, text, *args):
+        return [match.span() for match in matcher.finditer(text, *args)]
+
+    def expected_spans(
+        self, terms, text, case_sensitive=False, whole_word=False, *args
+    ):
+        flags = 0 if case_sensitive else re.IGNORECASE
+        compiled = re.compile(terms_pattern(terms, whole_word), flags)
+        return [match.span() for match in compiled.finditer(text, *args)]
+
+    @pytest.fixture(params=[False, True], ids=["pure-python", "accelerated"])
+    def accelerated(self, request, monkeypatch):
+        if request.param and not aho_corasick.ACCELERATED:
+            pytest.skip("pyahocorasick is not installed")
+        monkeypatch.setattr(aho_corasick, "ACCELERATED", request.param)
+
+    def test_longest_leftmost_match(self, accelerated):
+        terms = ["he", "she", "hers", "his"]
+        matcher = TermMatcher(terms)
+
+        assert [m.group() for m in matcher.finditer("ushers and HIS sheep")] == [
+            "she",
+            "HIS",
+            "she",
+        ]
+        assert self.spans(matcher, "ushers hishers") == self.expected_spans(
+            terms, "ushers hishers"
+        )
+
+    def test_matches_regex_equivalent(self, accelerated):
+        text = "Disk DISK diſk dıſk dik dİsk KiB kib diskette -disk- disk_1 Kib"
+        for terms in (
+            ["disk"],
+            ["disk", "dis", "kib"],
+            ["DIS", "isk", "-", "b"],
+            ["ſ", "İ"],
+        ):
+            for case_sensitive in (False, True):
+                for whole_word in (False, True):
+                    matcher = TermMatcher(terms, case_sensitive, whole_word)
+                    expected = self.expected_spans(
+                        terms, text, case_sensitive, whole_word
+                    )
+                    assert self.spans(matcher, text) == expected
+
+    def test_whole_word_tries_shorter_terms(self, accelerated):
+        matcher = TermMatcher(["disk", "disk-drive"], whole_word=True)
+        assert [m.group() for m in matcher.finditer("disk-drives disk-drive")] == [
+            "disk",
+            "disk-drive",
+        ]
+
+    def test_pos_and_endpos(self, accelerated):
+        # As with re, a boundary at pos sees the character before it, while
+        # endpos acts as the end of the text
+        matcher = TermMatcher(["cat", "dog"], whole_word=True)
+        text = "bobcat cat dogs dog"
+
+        assert self.spans(matcher, text, 3, 14) == [(7, 10), (11, 14)]
+        assert self.spans(matcher, text, 3, 14) == self.expected_spans(
+            ["cat", "dog"], text, False, True, 3, 14
+        )
+
+    def test_empty_terms(self):
+        assert TermMatcher(["", "a"]).terms == ["a"]
+        with pytest.raises(ValueError):
+            TermMatcher(["", ""])
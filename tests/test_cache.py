@@ -0,0 +1,140 @@
+import os
+import tempfile
+import pytest
+from pattern_seek import core
+from pattern_seek.cache import ResultCache, query_fingerprint
+from pattern_seek.core import search_files
+
+class TestResultCache:
+    def setup_method(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(
+            os.path.join(self.temp_dir.name, "cache", "results.sqlite")
+        )
+
+        self.data_dir = os.path.join(self.temp_dir.name, "data")
+        os.makedirs(self.data_dir)
+        self.file_paths = []
+        for idx in range(3):
+            file_path = os.path.join(self.data_dir, f"file_{idx}.txt")
+            with open(file_path, "w") as f:
+                f.write(f"Line 1: nothing\nLine 2: user{idx}@example.com\n")
+            self.file_paths.append(file_path)
+
+    def teardown_method(self):
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    def count_searches(self, monkeypatch):
+        searched = []
+        search_file = core.search_file
+
+        def counting_search_file(file_path, *args, **kwargs):
+            searched.append(file_path)
+            return search_file(file_path, *args, **kwargs)
+
+        monkeypatch.setattr(core, "search_file", counting_search_file)
+        return searched
+
+    def test_query_fingerprint(self):
+        options = {"pattern_type": ["email"], "context_lines": 0, "text_pattern": None}
+        assert query_fingerprint(options) == query_fingerprint(
+            dict(options, reader="mmap")
+        )
+        assert query_fingerprint(options) != query_fingerprint(
+            dict(options, pattern_type=["url"])
+        )
+        assert query_fingerprint(options) != query_fingerprint(
+            dict(options, context_lines=1)
+        )
+
+    def test_unchanged_files_are_served_from_cache(self, monkeypatch):
+        searched = self.count_searches(monkeypatch)
+
+        first = search_files(self.data_dir, "email", cache=self.cache)
+        assert searched == self.file_paths
+
+        second = search_files(self.data_dir, "email", cache=self.cache)
+        assert second == first
+        assert searched == self.file_paths
+
+        # A different query misses
+        search_files(self.data_dir, "email", context_lines=1, cache=self.cache)
+        assert searched == self.file_paths * 2
+
+    def test_changed_files_are_searched_again(self, monkeypatch):
+        search_files(self.data_dir, "email", cache=self.cache)
+        searched = self.count_searches(monkeypatch)
+
+        with open(self.file_paths[1], "a") as f:
+            f.write("Line 3: other@example.com\n")
+
+        results = search_files(self.data_dir, "email", cache=self.cache)
+        assert searched == [self.file_paths[1]]
+        assert [m["match"] for m in results[1]["matches"]] == [
+            "user1@example.com",
+            "other@example.com",
+        ]
+
+    def test_timed_out_results_are_not_cached(self, monkeypatch):
+        # Backtracks for seconds without a timeout
+        with open(self.file_paths[0], "a") as f:
+            f.write("a.b-c" * 20000 + "@\n")
+        searched = self.count_searches(monkeypatch)
+
+        for _ in range(2):
+            results = search_files(
+                self.file_paths[0], "email", pattern_timeout=0.01, cache=self.cache
+            )
+            assert results[0]["matches"].guarded == [(3, "email", "timeout")]
+        assert searched == [self.file_paths[0]] * 2
+
+    @pytest.mark.parametrize("backend", [{"workers": 2}, {"threads": 2}])
+    def test_parallel_search_uses_cache(self, backend):
+        expected = search_files(self.data_dir, "email")
+        assert (
+            search_files(self.data_dir, "email", cache=self.cache, **backend)
+            == expected
+        )
+
+        # Serve the first files from the cache and search the changed one
+        with open(self.file_paths[2], "a") as f:
+            f.write("Line 3: other@example.com\n")
+        expected = search_files(self.data_dir, "email")
+        assert (
+            search_files(self.data_dir, "email", cache=self.cache, **backend)
+            == expected
+        )
+
+    @pytest.mark.parametrize(
+        "name", ["not-a-directory/results.sqlite", "corrupt.sqlite"]
+    )
+    def test_unusable_cache_is_skipped(self, capsys, name):
+        # A cache that can't be opened warns once, and the search goes on
+        with open(os.path.join(self.temp_dir.name, "not-a-directory"), "w") as f:
+            f.write("a file")
+        with open(os.path.join(self.temp_dir.name, "corrupt.sqlite"), "w") as f:
+            f.write("not a database" * 100)
+
+        cache = ResultCache(os.path.join(self.temp_dir.name, name))
+        results = search_files(self.data_dir, "email", cache=cache)
+        assert results == search_files(self.data_dir, "email")
+        assert search_files(self.data_dir, "email", cache=cache) == results
+        cache.close()
+
+        assert capsys.readouterr().err.count("Warning: not using the result cache") == 1
+
+    def test_evict_least_recently_used(self):
+        stat = os.stat(self.file_paths[0])
+        result = {"file": self.file_paths[0], "matches": []}
+        self.cache.put(self.file_paths[0], "old", stat, result)
+        self.cache.put(self.file_paths[0], "new", stat, result)
+        self.cache.put(self.file_paths[0], "newest", stat, result)
+        assert self.cache.get(self.file_paths[0], "old", stat) == {"matches": []}
+
+        # "new" is now the least recently used
+        self.cache.max_size = 2 * len('{"matches":[]}')
+        assert self.cache.evict() == 1
+        assert self.cache.get(self.file_paths[0], "new", stat) is None
+        assert self.cache.get(self.file_paths[0], "old", stat) is not None
+        assert self.cache.get(self.file_paths[0], "newest", stat) is not None
@@ -1,7 +1,18 @@
+import asyncio
 import os
 import tempfile
+import threading
 import pytest
-from pattern_seek.core import search_file, search_files
+from pattern_seek.cache import ResultCache
+from pattern_seek.core import (
+    READERS,
+    asearch_files,
+    is_binary_file,
+    iter_search_file,
+    iter_search_files,
+    search_file,
+    search_files,
+)
 
 class TestFileSearch:
     def setup_method(self):
@@ -83,6 +94,80 @@ Line 8: Another email: user@example.org
         assert results[0]["context_before"] == ["Line 1: This is a test file."]
         assert results[0]["context_after"] == ["Line 3: Order ID: 550e8400-e29b-41d4-a716-446655440000"]
         
+    def test_search_file_context_hunks(self):
+        # Matches whose context overlaps or touches share one hunk
+        for reader, chunk_size in (("full", 1024), ("stream", 16), ("mmap", 1024)):
+            results = search_file(
+                self.test_file_path,
+                pattern_type=["email", "ip"],
+                context_lines=1,
+                reader=reader,
+                chunk_size=chunk_size
+            )
+            hunks = [
+                (hunk[0], len(hunk[1]), list(indices))
+                for hunk, indices in results.hunks()
+            ]
+            assert hunks == [(1, 3, [0]), (5, 4, [1, 2])]
+
+    def test_search_file_max_count(self, monkeypatch):
+        # Small blocks so the search stops before the end of the file
+        monkeypatch.setattr("pattern_seek.patterns._FIRST_BLOCK_SIZE", 16)
+        monkeypatch.setattr("pattern_seek.patterns._MAX_BLOCK_SIZE", 32)
+        expected = search_file(self.test_file_path, pattern_type=["email", "ip"])
+
+        for reader, chunk_size in (("full", 1024), ("stream", 16), ("mmap", 1024)):
+            results = search_file(
+                self.test_file_path,
+                pattern_type=["email", "ip"],
+                context_lines=1,
+                reader=reader,
+                chunk_size=chunk_size,
+                max_count=2
+            )
+            assert [(r["line"], r["match"]) for r in results] == [
+                (r["line"], r["match"]) for r in expected[:2]
+            ]
+            # the context stops after the last match kept
+            hunks = [
+                (hunk[0], len(hunk[1]), list(indices))
+                for hunk, indices in results.hunks()
+            ]
+            assert hunks == [(1, 3, [0]), (5, 3, [1])]
+
+        file_results = search_files(
+            [self.test_file_path, self.empty_file_path], "email", max_count=1
+        )
+        assert [len(result["matches"]) for result in file_results] == [1, 0]
+
+    def test_search_file_guarded(self, monkeypatch):
+        monkeypatch.setattr("pattern_seek.patterns.WINDOW_OVERLAP", 8)
+        with open(self.test_file_path, "a") as f:
+            f.write("x" * 80 + " last@example.com\n")
+        expected = search_file(
+            self.test_file_path, pattern_type="email", context_lines=1
+        )
+
+        policies = (
+            ("truncate", "truncated", 2),
+            ("skip", "skipped", 2),
+            ("window", "windowed", 3),
+        )
+        for long_lines, reason, count in policies:
+            for reader in READERS:
+                results = search_file(
+                    self.test_file_path,
+                    pattern_type="email",
+                    context_lines=1,
+                    reader=reader,
+                    chunk_size=64,
+                    max_line_length=70,
+                    long_lines=long_lines
+                )
+                assert results == expected[:count]
+                # the long line is reported wherever it was found
+                assert results.guarded == [(9, None, reason)]
+
     def test_search_file_no_matches(self):
         # Test searching file with no matches
         results = search_file(self.empty_file_path, pattern_type="email")
@@ -119,5 +204,332 @@ Line 8: Another email: user@example.org
             os.path.join(self.temp_dir.name, "*.txt"),
             pattern_type="email"
         )
-        
-        assert len(results) == 2
\ No newline at end of file
+
+        assert len(results) == 2
+
+    def test_search_file_stream_reader(self):
+        # Streaming in tiny chunks must give the same matches and context
+        expected = search_file(
+            self.test_file_path,
+            pattern_type=["email", "guid", "url"],
+            context_lines=2
+        )
+        results = search_file(
+            self.test_file_path,
+            pattern_type=["email", "guid", "url"],
+            context_lines=2,
+            reader="stream",
+            chunk_size=16
+        )
+
+        assert results == expected
+        assert results[-1]["line"] == 8
+        assert results[-1]["context_before"] == [
+            "Line 6: Server IP: 192.168.1.1",
+            "Line 7: Nothing interesting here",
+        ]
+        assert results[-1]["context_after"] == []
+
+    def test_search_file_unknown_reader(self):
+        with pytest.raises(ValueError):
+            search_file(self.test_file_path, pattern_type="email", reader="invalid")
+
+    def test_search_file_mmap_reader(self):
+        # Searching the memory-mapped bytes must give the same matches and context
+        expected = search_file(
+            self.test_file_path,
+            pattern_type=["email", "guid", "url", "ip", "date"],
+            context_lines=1
+        )
+        results = search_file(
+            self.test_file_path,
+            pattern_type=["email", "guid", "url", "ip", "date"],
+            context_lines=1,
+            reader="mmap"
+        )
+
+        assert results == expected
+        assert len(results) == 6
+
+    def test_search_file_mmap_reader_non_ascii(self):
+        # Non-ASCII lines and text searches that can't be done on bytes
+        unicode_path = os.path.join(self.temp_dir.name, "unicode_data.txt")
+        with open(unicode_path, "w", encoding="utf-8") as f:
+            f.write(
+                "Café owner: café@example.com\r\nplain user@example.com\nÉcole ÉCOLE\n"
+            )
+
+        for kwargs in (
+            {"pattern_type": "email"},
+            {"pattern_type": "text", "text_pattern": "école"},
+        ):
+            expected = search_file(unicode_path, context_lines=1, **kwargs)
+            results = search_file(
+                unicode_path, context_lines=1, reader="mmap", **kwargs
+            )
+            assert results == expected
+
+        results = search_file(unicode_path, "text", text_pattern="école", reader="mmap")
+        assert [r["match"] for r in results] == ["École", "ÉCOLE"]
+
+    def test_search_files_parallel(self):
+        # Searching in worker processes keeps file order and error entries
+        bad_file_path = os.path.join(self.temp_dir.name, "bad_data.txt")
+        with open(bad_file_path, "wb") as f:
+            f.write(b"\xff\xfe not utf-8 user@example.com")
+
+        file_paths = [self.test_file_path, bad_file_path, self.empty_file_path]
+        expected = search_files(
+            file_paths, pattern_type="email", context_lines=1, skip_binary=False
+        )
+        results = search_files(
+            file_paths,
+            pattern_type="email",
+            context_lines=1,
+            workers=2,
+            skip_binary=False,
+        )
+
+        assert results == expected
+        assert [r["file"] for r in results] == file_paths
+        assert "error" in results[1]
+
+        unordered = search_files(
+            file_paths, pattern_type="email", workers=2, ordered=False
+        )
+        assert sorted(r["file"] for r in unordered) == sorted(file_paths)
+
+    def test_search_files_parallel_window(self, monkeypatch):
+        # A task per file and a window of one task per worker
+        monkeypatch.setattr("pattern_seek.core.BATCH_MAX_FILES", 1)
+        monkeypatch.setattr("pattern_seek.core.PROCESS_PREFETCH", 1)
+        file_paths = [self.test_file_path, self.empty_file_path] * 10
+        expected = search_files(file_paths, pattern_type="email")
+        for ordered in (True, False):
+            results = search_files(
+                file_paths, pattern_type="email", workers=2, ordered=ordered
+            )
+            if ordered:
+                assert results == expected
+            else:
+                assert sorted(r["file"] for r in results) == sorted(file_paths)
+
+        # The first result comes before the files are all walked
+        walked = []
+
+        def walk_files(path, **walk_options):
+            for file_path in file_paths:
+                walked.append(file_path)
+                yield file_path
+
+        monkeypatch.setattr("pattern_seek.core.walk_files", walk_files)
+        results = iter_search_files(self.temp_dir.name, pattern_type="email", workers=2)
+        assert next(results)["file"] == self.test_file_path
+        assert len(walked) < len(file_paths)
+        results.close()
+
+    def test_search_files_threaded(self, monkeypatch):
+        # A window of one file per thread makes files wait for earlier ones
+        monkeypatch.setattr("pattern_seek.core.THREAD_PREFETCH", 1)
+        bad_file_path = os.path.join(self.temp_dir.name, "bad_data.txt")
+        with open(bad_file_path, "wb") as f:
+            f.write(b"\xff\xfe not utf-8 user@example.com")
+
+        file_paths = [self.test_file_path, bad_file_path, self.empty_file_path] * 3
+        expected = search_files(
+            file_paths, pattern_type="email", context_lines=1, skip_binary=False
+        )
+        results = search_files(
+            file_paths,
+            pattern_type="email",
+            context_lines=1,
+            threads=2,
+            skip_binary=False,
+        )
+
+        assert results == expected
+        assert [r["file"] for r in results] == file_paths
+        assert "error" in results[1]
+
+        unordered = search_files(
+            file_paths, pattern_type="email", threads=2, ordered=False
+        )
+        assert sorted(r["file"] for r in unordered) == sorted(file_paths)
+
+        # Stopping early leaves the files read ahead unsearched
+        results = iter_search_files(file_paths, pattern_type="email", threads=2)
+        assert next(results)["file"] == self.test_file_path
+        results.close()
+
+    def test_search_file_split_across_workers(self, monkeypatch):
+        # Force tiny ranges so the file is split, then compare with a serial scan
+        monkeypatch.setattr("pattern_seek.core.MIN_RANGE_SIZE", 64)
+        monkeypatch.setattr("pattern_seek.core.MAX_RANGE_SIZE", 128)
+
+        large_file_path = os.path.join(self.temp_dir.name, "large_data.txt")
+        with open(large_file_path, "w", newline="") as f:
+            for idx in range(60):
+                f.write(
+                    f"Line {idx + 1}: user{idx}@example.com\r\n"
+                    if idx % 7 == 0
+                    else f"Line {idx + 1}: filler\n"
+                )
+
+        expected = search_file(large_file_path, pattern_type="email", context_lines=3)
+        results = search_file(
+            large_file_path, pattern_type="email", context_lines=3, workers=3
+        )
+
+        assert results == expected
+        assert [r["line"] for r in results] == [1, 8, 15, 22, 29, 36, 43, 50, 57]
+        assert results[1]["context_before"] == [
+            "Line 5: filler",
+            "Line 6: filler",
+            "Line 7: filler",
+        ]
+
+        file_results = search_files(
+            [large_file_path, self.test_file_path], "email", workers=3
+        )
+        assert file_results[0]["matches"] == search_file(large_file_path, "email")
+
+    def test_iter_search_file(self):
+        # The generator yields the same matches, lazily
+        results = iter_search_file(
+            self.test_file_path,
+            pattern_type="email",
+            context_lines=1,
+            reader="stream",
+            chunk_size=32
+        )
+
+        assert not isinstance(results, list)
+        first = next(results)
+        assert first["match"] == "support@example.com"
+        assert first["context_after"] == [
+            "Line 3: Order ID: 550e8400-e29b-41d4-a716-446655440000"
+        ]
+        assert [first] + list(results) == search_file(
+            self.test_file_path, pattern_type="email", context_lines=1
+        )
+
+    def test_iter_search_files(self):
+        results = iter_search_files(
+            [self.test_file_path, self.empty_file_path],
+            pattern_type="email"
+        )
+
+        assert next(results)["file"] == self.test_file_path
+        assert next(results)["file"] == self.empty_file_path
+        assert next(results, None) is None
+
+    def test_asearch_files(self):
+        async def collect(path, **options):
+            return [
+                result
+                async for result in asearch_files(
+                    path, "email", context_lines=1, **options
+                )
+            ]
+
+        expected = search_files(self.temp_dir.name, "email", context_lines=1)
+        results = asyncio.run(collect(self.temp_dir.name))
+        assert sorted(results, key=lambda r: r["file"]) == sorted(
+            expected, key=lambda r: r["file"]
+        )
+
+        # One file at a time finishes in file order
+        file_paths = [self.test_file_path, self.empty_file_path] * 3
+        results = asyncio.run(collect(file_paths, concurrency=1))
+        assert results == search_files(file_paths, "email", context_lines=1)
+
+        with pytest.raises(ValueError):
+            asyncio.run(collect(file_paths, concurrency=0))
+
+    def test_asearch_files_cache_off_loop(self, monkeypatch):
+        # The cache is used from a thread of its own, never the loop's
+        cache = ResultCache(os.path.join(self.temp_dir.name, "cache", "results.sqlite"))
+        threads = set()
+        for method in ("get", "put", "evict"):
+            original = getattr(cache, method)
+
+            def record(*args, original=original):
+                threads.add(threading.get_ident())
+                return original(*args)
+
+            monkeypatch.setattr(cache, method, record)
+
+        async def collect(path):
+            return [
+                result
+                async for result in asearch_files(
+                    path, "email", concurrency=1, cache=cache
+                )
+            ]
+
+        file_paths = [self.test_file_path, self.empty_file_path] * 3
+        try:
+            for _ in range(2):
+                assert asyncio.run(collect(file_paths)) == search_files(
+                    file_paths, "email"
+                )
+        finally:
+            cache.close()
+        assert threads and threading.get_ident() not in threads
+
+    def test_asearch_files_stops_early(self):
+        async def first(path):
+            results = asearch_files(path, "email", concurrency=2)
+            result = await results.__anext__()
+            await results.aclose()
+            return result
+
+        file_paths = [self.test_file_path] * 10
+        assert asyncio.run(first(file_paths))["file"] == self.test_file_path
+
+    def test_is_binary_file(self):
+        binary_path = os.path.join(self.temp_dir.name, "image.png")
+        with open(binary_path, "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR")
+
+        control_path = os.path.join(self.temp_dir.name, "control.dat")
+        with open(control_path, "wb") as f:
+            f.write(bytes(range(1, 32)) * 10)
+
+        assert is_binary_file(binary_path)
+        assert is_binary_file(control_path)
+        assert not is_binary_file(self.test_file_path)
+        assert not is_binary_file(self.empty_file_path)
+
+    def test_non_utf8_text_is_not_binary(self):
+        # Text in a legacy encoding is an error to report, not a binary to skip
+        latin1_path = os.path.join(self.temp_dir.name, "latin1.txt")
+        with open(latin1_path, "wb") as f:
+            f.write("caf\xe9 contact: bob@example.com\n".encode("latin-1"))
+
+        assert not is_binary_file(latin1_path)
+        results = search_files([latin1_path], "email")
+        assert "skipped" not in results[0]
+        assert "error" in results[0]
+
+    @pytest.mark.parametrize("workers,threads", [(1, 1), (2, 1), (1, 2)])
+    def test_search_files_skips_binary(self, workers, threads):
+        binary_path = os.path.join(self.temp_dir.name, "data.bin")
+        with open(binary_path, "wb") as f:
+            f.write(b"\x00\x01 user@example.com \xff\xfe")
+
+        results = search_files(
+            self.temp_dir.name, "email", workers=workers, threads=threads
+        )
+        assert [r for r in results if "skipped" in r] == [
+            {"file": binary_path, "skipped": "binary"}
+        ]
+
+        results = search_files(
+            self.temp_dir.name,
+            "email",
+            workers=workers,
+            threads=threads,
+            skip_binary=False,
+        )
+        assert not any("skipped" in r for r in results)
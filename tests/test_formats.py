@@ -0,0 +1,166 @@
+import csv
+import io
+import json
+import pytest
+from pattern_seek import cli, formats
+from pattern_seek.core import search_file
+from pattern_seek.formats import CSV_COLUMNS, CsvWriter, JsonLinesWriter, create_writer
+
+class TestRecordWriters:
+    @pytest.fixture
+    def result(self, tmp_path):
+        file_path = tmp_path / "log.txt"
+        raw = (
+            "café user@example.com\r\n"
+            "naïve then other@example.com\n"
+            "no\u2028match\n"
+            "last 10.0.0.1 é admin@example.com"
+        ).encode("utf-8")
+        file_path.write_bytes(raw)
+        matches = search_file(str(file_path), ["email", "ip"])
+        return raw, {"file": str(file_path), "matches": matches}
+
+    def write(self, writer, results):
+        for result in results:
+            writer.write_result(result)
+        writer.finish()
+        writer.flush()
+        return writer.stream.getvalue().decode("utf-8")
+
+    def test_jsonl(self, result):
+        raw, file_result = result
+        skipped = {"file": "image.png", "skipped": "binary"}
+        output = self.write(JsonLinesWriter(io.BytesIO()), [file_result, skipped])
+        records = [json.loads(line) for line in output.splitlines()]
+
+        assert records[0] == {
+            "record": "file", "file": file_result["file"], "matches": 4,
+            "counts": {"email": 3, "ip": 1},
+        }
+        matches = records[1:5]
+        assert [(r["line"], r["match"]) for r in matches] == [
+            (1, "user@example.com"), (2, "other@example.com"),
+            (5, "admin@example.com"), (5, "10.0.0.1"),
+        ]
+        for record in matches:
+            assert (
+                raw[record["byte_start"] : record["byte_end"]].decode("utf-8")
+                == record["match"]
+            )
+            assert record["end"] - record["start"] == len(record["match"])
+        assert records[5] == {
+            "record": "file",
+            "file": "image.png",
+            "matches": 0,
+            "skipped": "binary",
+        }
+        assert records[6] == {
+            "record": "summary", "files": 1, "files_with_matches": 1,
+            "matches": 4, "skipped": 1, "errors": 0,
+        }
+
+    def test_jsonl_context(self, tmp_path):
+        file_path = tmp_path / "log.txt"
+        file_path.write_text("before\nuser@example.com\nafter\n")
+        matches = search_file(str(file_path), "email", context_lines=1)
+        output = self.write(
+            JsonLinesWriter(io.BytesIO()),
+            [{"file": str(file_path), "matches": matches}],
+        )
+
+        record = json.loads(output.splitlines()[1])
+        assert record["context_line"] == "user@example.com"
+        assert record["context_before"] == ["before"]
+        assert record["context_after"] == ["after"]
+
+    def test_ndjson_compact(self, result, monkeypatch):
+        raw, file_result = result
+        error = {"file": "missing.txt", "error": "No such file"}
+        output = self.write(
+            JsonLinesWriter(io.BytesIO(), compact=True), [file_result, error]
+        )
+        records = [json.loads(line) for line in output.splitlines()]
+
+        assert records[0] == ["file", 0, file_result["file"], 4, None, None]
+        file_id, match_type, line, start, end, byte_start, byte_end, text = records[1]
+        assert (file_id, match_type, line, text) == (0, "email", 1, "user@example.com")
+        assert raw[byte_start:byte_end].decode("utf-8") == text
+        assert records[5] == ["file", 1, "missing.txt", 0, "No such file", None]
+        assert records[6] == ["summary", 1, 1, 4, 0, 1]
+
+        # The json fallback writes the same bytes as orjson
+        monkeypatch.setattr(formats, "orjson", None)
+        assert (
+            self.write(
+                JsonLinesWriter(io.BytesIO(), compact=True), [file_result, error]
+            )
+            == output
+        )
+
+    def test_csv(self, result):
+        raw, file_result = result
+        error = {"file": "missing.txt", "error": "No such file"}
+        output = self.write(CsvWriter(io.BytesIO()), [file_result, error])
+        rows = list(csv.DictReader(io.StringIO(output)))
+
+        assert tuple(rows[0]) == CSV_COLUMNS
+        assert rows[0]["record"] == "file" and rows[0]["matches"] == "4"
+        for row in rows[1:5]:
+            assert row["record"] == "match"
+            assert (
+                raw[int(row["byte_start"]) : int(row["byte_end"])].decode("utf-8")
+                == row["match"]
+            )
+        assert rows[5]["record"] == "file" and rows[5]["error"] == "No such file"
+        assert rows[6]["record"] == "summary"
+        summary_columns = (
+            "matches",
+            "files",
+            "files_with_matches",
+            "skipped",
+            "errors",
+        )
+        assert [rows[6][column] for column in summary_columns] == [
+            "4",
+            "1",
+            "1",
+            "0",
+            "1",
+        ]
+
+    def test_unknown_byte_offsets(self, result, tmp_path):
+        # A file that changed since it was searched no longer has the lines
+        raw, file_result = result
+        (tmp_path / "log.txt").write_text("")
+        output = self.write(JsonLinesWriter(io.BytesIO()), [file_result])
+        record = json.loads(output.splitlines()[1])
+        assert record["byte_start"] is None and record["byte_end"] is None
+
+    def test_file_records_only(self, result):
+        _, file_result = result
+        empty = {
+            "file": "empty.txt",
+            "matches": search_file(file_result["file"], "guid"),
+        }
+        writer = JsonLinesWriter(io.BytesIO())
+        writer.write_count(file_result)
+        writer.write_file_name(empty)
+        output = self.write(writer, [])
+        records = [json.loads(line) for line in output.splitlines()]
+
+        assert [record["record"] for record in records] == ["file", "summary"]
+        assert records[0]["matches"] == 4
+        assert records[1]["files"] == 2 and records[1]["files_with_matches"] == 1
+
+    def test_record_writer_is_abstract(self):
+        with pytest.raises(TypeError):
+            formats.RecordWriter(io.BytesIO())
+
+    def test_cli_formats(self):
+        assert cli.OUTPUT_FORMATS == list(formats.FORMATS)
+
+    def test_create_writer(self):
+        assert isinstance(create_writer("csv", io.BytesIO()), CsvWriter)
+        assert create_writer("ndjson-compact", io.BytesIO()).compact
+        with pytest.raises(ValueError):
+            create_writer("xml", io.BytesIO())
@@ -0,0 +1,124 @@
+import os
+import tempfile
+from pattern_seek import cli
+from pattern_seek.core import search_files
+from pattern_seek.index import (
+    INDEX_FILE_NAME,
+    TrigramIndex,
+    _decode_postings,
+    _encode_postings,
+    build_index,
+)
+
+class TestTrigramIndex:
+    def setup_method(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+
+        os.makedirs(os.path.join(self.root, "sub"))
+        self.files = {
+            "notes.txt": "Disk usage is fine\n",
+            "sub/mail.txt": "Contact support@example.com\r\n",
+            "sub/long_s.txt": "a diſk with a long s\n",
+            "other.txt": "nothing to see here\n",
+        }
+        for name, content in self.files.items():
+            with open(
+                os.path.join(self.root, name), "w", encoding="utf-8", newline=""
+            ) as f:
+                f.write(content)
+        with open(os.path.join(self.root, "data.bin"), "wb") as f:
+            f.write(b"\x00\x01 disk")
+
+        self.stats = build_index(self.root)
+        self.index = TrigramIndex.load(os.path.join(self.root, INDEX_FILE_NAME))
+
+    def teardown_method(self):
+        self.temp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def test_build_index(self):
+        assert self.stats["path"] == os.path.join(self.root, INDEX_FILE_NAME)
+        assert self.stats["files"] == 5
+        assert self.stats["updated"] == 5
+
+    def test_candidate_filter_text(self):
+        may_match = self.index.candidate_filter("text", "DISK")
+
+        # ſ matches s case-insensitively, binaries are always searched
+        assert may_match(self.path("notes.txt"))
+        assert may_match(self.path("sub/long_s.txt"))
+        assert may_match(self.path("data.bin"))
+        assert not may_match(self.path("sub/mail.txt"))
+        assert not may_match(self.path("other.txt"))
+
+        # Too short to narrow anything down
+        assert self.index.candidate_filter("text", "di")(self.path("other.txt"))
+
+        # Any of several terms
+        may_match = self.index.candidate_filter("text", ["support", "nothing"])
+        assert may_match(self.path("sub/mail.txt"))
+        assert may_match(self.path("other.txt"))
+        assert not may_match(self.path("notes.txt"))
+        assert self.index.candidate_filter("text", ["support", "di"])(
+            self.path("notes.txt")
+        )
+
+    def test_candidate_filter_patterns(self):
+        may_match = self.index.candidate_filter("email")
+        assert may_match(self.path("sub/mail.txt"))
+        assert not may_match(self.path("notes.txt"))
+
+        # GUIDs have no anchor, so nothing is ruled out
+        assert self.index.candidate_filter(["email", "guid"])(self.path("notes.txt"))
+
+    def test_changed_files_are_candidates(self):
+        may_match = self.index.candidate_filter("text", "needle")
+        assert not may_match(self.path("other.txt"))
+
+        with open(self.path("other.txt"), "a") as f:
+            f.write("a needle\n")
+        assert may_match(self.path("other.txt"))
+
+    def test_incremental_update(self):
+        with open(self.path("other.txt"), "a") as f:
+            f.write("a needle\n")
+        os.remove(self.path("notes.txt"))
+
+        stats = build_index(self.root)
+        assert (stats["files"], stats["updated"], stats["removed"]) == (4, 1, 1)
+
+        index = TrigramIndex.load(stats["path"])
+        may_match = index.candidate_filter("text", "needle")
+        assert may_match(self.path("other.txt"))
+        assert not may_match(self.path("sub/mail.txt"))
+
+    def test_search_with_index(self):
+        for pattern_type, text in [("text", "disk"), ("text", "see"), ("email", None)]:
+            expected = search_files(
+                self.root, pattern_type, text_pattern=text, recursive=True
+            )
+            results = search_files(
+                self.root,
+                pattern_type,
+                text_pattern=text,
+                recursive=True,
+                index=self.index,
+            )
+            assert results == expected
+
+        # The index file itself isn't searched
+        assert INDEX_FILE_NAME not in "".join(r["file"] for r in expected)
+
+    def test_cli_index_file_name(self):
+        assert cli.INDEX_FILE_NAME == INDEX_FILE_NAME
+
+    def test_postings_round_trip(self):
+        for file_ids in ([0], [0, 1, 2, 127], [5, 300, 100000]):
+            assert _decode_postings(_encode_postings(file_ids)) == file_ids
+
+        # Appending continues the deltas from the last id
+        encoded = _encode_postings([3, 9]) + _encode_postings([200, 201], previous=9)
+        assert _decode_postings(encoded) == [3, 9, 200, 201]
@@ -0,0 +1,82 @@
+import pickle
+import pytest
+from pattern_seek import matches as matches_module
+from pattern_seek.matches import MatchSet
+
+class TestMatchSet:
+    def build(self):
+        matches = MatchSet(["email", "ip"], context_lines=1)
+        matches.append(0, 1, 8, 24, "user@example.com")
+        matches.append(1, 3, 0, 7, "1.2.3.4")
+        matches.add_hunk(2, ["before", "1.2.3.4 up"], range(1, 2))
+        return matches
+
+    def test_dict_view(self):
+        matches = self.build()
+
+        assert len(matches) == 2
+        assert matches[0] == {
+            "type": "email",
+            "match": "user@example.com",
+            "start": 8,
+            "end": 24,
+            "line": 1,
+        }
+        assert matches[-1]["context_line"] == "1.2.3.4 up"
+        assert "context_before" not in matches[0]
+        assert matches[1].get("context_after") == []
+        with pytest.raises(KeyError):
+            matches[0]["context_line"]
+        with pytest.raises(IndexError):
+            matches[2]
+
+        assert matches == [dict(match) for match in matches]
+        assert matches != [dict(matches[0])]
+
+    def test_without_line_numbers(self):
+        matches = MatchSet(["ip"], line_numbers=False)
+        matches.append(0, 0, 2, 9, "1.2.3.4")
+        assert list(matches) == [
+            {"type": "ip", "match": "1.2.3.4", "start": 2, "end": 9}
+        ]
+
+    def test_text_blocks(self, monkeypatch):
+        monkeypatch.setattr(matches_module, "TEXT_BLOCK_SIZE", 3)
+        matches = MatchSet(["text"])
+        texts = [f"t{idx}" * (idx % 4 + 1) for idx in range(10)]
+        for idx, text in enumerate(texts):
+            matches.append(0, idx, 0, len(text), text)
+        assert [match["match"] for match in matches] == texts
+        assert matches.texts() == texts
+        assert matches.texts(2, 8) == texts[2:8]
+        assert list(matches.rows(8)) == [
+            ("text", 8, 0, texts[8]),
+            ("text", 9, 0, texts[9]),
+        ]
+
+    def test_extend_maps_types(self):
+        matches = self.build()
+        other = MatchSet(["ip", "url"])
+        other.append(1, 9, 0, 5, "https")
+        other.append(0, 9, 6, 13, "5.6.7.8")
+        expected = list(matches) + list(other)
+        expected = [dict(match) for match in expected]
+
+        matches.extend(other)
+        assert matches.types == ["email", "ip", "url"]
+        assert matches == expected
+        assert matches.context(2) is None
+
+    def test_slices(self):
+        matches = self.build()
+        assert matches[1:] == [dict(matches[1])]
+        assert matches[:1] == [dict(matches[0])]
+        assert matches[2:] == []
+
+        matches.shift_lines(10)
+        assert [match["line"] for match in matches] == [11, 13]
+
+    def test_round_trips(self):
+        matches = self.build()
+        assert MatchSet.from_columns(matches.to_columns()) == matches
+        assert pickle.loads(pickle.dumps(matches)) == matches
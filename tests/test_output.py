@@ -1,6 +1,10 @@
+import os
+import subprocess
+import sys
 import pytest
-from io import StringIO
-from pattern_seek.output import format_matches, print_matches
+from io import BytesIO, StringIO
+from pattern_seek.matches import MatchSet
+from pattern_seek.output import MatchWriter, format_matches, print_matches
 
 class TestOutputFormatting:
     def test_format_matches_simple(self):
@@ -36,6 +40,20 @@ class TestOutputFormatting:
         assert "Line 6" in formatted
         assert "test@example.com" in formatted
         
+    def test_format_matches_shared_context(self):
+        # Lines shared by the context of several matches are printed once
+        matches = MatchSet(["ip"], context_lines=1)
+        matches.append(0, 2, 0, 7, "1.1.1.1")
+        matches.append(0, 3, 4, 11, "2.2.2.2")
+        matches.add_hunk(1, ["first", "1.1.1.1", "ip: 2.2.2.2", "last"], range(2))
+
+        formatted = format_matches(matches, colored=False)
+
+        assert [line.split(":")[0] for line in formatted.splitlines()] == [
+            "Line 1", "Line 2", "Line 3", "Line 4"
+        ]
+        assert formatted.count("2.2.2.2") == 1
+
     def test_format_matches_with_file_info(self):
         # Test formatting with file information
         file_matches = [
@@ -64,4 +82,82 @@ class TestOutputFormatting:
         
         result = output.getvalue()
         assert "Line 5" in result
-        assert "test@example.com" in result
\ No newline at end of file
+        assert "test@example.com" in result
+
+    def test_match_writer(self):
+        # The writer produces what print_matches prints, as bytes
+        matches = MatchSet(["email", "ip"])
+        matches.append(0, 5, 0, 16, "test@example.com")
+        matches.append(1, 9, 4, 11, "1.2.3.4")
+        results = [
+            {"file": "test.txt", "matches": matches},
+            {"file": "empty.txt", "matches": MatchSet()},
+            {"file": "data.bin", "skipped": "binary"},
+        ]
+
+        for colored in (True, False):
+            expected = StringIO()
+            print_matches(
+                results, colored=colored, include_file_info=True, output=expected
+            )
+
+            stream = BytesIO()
+            writer = MatchWriter(stream, colored=colored)
+            for result in results:
+                writer.write_result(result)
+            writer.flush()
+
+            assert stream.getvalue().decode("utf-8") == expected.getvalue()
+
+        assert "\x1b" not in stream.getvalue().decode("utf-8")
+        assert "  Line 9: 1.2.3.4\n" in expected.getvalue()
+
+    def test_match_writer_counts(self):
+        matches = MatchSet(["email"])
+        matches.append(0, 5, 0, 16, "test@example.com")
+        results = [
+            {"file": "test.txt", "matches": matches},
+            {"file": "empty.txt", "matches": MatchSet()},
+            {"file": "missing.txt", "error": "No such file"},
+            {"file": "data.bin", "skipped": "binary"},
+        ]
+
+        stream = BytesIO()
+        writer = MatchWriter(stream, colored=False)
+        for result in results:
+            writer.write_count(result)
+        assert (
+            stream.getvalue()
+            == b"test.txt:1\nempty.txt:0\nmissing.txt: Error: No such file\n"
+        )
+
+        stream = BytesIO()
+        writer = MatchWriter(stream, colored=False)
+        for result in results:
+            writer.write_file_name(result)
+        assert stream.getvalue() == b"test.txt\n"
+
+    def test_colorama_loaded_for_colored_output_only(self):
+        # Checked in a fresh interpreter, where nothing has loaded colorama yet
+        script = (
+            "import sys, io\n"
+            "from pattern_seek.cli import main\n"
+            "from pattern_seek.output import MatchWriter\n"
+            "MatchWriter(io.BytesIO(), colored=False).write_file_name({'file': 'a', "
+            "'matches': [1]})\n"
+            "deferred = ('asyncio', 'regex', 'colorama', 'concurrent.futures', "
+            "'sqlite3', 'tomllib', 'orjson', 'csv')\n"
+            "loaded = [name for name in deferred if name in sys.modules]\n"
+            "MatchWriter(io.BytesIO(), colored=True).write_file_name({'file': 'a', "
+            "'matches': [1]})\n"
+            "print(loaded, 'colorama' in sys.modules)\n"
+        )
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        completed = subprocess.run(
+            [sys.executable, "-c", script],
+            capture_output=True,
+            text=True,
+            env=env,
+            check=True,
+        )
+        assert completed.stdout.split("\n")[0] == "[] True"
@@ -1,5 +1,7 @@
+from array import array
 import pytest
-from pattern_seek.patterns import find_pattern_matches
+from pattern_seek import patterns
+from pattern_seek.patterns import find_pattern_matches, find_pattern_matches_bytes
 
 class TestPatternMatching:
     def test_find_guid_matches(self):
@@ -408,4 +410,268 @@ class TestPatternMatching:
         
         # Should only find 'python', not 'Python'
         assert len(results) == 1        
-    
\ No newline at end of file
+
+    def test_multiple_text_terms(self):
+        text = "Python and python3 and Jython\nRuby on rails\n"
+        terms = ["python", "ruby", "jython", "rails"] + [
+            f"unused{idx}" for idx in range(20)
+        ]
+
+        results = find_pattern_matches(text, pattern_type="text", text_pattern=terms)
+        assert [r["match"] for r in results] == [
+            "Python",
+            "python",
+            "Jython",
+            "Ruby",
+            "rails",
+        ]
+        assert isinstance(
+            patterns.compile_query("text", terms).patterns[0], patterns.TermMatcher
+        )
+
+        # Same results as the regex alternation used for a few terms
+        expected = find_pattern_matches(
+            text, pattern_type=["text", "url"], text_pattern=terms[:4], whole_word=True
+        )
+        for options in ({}, {"whole_buffer": False}):
+            results = find_pattern_matches(
+                text,
+                pattern_type=["text", "url"],
+                text_pattern=terms,
+                whole_word=True,
+                **options,
+            )
+            assert results == expected
+        assert [r["match"] for r in expected] == ["Python", "Jython", "Ruby", "rails"]
+
+        # The bytes scanner leaves the automaton to the text path
+        assert (
+            find_pattern_matches_bytes(text.encode(), "text", text_pattern=terms)
+            is None
+        )
+
+    def test_compile_query(self):
+        text = "Python and ruby\nuser@example.com\n"
+
+        query = patterns.compile_query(["text", "email"], "python")
+        assert query.pattern_types == ("text", "email")
+        assert patterns.compile_query(["text", "email"], ["python"]) is query
+        assert patterns.compile_query(query) is query
+        assert "text" not in patterns.COMPILED_PATTERNS
+
+        # The text options of a query are fixed when it's compiled
+        results = find_pattern_matches(
+            text, query, text_pattern="ruby", case_sensitive=True
+        )
+        assert [r["match"] for r in results] == ["Python", "user@example.com"]
+        assert find_pattern_matches_bytes(text.encode(), query) == results
+
+        with pytest.raises(ValueError):
+            patterns.compile_query("text")
+
+    def test_lazy_patterns(self):
+        compiled = patterns.LazyPatterns(patterns.PREFILTER_MAP)
+        assert "email" in compiled and "text" not in compiled
+        assert list(compiled) == list(patterns.PREFILTER_MAP)
+        assert not compiled._compiled
+
+        assert compiled["email"].pattern == patterns.PREFILTER_MAP["email"]
+        assert compiled["email"] is compiled.get("email")
+        assert list(compiled._compiled) == ["email"]
+        assert compiled.get("guid") is None
+
+    def test_concurrent_text_searches(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        text = "".join(f"alpha{idx} beta{idx}\n" for idx in range(200))
+
+        def search(term):
+            return {
+                r["match"][:4]
+                for r in find_pattern_matches(text, "text", text_pattern=term)
+            }
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            terms = ["alpha", "beta"] * 50
+            for term, found in zip(terms, executor.map(search, terms)):
+                assert found == {term[:4]}
+
+    def test_max_count(self, monkeypatch):
+        monkeypatch.setattr(patterns, "_FIRST_BLOCK_SIZE", 8)
+        text = "".join(
+            f"line {idx} 10.0.0.{idx} user{idx}@example.com\r\n" for idx in range(50)
+        )
+        pattern_types = ["email", "ip"]
+        expected = find_pattern_matches(text, pattern_types)
+
+        for max_count in (0, 1, 3, 100):
+            results = find_pattern_matches(text, pattern_types, max_count=max_count)
+            assert results == expected[:max_count]
+            for whole_buffer in (True, False):
+                assert find_pattern_matches(
+                    text, pattern_types, max_count=max_count, whole_buffer=whole_buffer
+                ) == results
+
+            line_offsets = array("Q")
+            bytes_results = find_pattern_matches_bytes(
+                text.encode(),
+                pattern_types,
+                line_offsets=line_offsets,
+                max_count=max_count,
+            )
+            assert bytes_results == results
+            assert len(line_offsets) == len(results)
+
+        # Only the lines searched need to be searchable as bytes
+        buffer = (text + "a\u2028b\n").encode()
+        assert (
+            find_pattern_matches_bytes(buffer, pattern_types, max_count=3)
+            == expected[:3]
+        )
+        assert find_pattern_matches_bytes(buffer, pattern_types) is None
+
+    def test_long_lines(self, monkeypatch):
+        monkeypatch.setattr(patterns, "WINDOW_OVERLAP", 30)
+        long_line = "x" * 150 + " first@example.com " + "y" * 150 + " 10.0.0.1"
+        text = f"a@b.co\n{long_line}\nlast 10.0.0.2\n"
+        expected = find_pattern_matches(text, ["email", "ip"])
+        assert len(expected) == 4
+
+        results = find_pattern_matches(
+            text, ["email", "ip"], max_line_length=100, long_lines="window"
+        )
+        assert results == expected
+        assert results.guarded == [(2, None, "windowed")]
+
+        results = find_pattern_matches(
+            text, ["email", "ip"], max_line_length=200, long_lines="truncate"
+        )
+        assert [r["match"] for r in results] == [
+            "a@b.co",
+            "first@example.com",
+            "10.0.0.2",
+        ]
+        assert results.guarded == [(2, None, "truncated")]
+
+        results = find_pattern_matches(
+            text, ["email", "ip"], max_line_length=200, long_lines="skip"
+        )
+        assert [r["match"] for r in results] == ["a@b.co", "10.0.0.2"]
+        assert results.guarded == [(2, None, "skipped")]
+
+        # Lines within the limit are searched as usual
+        results = find_pattern_matches(text, ["email", "ip"], max_line_length=1000)
+        assert results == expected
+        assert results.guarded == []
+
+        with pytest.raises(ValueError):
+            find_pattern_matches(text, "email", max_line_length=100, long_lines="wrap")
+
+    def test_pattern_timeout(self):
+        # Backtracks for seconds without a timeout
+        hostile = "a.b-c" * 20000 + "@"
+        text = f"a@b.co\n{hostile}\nlast@example.com 10.0.0.2\n"
+        results = find_pattern_matches(text, ["email", "ip"], pattern_timeout=0.01)
+        assert [(r["line"], r["match"]) for r in results] == [
+            (1, "a@b.co"), (3, "last@example.com"), (3, "10.0.0.2")
+        ]
+        assert results.guarded == [(2, "email", "timeout")]
+
+        # A generous timeout gives the same results as no timeout
+        text = "".join(
+            f"line {idx} 10.0.0.{idx} user{idx}@example.com\r\n" for idx in range(50)
+        )
+        results = find_pattern_matches(
+            text, ["email", "ip", "date"], pattern_timeout=60
+        )
+        assert results == find_pattern_matches(text, ["email", "ip", "date"])
+        assert results.guarded == []
+
+    def test_whole_buffer_matches_line_by_line(self):
+        # Whole-buffer scanning must report the same lines and columns
+        text = (
+            "first line user@example.com\r\n"
+            "\r\n"
+            "https://example.com and 192.168.1.1 then other@example.com\n"
+            "trailing_underscore user@example.com x_y\n"
+            "last 2023-01-15"
+        )
+        pattern_types = ["email", "url", "ip", "date"]
+
+        expected = find_pattern_matches(
+            text, pattern_type=pattern_types, whole_buffer=False
+        )
+        results = find_pattern_matches(text, pattern_type=pattern_types)
+
+        assert results == expected
+        assert [r["line"] for r in results] == [1, 3, 3, 3, 5]
+        assert results[0]["start"] == 11
+        assert results[0]["end"] == 27
+
+    def test_whole_buffer_falls_back_on_other_line_breaks(self):
+        # splitlines() also splits on \r, \x0b, \u2028, ... which would
+        # change the result of the email lookahead across lines
+        text = "user@example.com\rfoo_bar\x0bsecond@example.com\u2028third@example.com"
+
+        expected = find_pattern_matches(text, pattern_type="email", whole_buffer=False)
+        results = find_pattern_matches(text, pattern_type="email")
+
+        assert results == expected
+        assert [r["line"] for r in results] == [1, 3, 4]
+
+    def test_prefilter_matches_full_scan(self):
+        # Only lines with @, ://, a date separator or an IP-like run are
+        # searched, and lines that pass the prefilter may still not match
+        text = (
+            "worker started\n"
+            "user@example.com wrote at 10:30 to www.example.org\r\n"
+            "no at sign or colon here\n"
+            "@ alone, 1.2 and a-b\n"
+            "::1 and 2001:db8::1 on Jan 15, 2023"
+        )
+        pattern_types = ["email", "guid", "date", "url", "ip"]
+
+        expected = find_pattern_matches(
+            text, pattern_type=pattern_types, prefilter=False
+        )
+        results = find_pattern_matches(text, pattern_type=pattern_types)
+
+        assert results == expected
+        assert [r["type"] for r in results] == ["email", "url", "date", "ip", "ip"]
+
+    def test_prefilter_dense_text(self, monkeypatch):
+        # Once most lines are candidates, the rest is scanned in one go
+        monkeypatch.setattr(patterns, "_PREFILTER_WARMUP", 10)
+        text = "".join(f"a{idx}@example.com b\nnothing\n" for idx in range(50))
+
+        results = find_pattern_matches(text, pattern_type="email")
+
+        assert results == find_pattern_matches(
+            text, pattern_type="email", prefilter=False
+        )
+        assert len(results) == 50
+        assert results[-1]["line"] == 99
+
+    def test_find_pattern_matches_bytes(self):
+        text = (
+            "Contact: user@example.com\r\nVisit https://example.com\nCafé 192.168.1.1\n"
+        )
+
+        expected = find_pattern_matches(
+            text.replace("\r\n", "\n"), pattern_type=["email", "url", "ip"]
+        )
+        results = find_pattern_matches_bytes(
+            text.encode("utf-8"), pattern_type=["email", "url", "ip"]
+        )
+
+        assert results == expected
+        assert results[2]["line"] == 3
+        assert results[2]["start"] == 5
+
+    def test_find_pattern_matches_bytes_fallback(self):
+        # Non-ASCII search text and form feeds can't be handled on bytes
+        assert (
+            find_pattern_matches_bytes(b"caf\xc3\xa9", "text", text_pattern="café")
+            is None
+        )
+        assert find_pattern_matches_bytes(b"a@example.com\x0cb", "email") is None
@@ -0,0 +1,103 @@
+import os
+import tempfile
+import pytest
+from pattern_seek.core import search_files
+from pattern_seek.walker import parse_ignore_rule, walk_files
+
+class TestWalkFiles:
+    def setup_method(self):
+        # Create a small tree:
+        # root/a.log, root/b.txt, root/.gitignore
+        # root/sub/c.log, root/sub/big.log, root/sub/deeper/d.log
+        # root/build/e.log
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+
+        os.makedirs(os.path.join(self.root, "sub", "deeper"))
+        os.makedirs(os.path.join(self.root, "build"))
+        files = {
+            "a.log": "user@example.com\n",
+            "b.txt": "nothing here\n",
+            "sub/c.log": "other@example.com\n",
+            "sub/big.log": "x" * 2048 + "\n",
+            "sub/deeper/d.log": "deep@example.com\n",
+            "build/e.log": "built@example.com\n",
+        }
+        for name, content in files.items():
+            with open(os.path.join(self.root, name), "w") as f:
+                f.write(content)
+
+        with open(os.path.join(self.root, ".gitignore"), "w") as f:
+            f.write("# build output\nbuild/\n*.log\n!c.log\n")
+
+    def teardown_method(self):
+        self.temp_dir.cleanup()
+
+    def relative(self, paths):
+        return [os.path.relpath(p, self.root).replace(os.sep, "/") for p in paths]
+
+    def test_walk_recursive(self):
+        paths = self.relative(walk_files(self.root))
+        assert paths == [
+            ".gitignore", "a.log", "b.txt",
+            "build/e.log", "sub/big.log", "sub/c.log", "sub/deeper/d.log",
+        ]
+
+    def test_walk_not_recursive(self):
+        paths = self.relative(walk_files(self.root, recursive=False))
+        assert paths == [".gitignore", "a.log", "b.txt"]
+
+    def test_walk_include_exclude(self):
+        paths = self.relative(
+            walk_files(self.root, include=["*.log"], exclude=["deeper", "big.*"])
+        )
+        assert paths == ["a.log", "build/e.log", "sub/c.log"]
+
+    def test_walk_ignore_files(self):
+        # build/ is pruned, *.log ignored except c.log
+        paths = self.relative(walk_files(self.root, ignore_files=[".gitignore"]))
+        assert paths == [".gitignore", "b.txt", "sub/c.log"]
+
+    def test_walk_max_file_size_and_depth(self):
+        paths = self.relative(walk_files(self.root, max_file_size=1024, max_depth=1))
+        assert paths == [".gitignore", "a.log", "b.txt", "build/e.log", "sub/c.log"]
+
+    @pytest.mark.skipif(not hasattr(os, "symlink"), reason="symlinks not supported")
+    def test_walk_symlink_loop(self):
+        try:
+            os.symlink(self.root, os.path.join(self.root, "sub", "loop"))
+        except OSError:
+            pytest.skip("symlinks not permitted")
+
+        # Not followed by default
+        assert "sub/loop" not in "".join(self.relative(walk_files(self.root)))
+
+        # Followed once, the loop back to the root is detected
+        paths = self.relative(walk_files(self.root, follow_symlinks=True))
+        assert len(paths) == len(set(paths)) == 7
+
+    def test_parse_ignore_rule(self):
+        assert parse_ignore_rule("# comment") is None
+        assert parse_ignore_rule("   ") is None
+
+        regex, negated, dir_only = parse_ignore_rule("logs/**/*.gz")
+        assert not negated and not dir_only
+        assert regex.match("logs/a/b/c.gz")
+        assert regex.match("logs/c.gz")
+        assert not regex.match("other/logs/c.gz")
+
+        regex, negated, dir_only = parse_ignore_rule("!tmp/")
+        assert negated and dir_only
+        assert regex.match("a/b/tmp")
+
+    def test_search_files_recursive(self):
+        results = search_files(
+            self.root,
+            pattern_type="email",
+            recursive=True,
+            include=["*.log"],
+            ignore_files=[".gitignore"]
+        )
+
+        assert self.relative(r["file"] for r in results) == ["sub/c.log"]
+        assert results[0]["matches"][0]["match"] == "other@example.com"